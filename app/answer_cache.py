@@ -0,0 +1,105 @@
+"""
+In-process cache of AI Chat answers, shared by all sessions of one app process.
+
+Two layers are checked in order:
+  exact      normalized question text (case, whitespace and trailing punctuation
+             ignored) + mode + k, an LRU dict lookup
+  semantic   the stored answer whose question embedding is closest to the new one,
+             if its cosine similarity is at least ANSWER_CACHE_THRESHOLD
+
+Both layers hold the same entries, so one LRU bound (ANSWER_CACHE_SIZE) and one TTL
+(ANSWER_CACHE_TTL seconds) cover them. Every entry belongs to the index version it
+was answered from; when a different version is served the cache is emptied, since
+new sermons can change the answer.
+
+The question vector is the one retrieval already computed, so a semantic lookup
+costs one matrix-vector product over at most ANSWER_CACHE_SIZE rows.
+"""
+import os
+import sys
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+from embedding_cache import normalize_text
+
+ANSWER_CACHE_SIZE = int(os.getenv('ANSWER_CACHE_SIZE', '256'))
+ANSWER_CACHE_TTL = float(os.getenv('ANSWER_CACHE_TTL', str(24 * 3600)))
+# Cosine similarity above which two questions are treated as the same question
+ANSWER_CACHE_THRESHOLD = float(os.getenv('ANSWER_CACHE_THRESHOLD', '0.95'))
+
+
+def normalize_question(text):
+    return normalize_text(text).casefold().rstrip(' ?!.')
+
+
+def _unit(vec):
+    vec = np.asarray(vec, dtype=np.float32).reshape(-1)
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm > 0 else vec
+
+
+class AnswerCache:
+    def __init__(self, max_items=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL, threshold=ANSWER_CACHE_THRESHOLD):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.threshold = threshold
+        self._entries = OrderedDict()   # key -> (created, unit qvec or None, value)
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = {'exact': 0, 'semantic': 0}
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _check_version(self, version):
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+    def _expire(self, now):
+        expired = [key for key, (created, _, _) in self._entries.items() if now - created > self.ttl]
+        for key in expired:
+            del self._entries[key]
+
+    def get(self, version, question, mode, k, qvec=None):
+        """(value, 'exact' | 'semantic') for a cached answer, or (None, None) on a miss"""
+        key = (normalize_question(question), mode, k)
+        now = time.time()
+        with self._lock:
+            self._check_version(version)
+            self._expire(now)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits['exact'] += 1
+                return self._entries[key][2], 'exact'
+            if qvec is not None and self.threshold <= 1:
+                candidates = [(other, vec) for other, (_, vec, _) in self._entries.items()
+                              if vec is not None and other[1:] == key[1:]]
+                if candidates:
+                    sims = np.vstack([vec for _, vec in candidates]) @ _unit(qvec)
+                    best = int(np.argmax(sims))
+                    if sims[best] >= self.threshold:
+                        match = candidates[best][0]
+                        self._entries.move_to_end(match)
+                        self.hits['semantic'] += 1
+                        return self._entries[match][2], 'semantic'
+            self.misses += 1
+            return None, None
+
+    def put(self, version, question, mode, k, value, qvec=None):
+        key = (normalize_question(question), mode, k)
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = (time.time(), _unit(qvec) if qvec is not None else None, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
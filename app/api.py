@@ -0,0 +1,402 @@
+"""
+Headless JSON search API on the same retrieval engine as the Streamlit app.
+
+For sites that embed a search box: one lightweight HTTP call per query instead of an
+iframe running the whole Streamlit script on every keystroke.
+
+Usage:
+  python app/api.py                       # API_HOST / API_PORT, default 127.0.0.1:8502
+  python app/api.py --host 0.0.0.0 --port 8502
+
+Endpoints (all GET parameters may also be sent as a JSON body with POST):
+  GET  /health                        index version, vector count, model
+  GET  /search/keyword?q=&limit=&cursor=
+                                      bm25-ranked passages, keyset-paged (`next_cursor`)
+  GET  /search/semantic?q=&k=&date_from=&date_to=&video_id=
+  GET  /search/hybrid?q=&k=&date_from=&date_to=&video_id=
+                                      video_id may be repeated; dates are YYYY-MM-DD
+  GET  /search/scripture?ref=&limit=  passages citing a verse, range or chapter
+                                      ("Romans 8:28", "1 Cor 13", "John 3:16-18")
+  POST /ask {"q": ..., "k": 5, "stream": false, filters...}
+                                      RAG answer with sources; "stream": true answers
+                                      with server-sent events (`sources`, then `delta`
+                                      events, then `done`, or `error` if it fails)
+
+Search results carry the scripture references found in each passage, and
+`facets.references` counts them over the page (see `scripts/scripture.py`).
+
+Requests are served by a thread each (ThreadingHTTPServer). The FAISS index, query
+encoder, transcript cache and answer cache are loaded once per process and shared,
+exactly as in the app; each request opens its own SQLite connection. The server
+refuses to start on a database whose chunk tables predate `chunking.py` (run
+`scripts/rebuild_chunks.py` first).
+`scripts/load_test_api.py` drives it with concurrent clients.
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from dotenv import load_dotenv
+load_dotenv()
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+from ann_index import NotChunkKeyed
+from answer_cache import AnswerCache
+from chunking import ChunkSchemaError, TranscriptCache, check_chunks_schema, get_chunk_texts
+from encoders import EncoderMismatch
+from openai_chat import ChatAPIError, OpenAIChatClient
+from vector_meta import parse_date
+import rag
+import retrieval
+import scripture
+
+DB_PATH = os.getenv('DB_PATH', 'sermons.db')
+OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+API_HOST = os.getenv('API_HOST', '127.0.0.1')
+API_PORT = int(os.getenv('API_PORT', '8502'))
+# Origin allowed to call the API from a browser ('*' for any, empty to send no CORS headers)
+API_CORS_ORIGIN = os.getenv('API_CORS_ORIGIN', '*')
+MAX_RESULTS = 50
+
+transcripts = TranscriptCache(max_items=256)
+answers = AnswerCache()
+_chat = None
+
+
+class APIError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def get_conn():
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute('PRAGMA mmap_size = 268435456')
+    return conn
+
+
+def chat_client():
+    global _chat
+    if _chat is None:
+        _chat = OpenAIChatClient(OPENAI_API_KEY, pool_size=16)
+    return _chat
+
+
+def _int(params, name, default, lo=1, hi=MAX_RESULTS):
+    try:
+        value = int(params.get(name, default))
+    except (TypeError, ValueError):
+        raise APIError(400, f"{name} must be an integer")
+    return max(lo, min(hi, value))
+
+
+def _query(params):
+    q = (params.get('q') or '').strip()
+    if not q:
+        raise APIError(400, "missing q")
+    return q
+
+
+def _filters(params):
+    video_ids = params.get('video_id')
+    if isinstance(video_ids, str):
+        video_ids = [video_ids]
+    try:
+        date_from = parse_date(params.get('date_from') or None)
+        date_to = parse_date(params.get('date_to') or None)
+    except ValueError as e:
+        raise APIError(400, str(e))
+    return {'date_from': date_from, 'date_to': date_to, 'video_ids': video_ids or None}
+
+
+def _index_and_vector(q):
+    index = retrieval.get_index()
+    if index is None:
+        raise APIError(503, "no index built; run scripts/build_embeddings.py")
+    try:
+        return index, retrieval.encode_query(index, q)
+    except EncoderMismatch as e:
+        raise APIError(503, str(e))
+
+
+def _passages(conn, hits):
+    """JSON results for ranked (chunk_id, score) hits"""
+    texts = get_chunk_texts(conn, [chunk_id for chunk_id, _ in hits], transcripts)
+    info = retrieval.video_info(conn, [texts[chunk_id][0] for chunk_id, _ in hits if chunk_id in texts])
+    results = []
+    for chunk_id, score in hits:
+        if chunk_id not in texts:
+            continue
+        video_id, text = texts[chunk_id]
+        title, pub = info.get(video_id, (video_id, ''))
+        results.append({'chunk_id': str(chunk_id), 'video_id': video_id, 'title': title,
+                        'published_at': pub, 'score': score, 'text': text,
+                        'url': f'https://www.youtube.com/watch?v={video_id}'})
+    return results
+
+
+def _with_references(conn, body):
+    """Add each result's scripture references and the `references` facet to a search response"""
+    refs = scripture.chunk_references(conn, [int(r['chunk_id']) for r in body['results']])
+    for result in body['results']:
+        result['references'] = [scripture.format_reference(ref) for ref in refs.get(int(result['chunk_id']), [])]
+    body['facets'] = {'references': [{'ref': label, 'count': count}
+                                     for label, count in scripture.reference_facet(refs)]}
+    return body
+
+
+def health(conn, params):
+    index = retrieval.get_index()
+    if index is None:
+        return {'status': 'no-index'}
+    return {'status': 'ok', 'version': index.version, 'vectors': len(index), 'model': index.model}
+
+
+def keyword(conn, params):
+    q = _query(params)
+    try:
+        rows, next_cursor = retrieval.keyword_page(conn, q, _int(params, 'limit', 10), params.get('cursor'))
+    except ValueError as e:
+        raise APIError(400, str(e))
+    return _with_references(conn, {
+        'total': retrieval.keyword_count(conn, q), 'next_cursor': next_cursor,
+        'results': [{'chunk_id': str(chunk_id), 'video_id': vid, 'title': title, 'published_at': pub,
+                     'snippet': snippet, 'url': f'https://www.youtube.com/watch?v={vid}'}
+                    for chunk_id, vid, title, pub, snippet in rows]})
+
+
+def semantic(conn, params):
+    q = _query(params)
+    filters = _filters(params)
+    index, qvec = _index_and_vector(q)
+    try:
+        hits = index.search(qvec, _int(params, 'k', 5), **filters)
+    except ValueError as e:
+        raise APIError(400, str(e))
+    # chunk_id travels as a string: 63-bit IDs do not survive JavaScript numbers
+    return _with_references(conn, {'version': index.version,
+                                   'results': _passages(conn, [(chunk_id, score) for chunk_id, score, _ in hits])})
+
+
+def hybrid(conn, params):
+    q = _query(params)
+    filters = _filters(params)
+    index, qvec = _index_and_vector(q)
+    try:
+        hits = retrieval.hybrid_search(conn, index, q, _int(params, 'k', 5), qvec, **filters)
+    except ValueError as e:
+        raise APIError(400, str(e))
+    return _with_references(conn, {'version': index.version, 'results': _passages(conn, hits)})
+
+
+def scripture_search(conn, params):
+    text = (params.get('ref') or params.get('q') or '').strip()
+    refs = [ref for _, ref in scripture.parse_references(text, strict=False)]
+    if not refs:
+        raise APIError(400, f"no scripture reference in {text!r}")
+    if not scripture.has_references(conn):
+        raise APIError(503, "no verse index; run scripts/extract_scripture.py")
+    total, chunks = scripture.citing_chunks(conn, refs, _int(params, 'limit', 10))
+    results = _passages(conn, [(chunk_id, len(found)) for chunk_id, _, _, found in chunks])
+    return _with_references(conn, {'references': [scripture.format_reference(ref) for ref in refs],
+                                   'total': total, 'results': results})
+
+
+def _ask_context(conn, params):
+    """(index, question, cache mode, k, qvec, cached value, prompt, sources) for /ask"""
+    if not OPENAI_API_KEY:
+        raise APIError(503, "OPENAI_API_KEY not set")
+    q = _query(params)
+    k = _int(params, 'k', 5, lo=3, hi=10)
+    filters = _filters(params)
+    index, qvec = _index_and_vector(q)
+    mode = rag.cache_mode(filters)
+    cached, matched = answers.get(index.key, q, mode, k, qvec)
+    if cached is not None:
+        answer, sources = cached
+        return index, q, mode, k, qvec, (answer, matched), None, sources
+    try:
+        prompt, sources = rag.build_prompt(conn, index, q, k, qvec, filters, transcripts)
+    except ValueError as e:
+        raise APIError(400, str(e))
+    return index, q, mode, k, qvec, None, prompt, sources
+
+
+def _sources_json(sources):
+    return [{'title': title, 'published_at': pub, 'video_id': vid, 'preview': preview,
+             'url': f'https://www.youtube.com/watch?v={vid}'} for title, pub, vid, preview in sources]
+
+
+def ask(conn, params):
+    index, q, mode, k, qvec, cached, prompt, sources = _ask_context(conn, params)
+    if cached is not None:
+        answer, matched = cached
+    else:
+        try:
+            answer = chat_client().complete(prompt)
+        except ChatAPIError as e:
+            raise APIError(502, str(e))
+        matched = None
+        answers.put(index.key, q, mode, k, (answer, sources), qvec)
+    return {'answer': answer, 'cached': matched, 'sources': _sources_json(sources)}
+
+
+ROUTES = {
+    '/health': health,
+    '/search/keyword': keyword,
+    '/search/semantic': semantic,
+    '/search/hybrid': hybrid,
+    '/search/scripture': scripture_search,
+    '/ask': ask,
+}
+
+
+class APIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'SermonsKB'
+    # Headers and body are separate writes; without TCP_NODELAY, keep-alive clients wait
+    # ~40 ms on delayed ACKs for every response
+    disable_nagle_algorithm = True
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _cors(self):
+        if API_CORS_ORIGIN:
+            self.send_header('Access-Control-Allow-Origin', API_CORS_ORIGIN)
+            self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self._cors()
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _params(self):
+        url = urlparse(self.path)
+        params = {name: values if len(values) > 1 else values[0]
+                  for name, values in parse_qs(url.query).items()}
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            try:
+                body = json.loads(self.rfile.read(length))
+            except ValueError:
+                raise APIError(400, "body is not valid JSON")
+            if not isinstance(body, dict):
+                raise APIError(400, "body must be a JSON object")
+            params.update(body)
+        return url.path.rstrip('/') or '/', params
+
+    def _handle(self):
+        start = time.perf_counter()
+        conn = None
+        try:
+            path, params = self._params()
+            route = ROUTES.get(path)
+            if route is None:
+                raise APIError(404, f"no endpoint {path}")
+            conn = get_conn()
+            if route is ask and params.get('stream'):
+                return self._stream_answer(conn, params)
+            body = route(conn, params)
+            body['took_ms'] = round((time.perf_counter() - start) * 1000, 1)
+            self._send_json(200, body)
+        except APIError as e:
+            self._send_json(e.status, {'error': str(e)})
+        except Exception as e:
+            print(f"{self.command} {self.path} failed: {type(e).__name__}: {e}")
+            self._send_json(500, {'error': 'internal error'})
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _event(self, name, data):
+        payload = f'event: {name}\ndata: {json.dumps(data)}\n\n'.encode('utf-8')
+        self.wfile.write(f'{len(payload):x}\r\n'.encode('ascii') + payload + b'\r\n')
+        self.wfile.flush()
+
+    def _stream_answer(self, conn, params):
+        """/ask as server-sent events: sources first, then the answer as it is generated"""
+        index, q, mode, k, qvec, cached, prompt, sources = _ask_context(conn, params)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self._cors()
+        self.end_headers()
+        # The 200 is on the wire: from here on failures can only be reported as events
+        try:
+            self._event('sources', _sources_json(sources))
+            if cached is not None:
+                self._event('delta', cached[0])
+                self._event('done', {'cached': cached[1]})
+            else:
+                parts = []
+                try:
+                    for text in chat_client().stream(prompt):
+                        parts.append(text)
+                        self._event('delta', text)
+                except ChatAPIError as e:
+                    self._event('error', str(e))
+                else:
+                    answers.put(index.key, q, mode, k, (''.join(parts), sources), qvec)
+                    self._event('done', {'cached': None})
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away; nothing more can be sent
+            self.close_connection = True
+            return
+        except Exception as e:
+            print(f"{self.command} {self.path} failed while streaming: {type(e).__name__}: {e}")
+            self._event('error', 'internal error')
+            self.close_connection = True
+        self.wfile.write(b'0\r\n\r\n')
+
+    do_GET = _handle
+    do_POST = _handle
+
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self._cors()
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON search API over the sermon index')
+    parser.add_argument('--host', default=API_HOST)
+    parser.add_argument('--port', type=int, default=API_PORT)
+    args = parser.parse_args()
+
+    conn = get_conn()
+    try:
+        check_chunks_schema(conn)
+    except ChunkSchemaError as e:
+        sys.exit(f"❌ {e}")
+    finally:
+        conn.close()
+    # Load the index and warm the query encoder before taking requests
+    try:
+        index = retrieval.get_index()
+    except NotChunkKeyed as e:
+        sys.exit(f"❌ {e}")
+    print(f"Index: {index.version if index else 'none'} ({len(index) if index else 0} vectors)")
+    server = ThreadingHTTPServer((args.host, args.port), APIHandler)
+    server.daemon_threads = True
+    print(f"Serving on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
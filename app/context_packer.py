@@ -0,0 +1,124 @@
+"""
+Packs retrieved chunks into the context passages of an AI Chat prompt.
+
+Chunks overlap their neighbours by CHUNK_OVERLAP characters, so the top hits for a
+question are often consecutive windows of one sermon. Joining them verbatim pays for
+the shared text twice. `pack_context`:
+ - merges hits from the same sermon whose spans overlap or touch into one passage
+   (a slice of the transcript, so the overlap appears once)
+ - drops passages that mostly repeat an earlier one (word 5-gram Jaccard similarity
+   of at least CONTEXT_DUP_THRESHOLD, e.g. the same song or reading in two services)
+ - orders passages by their best-ranked hit
+ - stops at CONTEXT_TOKEN_BUDGET tokens; the passage that crosses the budget is cut
+   at a word boundary if enough room is left, otherwise left out
+
+Every call prints one line with the token count before and after packing.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+from chunking import get_chunk_spans
+from openai_chat import OPENAI_CHAT_MODEL
+from openai_embeddings import count_tokens
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', '3000'))
+CONTEXT_DUP_THRESHOLD = float(os.getenv('CONTEXT_DUP_THRESHOLD', '0.8'))
+# Smallest remainder of the budget worth filling with a truncated passage
+MIN_PARTIAL_TOKENS = 100
+SHINGLE_WORDS = 5
+
+
+class Passage:
+    """A contiguous span of one transcript covering one or more retrieved chunks"""
+
+    def __init__(self, video_id, start, end, rank, chunk_ids):
+        self.video_id = video_id
+        self.start = start
+        self.end = end
+        self.rank = rank
+        self.chunk_ids = chunk_ids
+        self.text = ''
+        self.tokens = 0
+
+
+def merge_spans(hits):
+    """Merge ranked (chunk_id, video_id, start, end) hits into Passages, best rank first"""
+    by_video = {}
+    for rank, (chunk_id, video_id, start, end) in enumerate(hits):
+        by_video.setdefault(video_id, []).append((start, end, rank, chunk_id))
+    passages = []
+    for video_id, spans in by_video.items():
+        spans.sort()
+        current = None
+        for start, end, rank, chunk_id in spans:
+            if current is not None and start <= current.end:
+                current.end = max(current.end, end)
+                current.rank = min(current.rank, rank)
+                current.chunk_ids.append(chunk_id)
+            else:
+                current = Passage(video_id, start, end, rank, [chunk_id])
+                passages.append(current)
+    return sorted(passages, key=lambda p: p.rank)
+
+
+def _shingles(text):
+    words = text.lower().split()
+    return {' '.join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))}
+
+
+def drop_near_duplicates(passages, threshold=CONTEXT_DUP_THRESHOLD):
+    kept = []
+    seen = []
+    for passage in passages:
+        shingles = _shingles(passage.text)
+        if any(len(shingles & other) / max(1, len(shingles | other)) >= threshold for other in seen):
+            continue
+        kept.append(passage)
+        seen.append(shingles)
+    return kept
+
+
+def _truncate(text, max_tokens, model):
+    """Longest word-boundary prefix of text within max_tokens"""
+    words = text.split(' ')
+    lo, hi = 0, len(words)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count_tokens(' '.join(words[:mid]), model) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return ' '.join(words[:lo])
+
+
+def pack_context(conn, chunk_ids, cache, budget=CONTEXT_TOKEN_BUDGET, model=OPENAI_CHAT_MODEL):
+    """Passages for ranked chunk IDs, merged, de-duplicated and within the token budget"""
+    spans = get_chunk_spans(conn, chunk_ids)
+    hits = [(chunk_id, *spans[chunk_id]) for chunk_id in chunk_ids if chunk_id in spans]
+    raw_tokens = sum(count_tokens(cache.chunk_text(conn, video_id, start, end), model)
+                     for _, video_id, start, end in hits)
+
+    passages = merge_spans(hits)
+    for passage in passages:
+        passage.text = cache.chunk_text(conn, passage.video_id, passage.start, passage.end)
+    passages = drop_near_duplicates(passages)
+
+    packed = []
+    used = 0
+    for passage in passages:
+        passage.tokens = count_tokens(passage.text, model)
+        if used + passage.tokens > budget:
+            room = budget - used
+            if room >= MIN_PARTIAL_TOKENS:
+                passage.text = _truncate(passage.text, room, model)
+                passage.tokens = count_tokens(passage.text, model)
+                packed.append(passage)
+                used += passage.tokens
+            break
+        packed.append(passage)
+        used += passage.tokens
+
+    print(f"Context: {len(hits)} chunks ({raw_tokens} tokens) -> {len(packed)} passages "
+          f"({used} tokens), {raw_tokens - used} tokens saved")
+    return packed
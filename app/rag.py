@@ -0,0 +1,55 @@
+"""
+Retrieval-augmented answers: the AI Chat prompt and its context, shared by the
+Streamlit app and the JSON API (`api.py`).
+
+`build_prompt` retrieves with `retrieval.hybrid_search`, packs the hits with
+`context_packer.pack_context` and returns the prompt plus the sources to show next to
+the answer. Generation itself goes through `openai_chat.OpenAIChatClient`.
+"""
+from context_packer import pack_context
+import retrieval
+
+PROMPT_TEMPLATE = """You are a helpful assistant that answers questions based on sermon transcripts. 
+Use the following sermon excerpts to answer the question. Be thorough and helpful, citing specific points from the sermons when relevant.
+
+CRITICAL INSTRUCTION: You MUST include multiple relevant Bible verses to support and reinforce your answer. For each verse:
+1. Provide the complete reference (e.g., John 3:16, Romans 8:28, Ephesians 2:8-9)
+2. Quote the full verse text
+3. Explain how it relates to the sermon content and the question
+
+Include at least 3-5 Bible verses in your response when relevant. Make the Scripture references prominent and easy to identify.
+
+If the sermons don't contain relevant information, say so honestly.
+
+Sermon Context:
+{context}
+
+Question: {query}
+
+Answer:"""
+
+
+def cache_mode(filters):
+    """Answer cache mode for chat answers; answers are only reused for the same filters"""
+    return ('chat', str(filters['date_from']), str(filters['date_to']), tuple(sorted(filters['video_ids'] or ())))
+
+
+def build_prompt(conn, index, query, top_k, qvec, filters, transcript_cache):
+    """(prompt, sources) for a question, with context from hybrid retrieval.
+
+    sources are (title, published_at, video_id, preview) per packed passage.
+    """
+    hits = [chunk_id for chunk_id, _ in retrieval.hybrid_search(conn, index, query, top_k, qvec, **filters)]
+    # Overlapping hits from one sermon become one passage, within the token budget
+    passages = pack_context(conn, hits, transcript_cache)
+    info = retrieval.video_info(conn, [passage.video_id for passage in passages])
+
+    contexts = []
+    sources = []
+    for passage in passages:
+        title, pub = info.get(passage.video_id, (passage.video_id, ''))
+        contexts.append(passage.text)
+        sources.append((title, pub, passage.video_id, passage.text[:300]))
+
+    prompt = PROMPT_TEMPLATE.format(context="\n\n".join(contexts), query=query)
+    return prompt, sources
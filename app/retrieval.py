@@ -0,0 +1,402 @@
+"""
+Semantic retrieval over the FAISS index, shared by the app's search modes.
+
+The serving index is opened memory-mapped and read-only (`IO_FLAG_MMAP_IFC`, or
+`IO_FLAG_MMAP` on faiss releases without it), and the per-vector arrays from
+`vector_meta.py` are opened with `np.load(mmap_mode='r')`.
+Several app processes on one host therefore share one copy in the OS page cache,
+and a cold start only touches the pages a query needs. (IVF inverted lists are still
+read into memory; the IVF-SQ8/PQ lists are small.)
+
+The loaded index is kept at module level and reused across requests and sessions.
+When `build_embeddings.py` publishes a new version (`index_store.py`), the next
+request opens it and swaps the module-level reference; requests already running
+keep the SemanticIndex they started with, whose index and arrays come from one
+version directory.
+
+`keyword_page` ranks individual chunks with bm25 over the `chunks_fts` table kept
+by `chunking.py`, and `hybrid_search` fuses that ranking with the vector one using
+reciprocal-rank fusion.
+
+Nothing here imports streamlit, so the same code can serve other front ends.
+"""
+import os
+import re
+import sys
+import json
+import base64
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+from ann_index import EXACT_FILTER_MAX, exact_subset_search, prepare_query, require_id_map, search_params
+from chunking import get_chunk_spans, last_change_seq
+from embedding_cache import EMBEDDING_CACHE_DIR, EmbeddingCache
+from encoders import load_encoder
+from index_store import current_manifest, current_paths, read_manifest
+from local_encoder import LOCAL_EMBED_MODEL
+from vector_meta import VectorMeta, parse_date
+
+# Distinct filters whose ID selectors are kept per loaded index
+SELECTOR_CACHE_SIZE = 32
+
+
+def _file_stamp(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def read_index_mmap(path):
+    """Open a FAISS index read-only with its vector storage memory-mapped"""
+    import faiss
+    # IO_FLAG_MMAP_IFC only exists in newer faiss releases; older ones fall back to
+    # IO_FLAG_MMAP, which maps less and reads the rest of the index into memory
+    mmap_flag = getattr(faiss, 'IO_FLAG_MMAP_IFC', faiss.IO_FLAG_MMAP)
+    return faiss.read_index(path, mmap_flag | faiss.IO_FLAG_READ_ONLY)
+
+
+class SemanticIndex:
+    """A loaded index plus its per-vector arrays"""
+
+    def __init__(self, index_path, ids_path, version=None):
+        self.version = version
+        self.index_path = index_path
+        # Identifies what is being served, also for a legacy unversioned index
+        self.key = version or _file_stamp(index_path)
+        # Legacy indexes without an ID map would return row positions as chunk IDs
+        self.index = require_id_map(read_index_mmap(index_path), index_path)
+        try:
+            self.meta = VectorMeta.load(ids_path, mmap=True)
+        except FileNotFoundError:
+            self.meta = None
+        self._selectors = OrderedDict()
+        self._selectors_lock = threading.Lock()
+        if version:
+            self.manifest = read_manifest(version)
+        else:
+            # Unversioned index: its state file, or the MiniLM model the app always assumed
+            self.manifest = current_manifest() or {'model': LOCAL_EMBED_MODEL, 'dim': self.index.d}
+
+    @property
+    def model(self):
+        return self.manifest['model']
+
+    @property
+    def dim(self):
+        return self.index.d
+
+    def __len__(self):
+        return self.index.ntotal
+
+    def _selector(self, date_from, date_to, video_ids):
+        """(faiss IDSelector, share of vectors admitted, admitted IDs) for a filter, cached per filter"""
+        # Keyed by the parsed dates, so an invalid date raises instead of sharing the unfiltered entry
+        key = (parse_date(date_from), parse_date(date_to), frozenset(video_ids) if video_ids is not None else None)
+        with self._selectors_lock:
+            if key in self._selectors:
+                self._selectors.move_to_end(key)
+                return self._selectors[key]
+        import faiss
+        if self.meta is None:
+            raise ValueError("search filters need the per-vector arrays; rebuild with scripts/build_embeddings.py")
+        allowed = self.meta.select(date_from, date_to, video_ids)
+        entry = (faiss.IDSelectorBatch(allowed), len(allowed) / max(1, len(self.meta)), allowed)
+        with self._selectors_lock:
+            self._selectors[key] = entry
+            while len(self._selectors) > SELECTOR_CACHE_SIZE:
+                self._selectors.popitem(last=False)
+        return entry
+
+    def search(self, qvec, k, date_from=None, date_to=None, video_ids=None):
+        """Top-k hits for one query vector as a list of (chunk_id, score, video_id).
+
+        Scores are inner products for normalized indexes and L2 distances for flat-l2.
+        video_id is None when the per-vector arrays are missing.
+
+        date_from/date_to (inclusive) and video_ids restrict the search to matching
+        sermons. The restriction is applied inside FAISS through an ID selector, so
+        the k hits are the best matching ones rather than what is left of an
+        unfiltered top-k. Small selections are scored exactly instead.
+        """
+        result = None
+        params = None
+        if date_from is not None or date_to is not None or video_ids is not None:
+            selector, fraction, allowed = self._selector(date_from, date_to, video_ids)
+            if len(allowed) == 0:
+                return []
+            if len(allowed) <= EXACT_FILTER_MAX:
+                result = exact_subset_search(self.index, qvec, allowed, k)
+            params = search_params(self.index, selector, fraction)
+        D, I = result or self.index.search(prepare_query(self.index, qvec), k, params=params)
+        hits = [(int(chunk_id), float(score)) for chunk_id, score in zip(I[0], D[0]) if chunk_id >= 0]
+        videos = self.meta.video_of([chunk_id for chunk_id, _ in hits]) if self.meta is not None else [None] * len(hits)
+        return [(chunk_id, score, video_id) for (chunk_id, score), video_id in zip(hits, videos)]
+
+
+_lock = threading.Lock()
+_loaded = None
+_loaded_key = None
+
+
+_encoders = {}
+_encoder_lock = threading.Lock()
+
+# Query vectors are only cached on disk when enabled: deploys may have a read-only
+# filesystem, and every distinct query would otherwise add a row to the cache
+QUERY_EMBEDDING_CACHE = os.getenv('QUERY_EMBEDDING_CACHE', '0') == '1'
+QUERY_CACHE_DIR = os.getenv('QUERY_CACHE_DIR', os.path.join(EMBEDDING_CACHE_DIR, 'queries'))
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv('QUERY_CACHE_MAX_ENTRIES', '100000'))
+
+
+def _query_cache(model):
+    """On-disk cache for query vectors, or None when disabled or not writable"""
+    if not QUERY_EMBEDDING_CACHE:
+        return None
+    try:
+        return EmbeddingCache(model, QUERY_CACHE_DIR, max_entries=QUERY_CACHE_MAX_ENTRIES)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Query embedding cache disabled: {e}")
+        return None
+
+
+def get_encoder(manifest):
+    """Warm query encoder for an index manifest (and its query cache, or None), loaded once per model per process"""
+    model = manifest['model']
+    with _encoder_lock:
+        if model not in _encoders:
+            _encoders[model] = (load_encoder(manifest), _query_cache(model))
+        return _encoders[model]
+
+
+def encode_query(index, text):
+    """Vector for a query in the index's embedding space (cached per model if QUERY_EMBEDDING_CACHE=1).
+
+    Raises encoders.EncoderMismatch when no usable encoder matches the index.
+    """
+    encoder, cache = get_encoder(index.manifest)
+    if cache is None:
+        return np.asarray(encoder.encode([text]), dtype=np.float32)[0]
+    return cache.cached_encode([text], encoder.encode)[0]
+
+
+def get_index():
+    """The SemanticIndex of the live version, or None if no index has been built yet.
+
+    Checks `indexes/CURRENT` on every call (a tiny file read) and loads a new version
+    once it is published. Callers should fetch the index once per request and use that
+    object throughout, so one request never mixes two versions.
+    """
+    global _loaded, _loaded_key
+    paths = current_paths()
+    if paths is None:
+        return None
+    version, index_file, ids_dir = paths
+    # Legacy unversioned indexes are identified by file stamp instead
+    key = version or _file_stamp(index_file)
+    with _lock:
+        if _loaded is None or key != _loaded_key:
+            try:
+                index = SemanticIndex(index_file, ids_dir, version)
+            except (OSError, RuntimeError) as e:
+                # E.g. the version was pruned between reading CURRENT and opening it
+                if _loaded is None:
+                    raise
+                print(f"Keeping index {_loaded.version}: cannot open {index_file}: {e}")
+            else:
+                _loaded, _loaded_key = index, key
+                _warm_encoder(index)
+        return _loaded
+
+
+def _warm_encoder(index):
+    """Load the query encoder together with the index instead of on the first query"""
+    try:
+        get_encoder(index.manifest)
+    except Exception as e:
+        # encode_query raises it again where the caller can report it
+        print(f"Query encoder for {index.model} not loaded: {e}")
+
+
+def search(qvec, k):
+    """Search the current index; returns [] when there is no index"""
+    index = get_index()
+    return index.search(np.asarray(qvec), k) if index is not None else []
+
+
+# Hybrid retrieval: chunk-level bm25 over `chunks_fts` fused with vector search
+
+RRF_K = 60
+# Candidates taken from each ranking before fusion, as a multiple of k
+HYBRID_CANDIDATES = 4
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = frozenset("""
+a an and are as at be but by did do does for from had has have he her him his how i if in
+into is it its me my no not of on or our she so than that the their them then there these
+they this to us was we were what when where which who why will with would you your
+""".split())
+
+
+def fts_query(text):
+    """FTS5 query matching any content word of free text (quoted, so no syntax errors)"""
+    words = [w for w in _WORD_RE.findall(text.lower()) if w not in STOPWORDS]
+    return ' OR '.join(f'"{w}"' for w in dict.fromkeys(words))
+
+
+def keyword_chunks(conn, query, limit, videos=None):
+    """Best chunks for a free-text query by bm25, as [(chunk_id, bm25)] (lower is better).
+
+    videos optionally restricts the search to those video IDs.
+    """
+    match = fts_query(query)
+    if not match or (videos is not None and not videos):
+        return []
+    if videos is None:
+        return conn.execute("SELECT rowid, bm25(chunks_fts) FROM chunks_fts WHERE chunks_fts MATCH ? "
+                            "ORDER BY bm25(chunks_fts) LIMIT ?", (match, limit)).fetchall()
+    videos = list(videos)
+    return conn.execute("SELECT chunks_fts.rowid, bm25(chunks_fts) FROM chunks_fts "
+                        "JOIN chunks ON chunks.chunk_id = chunks_fts.rowid "
+                        f"WHERE chunks_fts MATCH ? AND chunks.video_id IN ({','.join('?' * len(videos))}) "
+                        "ORDER BY bm25(chunks_fts) LIMIT ?", [match] + videos + [limit]).fetchall()
+
+
+SNIPPET_TOKENS = 40
+# How FTS5 reports a query it cannot parse (e.g. `it's`, `"abc`, `-word`, `a:b`, `*`),
+# as opposed to database errors such as "no such table" or "database is locked"
+FTS_QUERY_ERRORS = ('fts5: syntax error', 'unterminated string', 'no such column', 'unknown special query')
+# Distinct (query, corpus state) pairs whose hit counts are kept
+COUNT_CACHE_SIZE = 256
+
+_counts = OrderedDict()
+_counts_lock = threading.Lock()
+
+
+def _keyword_match(conn, query):
+    """(FTS5 match expression, total hits) for a keyword query, cached until chunks change.
+
+    The query is tried as FTS5 syntax first (phrases, prefix*, AND/OR/NOT), and as plain
+    words if it does not parse.
+    """
+    # chunk_changes grows with every chunk insert/delete, so its last seq versions chunks_fts
+    key = (query, last_change_seq(conn))
+    with _counts_lock:
+        if key in _counts:
+            _counts.move_to_end(key)
+            return _counts[key]
+    sql = "SELECT COUNT(*) FROM chunks_fts WHERE chunks_fts MATCH ?"
+    try:
+        match, total = query, conn.execute(sql, (query,)).fetchone()[0]
+    except sqlite3.OperationalError as e:
+        if not str(e).startswith(FTS_QUERY_ERRORS):
+            raise
+        match = fts_query(query)
+        total = conn.execute(sql, (match,)).fetchone()[0] if match else 0
+    with _counts_lock:
+        _counts[key] = (match, total)
+        while len(_counts) > COUNT_CACHE_SIZE:
+            _counts.popitem(last=False)
+    return match, total
+
+
+def video_info(conn, video_ids):
+    """{video_id: (title, published_at)} for the given videos"""
+    # `sermons` is an FTS table without an index on video_id, so look them all up in one scan
+    videos = list(dict.fromkeys(video_ids))
+    info = {}
+    for i in range(0, len(videos), 500):
+        batch = videos[i:i + 500]
+        marks = ','.join('?' * len(batch))
+        for video_id, title, pub in conn.execute(
+                f'SELECT video_id, title, published_at FROM sermons WHERE video_id IN ({marks})', batch):
+            info.setdefault(video_id, (title, pub))
+    return info
+
+
+def keyword_count(conn, query):
+    """Total number of passages matching a keyword query"""
+    return _keyword_match(conn, query)[1]
+
+
+def encode_cursor(score, chunk_id):
+    return base64.urlsafe_b64encode(json.dumps([score, chunk_id]).encode('ascii')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        score, chunk_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return float(score), int(chunk_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"invalid cursor {cursor!r}") from e
+
+
+def keyword_page(conn, query, limit, cursor=None):
+    """One page of passages for a keyword query, ranked by bm25 then chunk_id.
+
+    Returns (rows, next_cursor) with rows as [(chunk_id, video_id, title, published_at,
+    snippet)]; next_cursor is None on the last page. A cursor marks the last row of the
+    previous page (keyset pagination), so later pages continue from there instead of
+    re-ranking and skipping everything before them as OFFSET would.
+    """
+    match, total = _keyword_match(conn, query)
+    if not match or not total:
+        return [], None
+    where, params = '', [match]
+    if cursor:
+        score, chunk_id = decode_cursor(cursor)
+        where = " AND (bm25(chunks_fts) > ? OR (bm25(chunks_fts) = ? AND rowid > ?))"
+        params += [score, score, chunk_id]
+    # One row more than the page shows whether there is a next page
+    rows = conn.execute("SELECT rowid, bm25(chunks_fts) AS score FROM chunks_fts "
+                        f"WHERE chunks_fts MATCH ?{where} ORDER BY score, rowid LIMIT ?",
+                        params + [limit + 1]).fetchall()
+    next_cursor = encode_cursor(rows[limit - 1][1], rows[limit - 1][0]) if len(rows) > limit else None
+    page = [chunk_id for chunk_id, _ in rows[:limit]]
+    if not page:
+        return [], None
+    # Snippets read the text through the content view, so only build them for this page
+    snippets = dict(conn.execute(
+        "SELECT rowid, snippet(chunks_fts, 0, '<b>', '</b>', '...', ?) FROM chunks_fts "
+        f"WHERE chunks_fts MATCH ? AND rowid IN ({','.join('?' * len(page))})",
+        [SNIPPET_TOKENS, match] + page).fetchall())
+    spans = get_chunk_spans(conn, page)
+    info = video_info(conn, [spans[chunk_id][0] for chunk_id in page if chunk_id in spans])
+    out = []
+    for chunk_id in page:
+        video_id = spans[chunk_id][0] if chunk_id in spans else ''
+        out.append((chunk_id, video_id, *info.get(video_id, (video_id, '')), snippets.get(chunk_id, '')))
+    return out, next_cursor
+
+
+def rrf_fuse(rankings, k=RRF_K):
+    """Reciprocal-rank fusion of ranked ID lists into [(id, score)], best first"""
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+
+
+def hybrid_search(conn, index, query, k, qvec=None, date_from=None, date_to=None, video_ids=None):
+    """Top-k chunks for a query from bm25 and vector search fused with RRF.
+
+    Returns [(chunk_id, rrf_score)]. Works with keyword results alone when index is
+    None (date filters then need the index and are ignored). qvec is the query vector
+    if the caller already has it. Filters are as for SemanticIndex.search and apply
+    to both rankings.
+    """
+    n = k * HYBRID_CANDIDATES
+    filtered = date_from is not None or date_to is not None or video_ids is not None
+    videos = video_ids
+    if filtered and index is not None and index.meta is not None:
+        videos = index.meta.select_videos(date_from, date_to, video_ids)
+    rankings = [[chunk_id for chunk_id, _ in keyword_chunks(conn, query, n, videos)]]
+    if index is not None:
+        if qvec is None:
+            qvec = encode_query(index, query)
+        rankings.append([chunk_id for chunk_id, _, _ in
+                         index.search(qvec, n, date_from=date_from, date_to=date_to, video_ids=video_ids)])
+    return rrf_fuse(rankings)[:k]
@@ -1,10 +1,21 @@
 import os
+import sys
 import sqlite3
-import json
 from dotenv import load_dotenv
 load_dotenv()
 import streamlit as st
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+from chunking import ChunkSchemaError, TranscriptCache, check_chunks_schema, get_chunk_texts
+import retrieval
+from answer_cache import AnswerCache
+import rag
+from ann_index import NotChunkKeyed
+from encoders import EncoderMismatch
+from openai_chat import ChatAPIError, OpenAIChatClient
+from corpus_stats import read_stats
+import scripture
+
 # Page config
 st.set_page_config(
     page_title="SermonsKB - AI-Powered Sermon Search",
@@ -128,10 +139,88 @@ st.markdown(embed_css + """
 """, unsafe_allow_html=True)
 
 DB_PATH = os.getenv('DB_PATH', 'sermons.db')
-FAISS_INDEX_PATH = os.getenv('FAISS_INDEX_PATH', 'faiss_index.faiss')
-EMBEDDINGS_META = os.getenv('EMBEDDINGS_META', 'embeddings_meta.json')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
+def get_conn():
+    conn = sqlite3.connect(DB_PATH)
+    # Memory-map the DB so transcript pages come from the shared OS page cache
+    conn.execute('PRAGMA mmap_size = 268435456')
+    return conn
+
+@st.cache_resource
+def check_schema():
+    # Not cached when it raises, so the check runs again after the DB is migrated
+    conn = get_conn()
+    try:
+        check_chunks_schema(conn)
+    finally:
+        conn.close()
+
+try:
+    check_schema()
+except ChunkSchemaError as e:
+    st.error(f'⚠️ {e}')
+    st.stop()
+
+@st.cache_resource
+def get_transcript_cache():
+    return TranscriptCache(max_items=128)
+
+@st.cache_resource
+def get_chat_client():
+    # One pooled HTTP session for all answers; OPENAI_BASE_URL may point at scripts/openai_stub.py
+    return OpenAIChatClient(OPENAI_API_KEY)
+
+@st.cache_resource
+def get_answer_cache():
+    return AnswerCache()
+
+def encode_query(index, query):
+    """Query vector from the encoder named in the index manifest, or None after showing why not"""
+    try:
+        return retrieval.encode_query(index, query)
+    except EncoderMismatch as e:
+        st.error(f'⚠️ {e}')
+        return None
+
+@st.cache_data(ttl=600)
+def sermon_options():
+    """video_id -> 'title (date)' for the sermon filter, newest first"""
+    conn = get_conn()
+    rows = conn.execute('SELECT video_id, title, published_at FROM sermons ORDER BY published_at DESC').fetchall()
+    conn.close()
+    return {vid: f'{title} ({pub})' if pub else title for vid, title, pub in rows}
+
+def search_filters(key):
+    """Date range and sermon filters as keyword arguments for retrieval searches"""
+    index = retrieval.get_index()
+    # Indexes built before filters existed have no publish dates until the next build
+    has_dates = index is not None and index.meta is not None and index.meta.has_dates
+    with st.expander('🗂️ Filters'):
+        col1, col2 = st.columns(2)
+        with col1:
+            date_from = st.date_input('From', value=None, key=f'{key}_from', disabled=not has_dates)
+        with col2:
+            date_to = st.date_input('To', value=None, key=f'{key}_to', disabled=not has_dates)
+        options = sermon_options()
+        video_ids = st.multiselect('Sermons', list(options), format_func=options.get, key=f'{key}_videos')
+    return {'date_from': date_from, 'date_to': date_to, 'video_ids': video_ids or None}
+
+def build_prompt(index, query, top_k, qvec, filters):
+    """(prompt, sources) for a question, with context from hybrid retrieval"""
+    conn = get_conn()
+    try:
+        return rag.build_prompt(conn, index, query, top_k, qvec, filters, get_transcript_cache())
+    finally:
+        conn.close()
+
+# Open the live index and warm its query encoder before the first search
+try:
+    retrieval.get_index()
+except NotChunkKeyed as e:
+    st.error(f'⚠️ {e}')
+    st.stop()
+
 # Header - simpler in embed mode
 if not is_embedded:
     st.markdown("<h1 style='text-align: center; font-size: 3.5em; margin-bottom: 10px;'>📖 SermonsKB</h1>", unsafe_allow_html=True)
@@ -139,24 +228,22 @@ if not is_embedded:
 
 # Mode selector - show in main area if embedded, otherwise in sidebar
 if is_embedded:
-    tab = st.radio('Search Mode', ['AI Chat', 'Semantic Search', 'Keyword Search'], horizontal=True, label_visibility="collapsed")
+    tab = st.radio('Search Mode', ['AI Chat', 'Hybrid Search', 'Semantic Search', 'Keyword Search'], horizontal=True, label_visibility="collapsed")
 else:
     # Sidebar
     with st.sidebar:
         st.markdown("### 🔍 Search Mode")
-        tab = st.radio('Search Mode', ['AI Chat', 'Semantic Search', 'Keyword Search'], label_visibility="collapsed")
+        tab = st.radio('Search Mode', ['AI Chat', 'Hybrid Search', 'Semantic Search', 'Keyword Search'], label_visibility="collapsed")
         
         st.markdown("---")
         st.markdown("### 📊 Statistics")
         
-        # Get stats
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute('SELECT COUNT(*) FROM sermons')
-        total = c.fetchone()[0]
-        c.execute('SELECT COUNT(*) FROM sermons WHERE transcript IS NOT NULL AND LENGTH(transcript) > 0')
-        with_transcripts = c.fetchone()[0]
+        # Get stats (one row kept current by triggers; see scripts/corpus_stats.py)
+        conn = get_conn()
+        stats = read_stats(conn)
         conn.close()
+        total = stats['videos']
+        with_transcripts = stats['with_transcript']
         
         col1, col2 = st.columns(2)
         with col1:
@@ -172,16 +259,56 @@ else:
         st.caption("Search through 636+ sermon transcripts using AI-powered semantic search and get intelligent answers to your questions.")
         st.caption("Built with Streamlit, OpenAI, and FAISS.")
 
-def keyword_search(q, limit=10):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT video_id, title, published_at, snippet(sermons, -1, '<b>', '</b>', '...', 100) FROM sermons WHERE sermons MATCH ? LIMIT ?;", (q, limit))
-    return cur.fetchall()
+def keyword_search(q, limit=10, cursor=None):
+    """(rows, next page cursor, total hits) for one page of keyword results"""
+    conn = get_conn()
+    try:
+        rows, next_cursor = retrieval.keyword_page(conn, q, limit, cursor)
+        return rows, next_cursor, retrieval.keyword_count(conn, q)
+    finally:
+        conn.close()
+
+def scripture_references(conn, chunk_ids):
+    """({chunk_id: 'Romans 8:28 · John 3:16'}, facet caption) for a page of results"""
+    refs = scripture.chunk_references(conn, chunk_ids)
+    labels = {chunk_id: ' · '.join(scripture.format_reference(ref) for ref in found)
+              for chunk_id, found in refs.items() if found}
+    facet = scripture.reference_facet(refs)
+    caption = '📖 Scripture in these results: ' + ' · '.join(f'{label} ({n})' for label, n in facet) if facet else None
+    return labels, caption
+
+def verse_lookup(q, limit):
+    """(labels of the references in q, total citations, passages citing them) or None"""
+    refs = [ref for _, ref in scripture.parse_references(q, strict=False)]
+    if not refs:
+        return None
+    conn = get_conn()
+    try:
+        if not scripture.has_references(conn):
+            return None
+        total, chunks = scripture.citing_chunks(conn, refs, limit)
+        info = retrieval.video_info(conn, [video_id for _, video_id, _, _ in chunks])
+        cache = get_transcript_cache()
+        passages = []
+        for _, video_id, offset, found in chunks:
+            title, pub = info.get(video_id, (video_id, ''))
+            # Preview from the citation on: the verse is usually read out right after it
+            passages.append((title, pub, video_id, ' · '.join(scripture.format_reference(ref) for ref in found),
+                             cache.chunk_text(conn, video_id, offset, offset + 400)))
+    finally:
+        conn.close()
+    return [scripture.format_reference(ref) for ref in refs], total, passages
+
+def next_keyword_page(cursor):
+    st.session_state.kw_cursors.append(cursor)
+
+def previous_keyword_page():
+    st.session_state.kw_cursors.pop()
 
 if tab == 'Keyword Search':
     if not is_embedded:
         st.markdown("### 🔎 Keyword Search")
-        st.caption("Fast full-text search across all sermon transcripts")
+        st.caption("Fast full-text search across all sermon passages")
     
     col1, col2 = st.columns([4, 1])
     with col1:
@@ -190,67 +317,99 @@ if tab == 'Keyword Search':
         limit = st.number_input('Results', 1, 50, 10, label_visibility="collapsed")
     
     if q and q.strip():
-        rows = keyword_search(q, limit)
-        st.success(f'✨ Found {len(rows)} results')
+        # Cursors of the pages visited so far; a new search starts again at page 1
+        if st.session_state.get('kw_search') != (q, limit):
+            st.session_state.kw_search = (q, limit)
+            st.session_state.kw_cursors = [None]
+        cursors = st.session_state.kw_cursors
+        page = len(cursors) - 1
+        # A scripture reference ("Romans 8:28", "1 Cor 13") is answered from the verse index first
+        verses = verse_lookup(q, limit) if page == 0 else None
+        if verses:
+            labels, cited, passages = verses
+            with st.expander(f"📖 {', '.join(labels)}: cited {cited} times", expanded=True):
+                for title, pub, vid, found, text in passages:
+                    st.markdown(f'**{title}** ({pub}) · {found}')
+                    st.write(text + '...')
+                    st.markdown(f'[🎥 Watch on YouTube](https://www.youtube.com/watch?v={vid})')
         
-        for vid, title, pub, snippet in rows:
+        rows, next_cursor, total = keyword_search(q, limit, cursors[-1])
+        pages = max(1, -(-total // limit))
+        st.success(f'✨ Found {total} matching passages' + (f' · page {page + 1} of {pages}' if pages > 1 else ''))
+        conn = get_conn()
+        refs, facet = scripture_references(conn, [row[0] for row in rows])
+        conn.close()
+        if facet:
+            st.caption(facet)
+        
+        for i, (chunk_id, vid, title, pub, snippet) in enumerate(rows, page * limit + 1):
+            cited = f' · 📖 {refs[chunk_id]}' if chunk_id in refs else ''
             st.markdown(f'''
                 <div class="search-result">
-                    <h4 style="margin: 0 0 10px 0; color: #2c3e50;">{title}</h4>
-                    <p style="color: #6c757d; font-size: 14px; margin: 0 0 10px 0;">📅 {pub}</p>
+                    <h4 style="margin: 0 0 10px 0; color: #2c3e50;">{i}. {title}</h4>
+                    <p style="color: #6c757d; font-size: 14px; margin: 0 0 10px 0;">📅 {pub}{cited}</p>
                     <div style="margin: 10px 0;">{snippet}</div>
                     <a href="https://www.youtube.com/watch?v={vid}" target="_blank" style="color: #667eea; text-decoration: none; font-weight: 500;">🎥 Watch on YouTube →</a>
                 </div>
             ''', unsafe_allow_html=True)
+        
+        if pages > 1:
+            col1, col2, _ = st.columns([1, 1, 4])
+            with col1:
+                st.button('← Previous', on_click=previous_keyword_page, disabled=page == 0, use_container_width=True)
+            with col2:
+                st.button('Next →', on_click=next_keyword_page, args=(next_cursor,), disabled=next_cursor is None, use_container_width=True)
 
-elif tab == 'Semantic Search':
+elif tab in ('Hybrid Search', 'Semantic Search'):
+    hybrid = tab == 'Hybrid Search'
     if not is_embedded:
-        st.markdown("### 🧠 Semantic Search")
-        st.caption("Find sermons by meaning, not just keywords")
+        if hybrid:
+            st.markdown("### 🧭 Hybrid Search")
+            st.caption("Meaning and keywords together, ranked into one list")
+        else:
+            st.markdown("### 🧠 Semantic Search")
+            st.caption("Find sermons by meaning, not just keywords")
     
     col1, col2 = st.columns([4, 1])
     with col1:
         query = st.text_input('Describe what you\'re looking for:' if not is_embedded else '', placeholder="Describe what you're looking for...", label_visibility="collapsed" if is_embedded else "visible")
     with col2:
         top_k = st.number_input('Results', 1, 20, 5, label_visibility="collapsed")
+    filters = search_filters('search')
     
     if query:
         with st.spinner('🔍 Searching...'):
-            import numpy as np
-            import faiss
-            from sentence_transformers import SentenceTransformer
-
-            model = SentenceTransformer('all-MiniLM-L6-v2')
-            qvec = model.encode([query])[0].astype('float32')
-            
-            if not os.path.exists(FAISS_INDEX_PATH) or not os.path.exists(EMBEDDINGS_META):
+            index = retrieval.get_index()
+            qvec = encode_query(index, query) if index is not None else None
+            if index is None:
                 st.error('⚠️ FAISS index not found. Run scripts/build_embeddings.py')
-            else:
-                index = faiss.read_index(FAISS_INDEX_PATH)
-                D, I = index.search(np.array([qvec]), top_k)
-                with open(EMBEDDINGS_META, 'r') as f:
-                    meta = json.load(f)
-                conn = sqlite3.connect(DB_PATH)
-                cur = conn.cursor()
+            elif qvec is not None:
+                conn = get_conn()
+                if hybrid:
+                    hits = [chunk_id for chunk_id, _ in retrieval.hybrid_search(conn, index, query, top_k, qvec, **filters)]
+                else:
+                    # The index stores vectors under their chunk_id
+                    hits = [chunk_id for chunk_id, _, _ in index.search(qvec, top_k, **filters)]
+                texts = get_chunk_texts(conn, hits, get_transcript_cache())
+                refs, facet = scripture_references(conn, hits)
+                info = retrieval.video_info(conn, [video_id for video_id, _ in texts.values()])
+                conn.close()
                 
-                st.success(f'✨ Found {len(I[0])} relevant passages')
+                st.success(f'✨ Found {len(hits)} relevant passages')
+                if facet:
+                    st.caption(facet)
                 
-                for i, idx in enumerate(I[0], 1):
-                    if idx < 0 or idx >= len(meta):
+                for i, chunk_id in enumerate(hits, 1):
+                    if chunk_id not in texts:
                         continue
-                    chunk_id = meta[idx]['chunk_id']
-                    video_id = meta[idx]['video_id']
-                    cur.execute('SELECT title, published_at FROM sermons WHERE video_id = ? LIMIT 1', (video_id,))
-                    r = cur.fetchone()
-                    title = r[0] if r else video_id
-                    pub = r[1] if r else ''
-                    cur.execute('SELECT chunk_text FROM chunks WHERE chunk_id = ?', (chunk_id,))
-                    chunk_text = cur.fetchone()[0]
+                    video_id, chunk_text = texts[chunk_id]
+                    title, pub = info.get(video_id, (video_id, ''))
+                    cited = f' · 📖 {refs[chunk_id]}' if chunk_id in refs else ''
                     
                     st.markdown(f'''
                         <div class="search-result">
                             <h4 style="margin: 0 0 10px 0; color: #2c3e50;">{i}. {title}</h4>
-                            <p style="color: #6c757d; font-size: 14px; margin: 0 0 15px 0;">📅 {pub}</p>
+                            <p style="color: #6c757d; font-size: 14px; margin: 0 0 15px 0;">📅 {pub}{cited}</p>
                             <div style="color: #495057; line-height: 1.6; margin: 15px 0;">{chunk_text[:800]}...</div>
                             <a href="https://www.youtube.com/watch?v={video_id}" target="_blank" style="color: #667eea; text-decoration: none; font-weight: 500;">🎥 Watch on YouTube →</a>
                         </div>
@@ -272,94 +431,54 @@ else:  # AI Chat
         with col3:
             st.write("")  # spacing
             submit = st.button('🔍 Ask', type='primary', use_container_width=True)
+        filters = search_filters('chat')
         
         if query and submit:
-            with st.spinner('🔍 Searching sermons and generating answer...'):
-                import numpy as np
-                import faiss
-                from sentence_transformers import SentenceTransformer
+            with st.spinner('🔍 Searching sermons...'):
+                # Hybrid (bm25 + semantic) search to find relevant chunks
+                index = retrieval.get_index()
+                qvec = encode_query(index, query) if index is not None else None
+                cached = matched = None
+                if index is not None and qvec is not None:
+                    answers = get_answer_cache()
+                    mode = rag.cache_mode(filters)
+                    cached, matched = answers.get(index.key, query, mode, top_k, qvec)
+                    if cached is None:
+                        prompt, sources = build_prompt(index, query, top_k, qvec, filters)
+                    else:
+                        ans, sources = cached
+            
+            if index is None:
+                st.error('FAISS index not found. Run scripts/build_embeddings.py')
+            elif qvec is not None:
+                st.markdown("### 🤖 Answer")
+                answer_area = st.empty()
                 
-                # Semantic search to find relevant chunks
-                model = SentenceTransformer('all-MiniLM-L6-v2')
-                qvec = model.encode([query])[0].astype('float32')
+                # Sources are known as soon as retrieval is done; show them while the answer streams in
+                st.markdown("---")
+                st.markdown("### 📚 Source Sermons")
+                st.caption(f"Found {len(sources)} relevant sermon excerpts")
                 
-                if not os.path.exists(FAISS_INDEX_PATH) or not os.path.exists(EMBEDDINGS_META):
-                    st.error('FAISS index not found. Run scripts/build_embeddings.py')
-                else:
-                    index = faiss.read_index(FAISS_INDEX_PATH)
-                    D, I = index.search(np.array([qvec]), top_k)
-                    
-                    with open(EMBEDDINGS_META, 'r') as f:
-                        meta = json.load(f)
-                    
-                    conn = sqlite3.connect(DB_PATH)
-                    cur = conn.cursor()
-                    
-                    # Collect context from top chunks
-                    contexts = []
-                    sources = []
-                    for idx in I[0]:
-                        if idx < 0 or idx >= len(meta):
-                            continue
-                        chunk_id = meta[idx]['chunk_id']
-                        video_id = meta[idx]['video_id']
-                        
-                        cur.execute('SELECT title, published_at FROM sermons WHERE video_id = ? LIMIT 1', (video_id,))
-                        r = cur.fetchone()
-                        title = r[0] if r else video_id
-                        pub = r[1] if r else ''
-                        
-                        cur.execute('SELECT chunk_text FROM chunks WHERE chunk_id = ?', (chunk_id,))
-                        chunk_text = cur.fetchone()[0]
-                        
-                        contexts.append(chunk_text)
-                        sources.append((title, pub, video_id, chunk_text[:300]))
-                    
-                    # Generate answer using OpenAI
-                    context = "\n\n".join(contexts)
-                    prompt = f"""You are a helpful assistant that answers questions based on sermon transcripts. 
-Use the following sermon excerpts to answer the question. Be thorough and helpful, citing specific points from the sermons when relevant.
-
-CRITICAL INSTRUCTION: You MUST include multiple relevant Bible verses to support and reinforce your answer. For each verse:
-1. Provide the complete reference (e.g., John 3:16, Romans 8:28, Ephesians 2:8-9)
-2. Quote the full verse text
-3. Explain how it relates to the sermon content and the question
-
-Include at least 3-5 Bible verses in your response when relevant. Make the Scripture references prominent and easy to identify.
-
-If the sermons don't contain relevant information, say so honestly.
-
-Sermon Context:
-{context}
-
-Question: {query}
-
-Answer:"""
-                    
-                    import requests
-                    headers = {"Authorization": f"Bearer {OPENAI_API_KEY}", "Content-Type": "application/json"}
-                    data = {
-                        "model": "gpt-4o-mini", 
-                        "messages": [{"role": "user", "content": prompt}], 
-                        "max_tokens": 1200,
-                        "temperature": 0.7
-                    }
-                    r = requests.post('https://api.openai.com/v1/chat/completions', headers=headers, json=data)
-                    
-                    if r.status_code == 200:
-                        ans = r.json()['choices'][0]['message']['content']
-                        
-                        # Display answer in a nice box
-                        st.markdown("### 🤖 Answer")
-                        st.markdown(f'<div class="answer-box">{ans}</div>', unsafe_allow_html=True)
-                        
-                        st.markdown("---")
-                        st.markdown("### 📚 Source Sermons")
-                        st.caption(f"Found {len(sources)} relevant sermon excerpts")
-                        
-                        for i, (title, pub, vid, preview) in enumerate(sources, 1):
-                            with st.expander(f"📖 {i}. {title} ({pub})"):
-                                st.write(preview + "...")
-                                st.markdown(f'[🎥 Watch on YouTube](https://www.youtube.com/watch?v={vid})')
+                for i, (title, pub, vid, preview) in enumerate(sources, 1):
+                    with st.expander(f"📖 {i}. {title} ({pub})"):
+                        st.write(preview + "...")
+                        st.markdown(f'[🎥 Watch on YouTube](https://www.youtube.com/watch?v={vid})')
+                
+                if cached is None:
+                    try:
+                        with answer_area.container():
+                            ans = st.write_stream(get_chat_client().stream(prompt))
+                    except ChatAPIError as e:
+                        ans = None
+                        answer_area.error(f'❌ OpenAI request failed: {e}')
                     else:
-                        st.error(f'❌ OpenAI request failed: {r.text}')
+                        answers.put(index.key, query, mode, top_k, (ans, sources), qvec)
+                
+                if ans is not None:
+                    # Display the finished answer in a nice box
+                    with answer_area.container():
+                        st.markdown(f'<div class="answer-box">{ans}</div>', unsafe_allow_html=True)
+                        if matched == 'semantic':
+                            st.caption('♻️ Answer reused from a near-identical earlier question')
+                        elif matched:
+                            st.caption('♻️ Answer reused from an earlier identical question')
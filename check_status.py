@@ -1,7 +1,10 @@
+import sys
 import sqlite3
-c = sqlite3.connect("sermons.db").cursor()
-sermons = c.execute("SELECT COUNT(*) FROM sermons").fetchone()[0]
-chunks = c.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+sys.path.insert(0, "scripts")
+from corpus_stats import read_stats
+stats = read_stats(sqlite3.connect("sermons.db"))
+sermons = stats["videos"]
+chunks = stats["chunks"]
 print(f"Sermons: {sermons}")
 print(f"Chunks: {chunks}")
 print(f"Progress: {sermons}/673 videos ({sermons*100//673}%)")
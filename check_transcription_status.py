@@ -1,28 +1,23 @@
 """
 Check transcription progress and status
 """
+import sys
 import sqlite3
 from datetime import datetime
 
+sys.path.insert(0, 'scripts')
+from corpus_stats import read_stats
+
 def get_status():
     conn = sqlite3.connect('sermons.db')
     cursor = conn.cursor()
     
-    # Total videos
-    cursor.execute('SELECT COUNT(*) FROM sermons')
-    total = cursor.fetchone()[0]
-    
-    # Videos with transcripts
-    cursor.execute('SELECT COUNT(*) FROM sermons WHERE length(transcript) > 0')
-    completed = cursor.fetchone()[0]
-    
-    # Videos without transcripts
-    cursor.execute('SELECT COUNT(*) FROM sermons WHERE length(transcript) = 0 OR transcript IS NULL')
-    remaining = cursor.fetchone()[0]
-    
-    # Average transcript length
-    cursor.execute('SELECT AVG(length(transcript)) FROM sermons WHERE length(transcript) > 0')
-    avg_length = cursor.fetchone()[0] or 0
+    # Counters maintained by triggers, instead of four scans of every transcript
+    stats = read_stats(conn)
+    total = stats['videos']
+    completed = stats['with_transcript']
+    remaining = total - completed
+    avg_length = stats['transcript_chars'] / completed if completed else 0
     
     # Recently completed (last 10)
     cursor.execute('''
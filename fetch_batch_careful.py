@@ -12,6 +12,9 @@ from http.cookiejar import MozillaCookieJar
 from youtube_transcript_api import YouTubeTranscriptApi
 from youtube_transcript_api._errors import TranscriptsDisabled, NoTranscriptFound
 
+sys.path.insert(0, 'scripts')
+from chunking import ensure_chunks_table, set_transcript
+
 def create_session_with_cookies():
     """Create a requests session with cookies from cookies.txt"""
     session = requests.Session()
@@ -68,10 +71,11 @@ def fetch_transcript(video_id, api):
         return None
 
 def update_database(video_id, transcript):
-    """Update transcript in database and mark as available"""
+    """Update transcript (and its chunks) in database and mark as available"""
     conn = sqlite3.connect('sermons.db')
+    ensure_chunks_table(conn)
+    rows_updated = set_transcript(conn, video_id, transcript)
     c = conn.cursor()
-    c.execute('UPDATE sermons SET transcript = ? WHERE video_id = ?', (transcript, video_id))
     
     # Mark as available in status table
     c.execute('''
@@ -80,7 +84,6 @@ def update_database(video_id, transcript):
     ''', (video_id,))
     
     conn.commit()
-    rows_updated = c.rowcount
     conn.close()
     return rows_updated
 
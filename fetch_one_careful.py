@@ -9,6 +9,9 @@ import sys
 from youtube_transcript_api import YouTubeTranscriptApi
 from youtube_transcript_api._errors import TranscriptsDisabled, NoTranscriptFound
 
+sys.path.insert(0, 'scripts')
+from chunking import ensure_chunks_table, set_transcript
+
 def get_video_info(video_id):
     """Get video info from database"""
     conn = sqlite3.connect('sermons.db')
@@ -65,16 +68,11 @@ def fetch_transcript_careful(video_id):
         return None
 
 def update_database(video_id, transcript):
-    """Update transcript in database"""
+    """Update transcript in database (and its chunks)"""
     conn = sqlite3.connect('sermons.db')
-    c = conn.cursor()
-    c.execute('''
-        UPDATE sermons 
-        SET transcript = ?
-        WHERE video_id = ?
-    ''', (transcript, video_id))
+    ensure_chunks_table(conn)
+    rows_updated = set_transcript(conn, video_id, transcript)
     conn.commit()
-    rows_updated = c.rowcount
     conn.close()
     return rows_updated
 
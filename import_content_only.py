@@ -3,52 +3,34 @@
 Import existing transcript files that have actual content into the database
 """
 import os
+import sys
 import json
 import sqlite3
 from pathlib import Path
 
+sys.path.insert(0, 'scripts')
+from chunking import ensure_chunks_table, replace_chunks
+
 DB_PATH = 'sermons.db'
-CHUNK_SIZE = 1000
-CHUNK_OVERLAP = 200
 
 def ensure_db():
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
     c.execute("CREATE VIRTUAL TABLE IF NOT EXISTS sermons USING fts5(video_id, title, published_at, transcript);")
-    c.execute("CREATE TABLE IF NOT EXISTS chunks(chunk_id INTEGER PRIMARY KEY AUTOINCREMENT, video_id TEXT, chunk_text TEXT);")
+    ensure_chunks_table(conn)
     conn.commit()
     return conn
 
-def chunk_text(text, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
-    if not text or len(text.strip()) < 10:
-        return []
-    chunks = []
-    start = 0
-    L = len(text)
-    while start < L:
-        end = min(start + size, L)
-        chunk = text[start:end].strip()
-        if chunk:
-            chunks.append(chunk)
-        start = end - overlap
-        if start >= L:
-            break
-    return chunks
-
 def insert_into_db(conn, video_id, title, published_at, transcript):
     c = conn.cursor()
     c.execute("INSERT OR REPLACE INTO sermons(video_id, title, published_at, transcript) VALUES (?, ?, ?, ?)",
               (video_id, title, published_at, transcript))
     
     # Delete old chunks and create new ones
-    c.execute("DELETE FROM chunks WHERE video_id = ?", (video_id,))
-    if transcript and transcript.strip():
-        chunks = chunk_text(transcript)
-        for chunk in chunks:
-            c.execute("INSERT INTO chunks(video_id, chunk_text) VALUES (?, ?)", (video_id, chunk))
+    n_chunks = replace_chunks(conn, video_id, transcript)
     
     conn.commit()
-    return len(chunk_text(transcript)) if transcript else 0
+    return n_chunks
 
 def main():
     conn = ensure_db()
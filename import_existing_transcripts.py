@@ -7,45 +7,27 @@ and imports them into the sermons.db database, creating chunks for embedding.
 """
 
 import os
+import sys
 import json
 import sqlite3
 from tqdm import tqdm
 from dotenv import load_dotenv
 
+sys.path.insert(0, 'scripts')
+from chunking import ensure_chunks_table, replace_chunks
+
 load_dotenv()
 
 DB_PATH = os.getenv('DB_PATH', 'sermons.db')
-CHUNK_SIZE = 1000
-CHUNK_OVERLAP = 200
 
 def ensure_db():
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
     c.execute("CREATE VIRTUAL TABLE IF NOT EXISTS sermons USING fts5(video_id, title, published_at, transcript);")
-    c.execute("CREATE TABLE IF NOT EXISTS chunks(chunk_id INTEGER PRIMARY KEY AUTOINCREMENT, video_id TEXT, chunk_text TEXT);")
+    ensure_chunks_table(conn)
     conn.commit()
     return conn
 
-def chunk_text(text, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
-    if not text or not text.strip():
-        return []
-    
-    chunks = []
-    start = 0
-    L = len(text)
-    
-    while start < L:
-        end = min(start + size, L)
-        chunk = text[start:end].strip()
-        if chunk:  # Only add non-empty chunks
-            chunks.append(chunk)
-        start = end - overlap
-        if start < 0:
-            start = 0
-        if start >= L:
-            break
-    return chunks
-
 def insert_into_db(conn, video_id, title, published_at, transcript):
     c = conn.cursor()
     
@@ -53,21 +35,20 @@ def insert_into_db(conn, video_id, title, published_at, transcript):
     c.execute("SELECT rowid FROM sermons WHERE video_id = ?", (video_id,))
     if c.fetchone():
         print(f"Skipping {video_id} - already exists in database")
-        return
+        return 0
     
     c.execute("INSERT INTO sermons(video_id, title, published_at, transcript) VALUES (?, ?, ?, ?)",
               (video_id, title, published_at, transcript))
     
     # Create chunks if we have transcript content
-    if transcript and transcript.strip():
-        chunks = chunk_text(transcript)
-        for chunk in chunks:
-            c.execute("INSERT INTO chunks(video_id, chunk_text) VALUES (?, ?)", (video_id, chunk))
-        print(f"Imported {video_id}: {len(chunks)} chunks")
+    n_chunks = replace_chunks(conn, video_id, transcript)
+    if n_chunks:
+        print(f"Imported {video_id}: {n_chunks} chunks")
     else:
         print(f"Imported {video_id}: no transcript content")
     
     conn.commit()
+    return n_chunks
 
 def main():
     conn = ensure_db()
@@ -105,12 +86,8 @@ def main():
             if not transcript or len(transcript.strip()) < 10:
                 continue
                 
-            insert_into_db(conn, video_id, title, published_at, transcript)
+            chunks_count += insert_into_db(conn, video_id, title, published_at, transcript)
             imported_count += 1
-            
-            # Count chunks for this video
-            if transcript and transcript.strip():
-                chunks_count += len(chunk_text(transcript))
                 
         except Exception as e:
             print(f"Error processing {filename}: {e}")
@@ -118,7 +95,7 @@ def main():
     
     print(f"\nImport complete!")
     print(f"Imported {imported_count} transcripts with content")
-    print(f"Created approximately {chunks_count} text chunks")
+    print(f"Created {chunks_count} text chunks")
     
     # Show final database stats
     c = conn.cursor()
@@ -8,6 +8,9 @@ import sys
 import os
 import re
 
+sys.path.insert(0, 'scripts')
+from chunking import ensure_chunks_table, replace_chunks, set_transcript
+
 def parse_content(content):
     """
     Try to extract title, date, and transcript from pasted content
@@ -57,6 +60,7 @@ def parse_content(content):
 def import_transcript_from_text(video_id, content_text):
     """Import transcript directly from text (can include title and date)"""
     conn = sqlite3.connect('sermons.db')
+    ensure_chunks_table(conn)
     cursor = conn.cursor()
     
     # Parse the content
@@ -80,11 +84,7 @@ def import_transcript_from_text(video_id, content_text):
         final_title = title if title else existing_title
         final_date = date if date else existing_date
         
-        cursor.execute('''
-            UPDATE sermons 
-            SET transcript = ?, title = ?, published_at = ?
-            WHERE video_id = ?
-        ''', (transcript, final_title, final_date, video_id))
+        set_transcript(conn, video_id, transcript, title=final_title, published_at=final_date)
         
         print(f"✅ Updated existing video:")
     else:
@@ -96,6 +96,7 @@ def import_transcript_from_text(video_id, content_text):
             INSERT INTO sermons (video_id, title, published_at, transcript)
             VALUES (?, ?, ?, ?)
         ''', (video_id, final_title, final_date, transcript))
+        replace_chunks(conn, video_id, transcript)
         
         print(f"✅ Created new video entry:")
     
@@ -5,24 +5,18 @@ Monitor processing progress in real-time
 import sqlite3
 import time
 import os
+import sys
+
+sys.path.insert(0, 'scripts')
+from corpus_stats import read_stats
 
 DB_PATH = 'sermons.db'
 
 def get_stats():
     conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    
-    c.execute("SELECT COUNT(*) FROM sermons")
-    total_sermons = c.fetchone()[0]
-    
-    c.execute("SELECT COUNT(*) FROM sermons WHERE LENGTH(transcript) > 100")
-    with_transcripts = c.fetchone()[0]
-    
-    c.execute("SELECT COUNT(*) FROM chunks")
-    total_chunks = c.fetchone()[0]
-    
+    stats = read_stats(conn)
     conn.close()
-    return total_sermons, with_transcripts, total_chunks
+    return stats['videos'], stats['with_long_transcript'], stats['chunks']
 
 print("Monitoring database changes (press Ctrl+C to stop)...\n")
 prev_stats = None
@@ -8,6 +8,9 @@ import time
 import sqlite3
 from scripts.transcribe_google import download_and_transcribe_google
 
+sys.path.insert(0, 'scripts')
+from chunking import ensure_chunks_table, set_transcript
+
 def get_videos_needing_transcription(db_path='sermons.db'):
     """Get list of video IDs that need transcription"""
     conn = sqlite3.connect(db_path)
@@ -18,10 +21,10 @@ def get_videos_needing_transcription(db_path='sermons.db'):
     return video_ids
 
 def update_transcript(video_id, transcript, db_path='sermons.db'):
-    """Update transcript in database"""
+    """Update transcript in database (and its chunks)"""
     conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('UPDATE sermons SET transcript = ? WHERE video_id = ?', (transcript, video_id))
+    ensure_chunks_table(conn)
+    set_transcript(conn, video_id, transcript)
     conn.commit()
     conn.close()
 
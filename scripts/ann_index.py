@@ -0,0 +1,221 @@
+"""
+FAISS index types for the chunk embeddings.
+
+Index types (FAISS_INDEX_TYPE / `build_embeddings.py --index-type`):
+  flat-l2    exact L2 scan over raw vectors (previous behavior, default)
+  flat-ip    exact inner product over L2-normalized vectors (cosine similarity)
+  hnsw       HNSW graph, inner product on normalized vectors; no removals
+  ivf-flat   inverted lists with full vectors
+  ivf-sq8    inverted lists with 8-bit scalar-quantized vectors (4x smaller)
+  ivf-pq     inverted lists with product-quantized vectors (~16-30x smaller)
+
+All types except flat-l2 use normalized vectors, so queries must be normalized too;
+`prepare_query` does that based on the loaded index's metric. Every index is wrapped
+in an IndexIDMap2 keyed by chunk_id. IVF types are trained on (a sample of) the
+vectors being indexed and fall back to flat-ip while the corpus is too small to train.
+Incremental updates reuse the trained centroids; a `--full` build retrains them.
+
+`search_params` restricts a search to a set of chunk IDs (an IDSelector), so filters
+are applied while the index is scanned instead of by over-fetching and discarding.
+Small selections (EXACT_FILTER_MAX) are instead scored exactly with
+`exact_subset_search`, which is faster than walking a graph or many IVF lists for a
+handful of admitted vectors.
+
+`scripts/bench_index.py` compares recall, latency and size of the types.
+"""
+import os
+import math
+
+import numpy as np
+
+FAISS_INDEX_TYPE = os.getenv('FAISS_INDEX_TYPE', 'flat-l2')
+HNSW_M = int(os.getenv('FAISS_HNSW_M', '32'))
+HNSW_EF_CONSTRUCTION = int(os.getenv('FAISS_HNSW_EF_CONSTRUCTION', '200'))
+HNSW_EF_SEARCH = int(os.getenv('FAISS_HNSW_EF_SEARCH', '64'))
+IVF_NPROBE = int(os.getenv('FAISS_IVF_NPROBE', '16'))
+
+INDEX_TYPES = ('flat-l2', 'flat-ip', 'hnsw', 'ivf-flat', 'ivf-sq8', 'ivf-pq')
+
+# FAISS wants ~39 training points per centroid; PQ codebooks need 256 per subquantizer
+MIN_POINTS_PER_CENTROID = 39
+PQ_CODEBOOK_SIZE = 256
+MAX_TRAIN_POINTS = 100_000
+
+
+def normalizes(index_type):
+    return index_type != 'flat-l2'
+
+
+def supports_remove(index_type):
+    """HNSW graphs cannot drop vectors, so incremental removals need a rebuild"""
+    return index_type != 'hnsw'
+
+
+def ivf_nlist(n):
+    """Number of IVF lists for n vectors (~4*sqrt(n), enough points each to train)"""
+    return max(1, min(int(4 * math.sqrt(n)), n // MIN_POINTS_PER_CENTROID))
+
+
+def pq_subquantizers(d):
+    """Largest usual PQ code size that splits d into sub-vectors of at least 4 dims"""
+    for m in (96, 64, 48, 32, 24, 16, 12, 8, 4, 2, 1):
+        if d % m == 0 and d // m >= 4:
+            return m
+    return 1
+
+
+def as_vectors(embeddings, index_type):
+    """float32 C-contiguous copy of embeddings, normalized when the index type needs it"""
+    import faiss
+    vecs = np.array(embeddings, dtype='float32', order='C')
+    if normalizes(index_type) and len(vecs):
+        faiss.normalize_L2(vecs)
+    return vecs
+
+
+def effective_type(index_type, n):
+    """Index type actually built for n vectors: IVF types need enough points to train"""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"unknown index type {index_type!r} (expected one of {', '.join(INDEX_TYPES)})")
+    if index_type.startswith('ivf-'):
+        min_points = PQ_CODEBOOK_SIZE if index_type == 'ivf-pq' else 2 * MIN_POINTS_PER_CENTROID
+        if n < min_points or ivf_nlist(n) < 2:
+            return 'flat-ip'
+    return index_type
+
+
+def make_index(index_type, d, n):
+    """Empty (untrained) inner index of index_type for about n vectors of dimension d"""
+    import faiss
+    built = effective_type(index_type, n)
+    if built != index_type:
+        print(f"Only {n} vectors: too few to train {index_type}, using {built} for now.")
+        index_type = built
+    ip = faiss.METRIC_INNER_PRODUCT
+    if index_type == 'flat-l2':
+        return faiss.IndexFlatL2(d)
+    if index_type == 'flat-ip':
+        return faiss.IndexFlatIP(d)
+    if index_type == 'hnsw':
+        index = faiss.IndexHNSWFlat(d, HNSW_M, ip)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+        return index
+
+    nlist = ivf_nlist(n)
+    quantizer = faiss.IndexFlatIP(d)
+    if index_type == 'ivf-flat':
+        index = faiss.IndexIVFFlat(quantizer, d, nlist, ip)
+    elif index_type == 'ivf-sq8':
+        index = faiss.IndexIVFScalarQuantizer(quantizer, d, nlist, faiss.ScalarQuantizer.QT_8bit, ip)
+    else:
+        index = faiss.IndexIVFPQ(quantizer, d, nlist, pq_subquantizers(d), 8, ip)
+    index.nprobe = min(IVF_NPROBE, nlist)
+    return index
+
+
+def needs_training(index_type):
+    return index_type.startswith('ivf-')
+
+
+def training_sample(vectors, seed=0):
+    """Up to MAX_TRAIN_POINTS rows of vectors (works on np.memmap without reading it all)"""
+    if len(vectors) <= MAX_TRAIN_POINTS:
+        return np.ascontiguousarray(vectors)
+    rng = np.random.default_rng(seed)
+    return np.ascontiguousarray(vectors[np.sort(rng.choice(len(vectors), MAX_TRAIN_POINTS, replace=False))])
+
+
+def new_index(index_type, d, n, train_sample=None):
+    """Empty IndexIDMap2 of index_type for about n vectors, trained on train_sample if needed"""
+    import faiss
+    index = make_index(index_type, d, n)
+    if not index.is_trained:
+        index.train(train_sample)
+    return faiss.IndexIDMap2(index)
+
+
+class NotChunkKeyed(RuntimeError):
+    """An index whose search results are row positions rather than chunk IDs"""
+
+
+def require_id_map(index, path):
+    """Return index if it stores vectors under chunk IDs (IndexIDMap/IndexIDMap2), else raise NotChunkKeyed"""
+    import faiss
+    # IndexIDMap2 derives from IndexIDMap
+    if not isinstance(index, faiss.IndexIDMap):
+        raise NotChunkKeyed(f"{path} is a plain {type(index).__name__}, whose results are row positions, "
+                            "not chunk IDs. Rebuild it with `python scripts/build_embeddings.py --full`.")
+    return index
+
+
+def build_index(index_type, vectors, ids, seed=0):
+    """Train (if needed) and fill an IndexIDMap2 of index_type.
+
+    vectors must already come from as_vectors(..., index_type).
+    """
+    sample = training_sample(vectors, seed) if needs_training(effective_type(index_type, len(vectors))) else None
+    index = new_index(index_type, vectors.shape[1], len(vectors), sample)
+    index.add_with_ids(vectors, np.asarray(ids, dtype='int64'))
+    return index
+
+
+def prepare_query(index, qvecs):
+    """2-d float32 query batch, normalized if the index compares by inner product"""
+    import faiss
+    q = np.array(qvecs, dtype='float32', order='C', ndmin=2)
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        faiss.normalize_L2(q)
+    return q
+
+
+# Filtered searches widen the search by up to this factor to make up for skipped vectors
+MAX_FILTER_WIDEN = 32
+# Filters admitting at most this many vectors are searched exactly over just those
+EXACT_FILTER_MAX = int(os.getenv('FAISS_EXACT_FILTER_MAX', '4096'))
+
+
+def search_params(index, selector, fraction=1.0):
+    """SearchParameters restricting a search of `index` to the IDs in `selector`.
+
+    fraction is the share of vectors the selector admits. HNSW and IVF only score the
+    vectors they visit, so efSearch / nprobe are scaled up by 1/fraction (capped) to
+    still find k admitted neighbours; the index's own settings are the floor.
+    """
+    import faiss
+    widen = min(MAX_FILTER_WIDEN, max(1.0, 1.0 / max(fraction, 1e-9)))
+    inner = faiss.downcast_index(index.index) if hasattr(index, 'id_map') else index
+    if isinstance(inner, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=int(inner.hnsw.efSearch * widen))
+    if isinstance(inner, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=min(inner.nlist, int(math.ceil(inner.nprobe * widen))))
+    return faiss.SearchParameters(sel=selector)
+
+
+def exact_subset_search(index, qvecs, ids, k):
+    """Exact (D, I) over only the vectors with the given IDs, like index.search.
+
+    For small filtered selections this beats a selector-restricted HNSW or IVF search,
+    which has to walk past many excluded vectors. Returns None when the index cannot
+    reconstruct its vectors (IVF types).
+    """
+    import faiss
+    ids = np.asarray(ids, dtype='int64')
+    try:
+        vectors = index.reconstruct_batch(ids)
+    except RuntimeError:
+        return None
+    q = prepare_query(index, qvecs)
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        scores = q @ vectors.T
+        order = np.argsort(-scores, axis=1, kind='stable')[:, :k]
+    else:
+        scores = (q * q).sum(1, keepdims=True) - 2 * q @ vectors.T + (vectors * vectors).sum(1)
+        order = np.argsort(scores, axis=1, kind='stable')[:, :k]
+    D = np.take_along_axis(scores, order, axis=1).astype('float32')
+    I = ids[order]
+    if order.shape[1] < k:
+        pad = k - order.shape[1]
+        D = np.pad(D, ((0, 0), (0, pad)), constant_values=np.nan)
+        I = np.pad(I, ((0, 0), (0, pad)), constant_values=-1)
+    return D, I
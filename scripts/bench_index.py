@@ -0,0 +1,95 @@
+"""
+Compare FAISS index types on the current chunk embeddings.
+
+Usage:
+  python scripts/bench_index.py
+  python scripts/bench_index.py --types flat-ip,hnsw,ivf-sq8,ivf-pq --k 10 --queries 500
+
+For every index type it reports:
+ - build time and serialized index size
+ - recall@k against an exact search with the same metric (flat-l2 for flat-l2,
+   flat-ip on normalized vectors for the others)
+ - p50/p95 latency of single-query searches, as the app issues them
+
+Vectors come from the embedding cache (run `build_embeddings.py` first, otherwise
+every chunk is embedded now). Chunk texts are streamed in batches; only the vectors
+are held in memory. Queries are chunk vectors sampled from the corpus with
+themselves excluded from the results, which mimics a query landing near the data.
+"""
+import time
+import sqlite3
+import argparse
+
+import numpy as np
+
+from ann_index import INDEX_TYPES, as_vectors, build_index, effective_type
+from build_embeddings import DB_PATH, close_build, current_model, iter_embedded_batches
+
+
+def exact_neighbors(vectors, queries, query_ids, k, metric_type):
+    import faiss
+    index = faiss.IndexFlatL2(vectors.shape[1]) if metric_type == 'flat-l2' else faiss.IndexFlatIP(vectors.shape[1])
+    index.add(vectors)
+    _, I = index.search(queries, k + 1)
+    return [[i for i in row if i != q][:k] for row, q in zip(I, query_ids)]
+
+
+def bench(index_type, vectors, ids, query_pos, k):
+    import faiss
+    vecs = as_vectors(vectors, index_type)
+    start = time.perf_counter()
+    index = build_index(index_type, vecs, ids)
+    build_time = time.perf_counter() - start
+    size = faiss.serialize_index(index).nbytes
+
+    queries = vecs[query_pos]
+    truth = exact_neighbors(vecs, queries, query_pos, k, 'flat-l2' if index_type == 'flat-l2' else 'flat-ip')
+    id_of = np.asarray(ids)
+    latencies = []
+    recalls = []
+    for q, pos, want in zip(queries, query_pos, truth):
+        start = time.perf_counter()
+        _, I = index.search(q.reshape(1, -1), k + 1)
+        latencies.append(time.perf_counter() - start)
+        got = [i for i in I[0] if i >= 0 and i != id_of[pos]][:k]
+        recalls.append(len(set(got) & set(id_of[want].tolist())) / max(1, len(want)))
+    lat = np.array(latencies) * 1000
+    return build_time, size, float(np.mean(recalls)), np.percentile(lat, 50), np.percentile(lat, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recall/latency/size benchmark of FAISS index types')
+    parser.add_argument('--types', default=','.join(INDEX_TYPES), help='Comma-separated index types')
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(DB_PATH)
+    ids, parts = [], []
+    try:
+        for batch_ids, vecs in iter_embedded_batches(conn):
+            ids.extend(batch_ids.tolist())
+            parts.append(np.asarray(vecs, dtype='float32'))
+    finally:
+        close_build()
+    conn.close()
+    if not ids:
+        print(f"No chunks found in {DB_PATH}.")
+        return
+    vectors = np.vstack(parts)
+    rng = np.random.default_rng(args.seed)
+    query_pos = rng.choice(len(ids), min(args.queries, len(ids)), replace=False)
+    print(f"{len(ids)} vectors ({vectors.shape[1]}-d, {current_model()}), "
+          f"{len(query_pos)} queries, recall@{args.k}\n")
+
+    print(f"{'type':<10} {'built as':<10} {'build s':>8} {'size MB':>8} {'recall':>7} {'p50 ms':>7} {'p95 ms':>7}")
+    for index_type in args.types.split(','):
+        built = effective_type(index_type, len(ids))
+        build_time, size, recall, p50, p95 = bench(index_type, vectors, ids, query_pos, args.k)
+        print(f"{index_type:<10} {built:<10} {build_time:>8.2f} {size / 1e6:>8.2f} {recall:>7.1%} "
+              f"{p50:>7.3f} {p95:>7.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark local encoder backends against the current torch model.
+
+Usage:
+  python scripts/bench_local_encoder.py
+  python scripts/bench_local_encoder.py --sample 2000 --backends torch,onnx,onnx-int8 --workers 1,4
+
+Encodes a sample of chunk texts from `sermons.db` once with the baseline
+(torch, 1 process) and then with every backend/worker combination, and reports:
+ - throughput (chunks/s) and speedup over the baseline
+ - cosine similarity to the baseline vectors (mean / 1st percentile / min)
+ - neighbor agreement: overlap of each chunk's top-k neighbors within the sample
+
+Model load time is excluded from throughput: each configuration first encodes the
+whole sample once untimed, which loads the model in every pool worker. With more than
+one worker the sample is split into one shard per worker, so the pool is used even
+for samples smaller than SHARD_SIZE.
+"""
+import os
+import time
+import sqlite3
+import argparse
+
+import numpy as np
+
+from chunking import iter_chunk_texts
+from local_encoder import BACKENDS, LOCAL_EMBED_BATCH_SIZE, LOCAL_EMBED_MODEL, LocalEncoder
+
+DB_PATH = os.getenv('DB_PATH', 'sermons.db')
+
+
+def sample_texts(n, seed=0):
+    conn = sqlite3.connect(DB_PATH)
+    texts = [text for batch in iter_chunk_texts(conn) for _, _, text in batch]
+    conn.close()
+    if len(texts) > n:
+        rng = np.random.default_rng(seed)
+        texts = [texts[i] for i in sorted(rng.choice(len(texts), n, replace=False))]
+    return texts
+
+
+def normalize(vecs):
+    return vecs / np.maximum(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12)
+
+
+def top_k(unit, k):
+    sims = unit @ unit.T
+    np.fill_diagonal(sims, -np.inf)
+    return np.argsort(-sims, axis=1)[:, :k]
+
+
+def timed_encode(encoder, texts):
+    if encoder.workers > 1:
+        encoder.shard_size = max(1, -(-len(texts) // encoder.workers))
+    # Warm-up with the same sharded call, so every worker has loaded its model
+    encoder.encode(texts, show_progress=False)
+    start = time.perf_counter()
+    vecs = encoder.encode(texts, show_progress=False)
+    return vecs, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare local encoder backends for speed and agreement')
+    parser.add_argument('--model', default=LOCAL_EMBED_MODEL)
+    parser.add_argument('--sample', type=int, default=1000, help='Chunks to encode per configuration')
+    parser.add_argument('--backends', default=','.join(BACKENDS))
+    parser.add_argument('--workers', default=f"1,{max(1, os.cpu_count() or 1)}",
+                        help='Comma-separated worker counts to try')
+    parser.add_argument('--batch-size', type=int, default=LOCAL_EMBED_BATCH_SIZE)
+    parser.add_argument('--k', type=int, default=10, help='Neighbors compared for agreement')
+    args = parser.parse_args()
+
+    texts = sample_texts(args.sample)
+    if not texts:
+        print("No chunks found. Run rebuild_chunks first.")
+        return
+    print(f"Benchmarking {args.model} on {len(texts)} chunks ({os.cpu_count()} CPUs)\n")
+
+    with LocalEncoder(args.model, 'torch', 1, args.batch_size) as baseline:
+        base_vecs, base_time = timed_encode(baseline, texts)
+    base_unit = normalize(base_vecs)
+    base_nn = top_k(base_unit, args.k)
+
+    print(f"{'backend':<10} {'workers':>7} {'chunks/s':>9} {'speedup':>8} "
+          f"{'cos mean':>9} {'cos p1':>8} {'cos min':>8} {f'top{args.k}':>7}")
+    for backend in args.backends.split(','):
+        for workers in (int(w) for w in args.workers.split(',')):
+            if backend == 'torch' and workers == 1:
+                vecs, elapsed = base_vecs, base_time
+            else:
+                try:
+                    with LocalEncoder(args.model, backend, workers, args.batch_size) as encoder:
+                        vecs, elapsed = timed_encode(encoder, texts)
+                except Exception as e:
+                    print(f"{backend:<10} {workers:>7}  failed: {e}")
+                    continue
+            unit = normalize(vecs)
+            cos = np.sum(unit * base_unit, axis=1)
+            nn = top_k(unit, args.k)
+            overlap = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(nn, base_nn)])
+            print(f"{backend:<10} {workers:>7} {len(texts) / elapsed:>9.1f} {base_time / elapsed:>7.2f}x "
+                  f"{cos.mean():>9.4f} {np.percentile(cos, 1):>8.4f} {cos.min():>8.4f} {overlap:>7.1%}")
+
+
+if __name__ == '__main__':
+    main()
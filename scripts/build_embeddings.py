@@ -2,85 +2,278 @@
 Build embeddings for transcript chunks and create a FAISS index.
 
 Usage:
-  python scripts/build_embeddings.py
+  python scripts/build_embeddings.py          # incremental when an index already exists
+  python scripts/build_embeddings.py --full   # re-embed everything
+  python scripts/build_embeddings.py --index-type ivf-sq8
 
 Behavior:
- - Reads `chunks` table from `sermons.db`.
+ - Reads `chunks` from `sermons.db` (text is resolved from the transcript offsets).
  - Computes embeddings using OpenAI if `OPENAI_API_KEY` is set, otherwise uses `sentence-transformers` locally.
- - Builds a FAISS index and saves it to `faiss_index.faiss`.
- - Saves metadata mapping to `embeddings_meta.json`.
+   OpenAI requests are token-packed, concurrent and retried (`openai_embeddings.py`); the local
+   encoder can run an ONNX/int8 export across several processes (`local_encoder.py`).
+   Vectors already in the on-disk embedding cache (`embedding_cache.py`) for that model are reused.
+ - Stores vectors in a FAISS `IndexIDMap2` under their chunk_id.
+   `--index-type` picks exact flat, HNSW or IVF (flat/SQ8/PQ) indexes (`ann_index.py`);
+   `scripts/bench_index.py` reports their recall and latency. Without it, runs keep the
+   type recorded in the live manifest (FAISS_INDEX_TYPE only applies to the first build).
+ - Publishes the index, each vector's video (compact numpy arrays, `vector_meta.py`) and a
+   manifest (model, dimension, normalization/metric, index type, chunker version, last
+   processed `chunk_changes` seq) as a new
+   version under `indexes/`, then atomically points `indexes/CURRENT` at it (`index_store.py`).
+   A running app picks up the new version between requests.
+
+Chunks are streamed in batches of EMBED_BATCH_SIZE and added to the index as they
+are encoded, so memory does not grow with the corpus beyond the index itself.
+
+Incremental mode reads the `chunk_changes` log written by the chunking scripts and
+compares the IDs in the index with the IDs in `chunks`. Only new and changed chunks are
+embedded; deleted and changed chunks are removed from the index by ID. A full rebuild
+happens when there is no index or state yet, or the embedding model or index type changed.
 
 Note: Install dependencies from `requirements.txt`. FAISS and large transformer models can be resource-heavy.
 """
 import os
-import json
 import sqlite3
-import pickle
+import argparse
 from dotenv import load_dotenv
 load_dotenv()
 
+from chunking import CHUNKER_VERSION, get_chunk_texts, iter_chunk_texts, last_change_seq, read_chunk_changes
+from embedding_cache import EmbeddingCache
+from local_encoder import LOCAL_EMBED_BACKEND, LocalEncoder, model_label
+from vector_meta import VectorMeta
+from index_store import INDEX_DIR, current_manifest, current_paths, publish
+from ann_index import (FAISS_INDEX_TYPE, INDEX_TYPES, NotChunkKeyed, as_vectors, build_index, effective_type,
+                       needs_training, new_index, normalizes, require_id_map, supports_remove, training_sample)
+from encoders import provider_for
+
 DB_PATH = os.getenv('DB_PATH', 'sermons.db')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
-EMBEDDINGS_INDEX_PATH = os.getenv('FAISS_INDEX_PATH', 'faiss_index.faiss')
-EMBEDDINGS_META = os.getenv('EMBEDDINGS_META', 'embeddings_meta.json')
+OPENAI_EMBED_MODEL = 'text-embedding-3-small'
 
-def get_chunks():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT chunk_id, video_id, chunk_text FROM chunks")
-    return c.fetchall()
-
-def embed_texts_openai(texts):
-    import requests
-    headers = {"Authorization": f"Bearer {OPENAI_API_KEY}", "Content-Type": "application/json"}
-    url = "https://api.openai.com/v1/embeddings"
-    model = "text-embedding-3-small"
-    batch_size = 10
-    out = []
-    for i in range(0, len(texts), batch_size):
-        batch = texts[i:i+batch_size]
-        data = {"model": model, "input": batch}
-        r = requests.post(url, headers=headers, json=data)
-        r.raise_for_status()
-        j = r.json()
-        for item in j['data']:
-            out.append(item['embedding'])
-    return out
+# Chunks read, encoded and added to the index per step; bounds memory during a build
+EMBED_BATCH_SIZE = int(os.getenv('EMBED_BATCH_SIZE', '4096'))
+
+def embed_texts_openai(texts, on_batch=None):
+    from openai_embeddings import OpenAIEmbeddingClient
+    client = OpenAIEmbeddingClient(OPENAI_API_KEY, OPENAI_EMBED_MODEL)
+    return client.embed(texts, on_batch=on_batch)
+
+_local_encoder = None
 
 def embed_texts_local(texts):
-    from sentence_transformers import SentenceTransformer
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-    return model.encode(texts, show_progress_bar=True, convert_to_numpy=True).tolist()
+    # One encoder (and worker pool) for the whole build, not one per batch
+    global _local_encoder
+    if _local_encoder is None:
+        _local_encoder = LocalEncoder()
+    return _local_encoder.encode(texts)
+
+def current_model():
+    return OPENAI_EMBED_MODEL if OPENAI_API_KEY else model_label()
+
+_cache = None
+
+def embedding_cache():
+    # One cache (and its SQLite connection) for the whole build, closed by close_build()
+    global _cache
+    if _cache is None:
+        _cache = EmbeddingCache(current_model())
+    return _cache
+
+def close_build():
+    """Release the encoder's worker pool and the embedding cache"""
+    global _local_encoder, _cache
+    if _local_encoder is not None:
+        _local_encoder.close()
+        _local_encoder = None
+    if _cache is not None:
+        _cache.close()
+        _cache = None
+
+def embed_texts(texts):
+    """Embed texts with the configured model, reusing cached vectors"""
+    cache = embedding_cache()
+    if OPENAI_API_KEY:
+        # Checkpoint every finished request so an interrupted build resumes from the cache
+        label, encode = "OpenAI", lambda batch: embed_texts_openai(batch, on_batch=cache.put_many)
+    else:
+        label, encode = f"local sentence-transformers ({LOCAL_EMBED_BACKEND})", embed_texts_local
+
+    def encode_missing(batch):
+        print(f"Embedding {len(batch)} chunks with {label} ({len(texts) - len(batch)} from cache)")
+        return encode(batch)
+
+    return cache.cached_encode(texts, encode_missing)
+
+def build_faiss(embeddings, ids, index_type=FAISS_INDEX_TYPE):
+    return build_index(index_type, as_vectors(embeddings, index_type), ids)
+
+def load_state():
+    """Manifest of the live index version (or the legacy state file), None if there is none"""
+    return current_manifest()
 
-def build_faiss(embeddings):
+def save(index, conn, model, change_seq, index_type):
+    """Publish index and per-vector video arrays as a new version with its manifest"""
     import faiss
+    ids = faiss.vector_to_array(index.id_map)
+    videos = dict(conn.execute("SELECT chunk_id, video_id FROM chunks").fetchall())
+    published = dict(conn.execute("SELECT video_id, published_at FROM sermons").fetchall())
+    meta = VectorMeta.from_pairs(ids, [videos.get(int(chunk_id), '') for chunk_id in ids], published)
+    manifest = {
+        "model": model,
+        "provider": provider_for(model),
+        "dim": index.d,
+        "normalize": normalizes(index_type),
+        "metric": "ip" if normalizes(index_type) else "l2",
+        "index_type": index_type,
+        "chunker_version": CHUNKER_VERSION,
+        "count": index.ntotal,
+        "last_change_seq": change_seq,
+    }
+    version = publish(index, meta, manifest)
+    print(f"Published index version {version} in {INDEX_DIR}/")
+
+def iter_embedded_batches(conn, batch_size=EMBED_BATCH_SIZE):
+    """Yield (chunk_ids, float32 vectors) for every chunk, one batch at a time"""
     import numpy as np
-    vecs = np.array(embeddings).astype('float32')
-    d = vecs.shape[1]
-    index = faiss.IndexFlatL2(d)
-    index.add(vecs)
-    faiss.write_index(index, EMBEDDINGS_INDEX_PATH)
+    for batch in iter_chunk_texts(conn, batch_size):
+        ids = np.fromiter((row[0] for row in batch), dtype='int64', count=len(batch))
+        yield ids, embed_texts([row[2] for row in batch])
 
-def main():
-    rows = get_chunks()
-    if not rows:
+def full_build(conn, change_seq, index_type):
+    """Stream chunks through the encoder into a new index.
+
+    Flat and HNSW indexes take each batch as it is encoded. IVF indexes need training
+    first, so their vectors are spooled to a float32 memmap next to the index file,
+    trained on a sample and then added in slices.
+    """
+    import numpy as np
+    from tqdm import tqdm
+    n = conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+    if not n:
         print("No chunks found. Run fetch_and_store first.")
         return
-    ids = [r[0] for r in rows]
-    meta = [{"chunk_id": r[0], "video_id": r[1]} for r in rows]
-    texts = [r[2] for r in rows]
-    if OPENAI_API_KEY:
-        print("Embedding with OpenAI")
-        embeddings = embed_texts_openai(texts)
-    else:
-        print("Embedding with local sentence-transformers")
-        embeddings = embed_texts_local(texts)
-    build_faiss(embeddings)
-    # save meta (in order)
-    with open(EMBEDDINGS_META, 'w') as f:
-        json.dump(meta, f)
-    print("FAISS index and meta saved.")
+    built_type = effective_type(index_type, n)
+    spool = needs_training(built_type)
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    spool_path = os.path.join(INDEX_DIR, '.vectors.tmp')
+    index = buffer = vectors = None
+    ids = np.empty(n, dtype='int64')
+    filled = 0
+    try:
+        with tqdm(total=n, desc="Indexing chunks") as progress:
+            for batch_ids, vecs in iter_embedded_batches(conn):
+                vecs = as_vectors(vecs, built_type)
+                # Chunks written since the count was taken are left for the next run
+                keep = min(len(batch_ids), n - filled)
+                if spool:
+                    if buffer is None:
+                        buffer = np.memmap(spool_path, dtype='float32', mode='w+', shape=(n, vecs.shape[1]))
+                    buffer[filled:filled + keep] = vecs[:keep]
+                else:
+                    if index is None:
+                        index = new_index(built_type, vecs.shape[1], n)
+                    index.add_with_ids(vecs[:keep], batch_ids[:keep])
+                ids[filled:filled + keep] = batch_ids[:keep]
+                filled += keep
+                progress.update(keep)
+                if filled == n:
+                    break
+        if spool:
+            vectors = buffer[:filled]
+            index = new_index(built_type, vectors.shape[1], filled, training_sample(vectors))
+            for start in range(0, filled, EMBED_BATCH_SIZE):
+                end = min(start + EMBED_BATCH_SIZE, filled)
+                index.add_with_ids(np.ascontiguousarray(vectors[start:end]), ids[start:end])
+    finally:
+        # Drop the memmap views before removing the file (required on Windows)
+        buffer = vectors = None
+        if os.path.exists(spool_path):
+            os.remove(spool_path)
+    save(index, conn, current_model(), change_seq, built_type)
+    print(f"FAISS index ({built_type}, {index.ntotal} vectors) and meta saved.")
+
+def incremental_build(conn, state, change_seq):
+    """Embed only new/changed chunks and remove deleted/changed ones by ID.
+
+    Returns False when the index cannot be updated in place and needs a full build.
+    """
+    import faiss
+    import numpy as np
+    # A private, writable copy of the live index; the new state is published as a new version
+    path = current_paths()[1]
+    try:
+        index = require_id_map(faiss.read_index(path), path)
+    except NotChunkKeyed as e:
+        print(f"{e}\nRebuilding from scratch.")
+        return False
+    index_ids = set(faiss.vector_to_array(index.id_map).tolist())
+    db_ids = {row[0] for row in conn.execute("SELECT chunk_id FROM chunks")}
+
+    changes, _ = read_chunk_changes(conn, state.get('last_change_seq', 0))
+    changed = {chunk_id for chunk_id, (_, op) in changes.items() if op == 'upsert'}
+    to_remove = (index_ids - db_ids) | (changed & index_ids)
+    to_add = sorted((db_ids - index_ids) | (changed & db_ids))
+    index_type = state.get('index_type', 'flat-l2')
+    print(f"Incremental update: {len(to_add)} to embed, {len(to_remove)} to remove "
+          f"({len(index_ids)} vectors in index)")
+    if not to_add and not to_remove:
+        try:
+            has_dates = VectorMeta.load(current_paths()[2], mmap=True).has_dates
+        except FileNotFoundError:
+            has_dates = False
+        if has_dates:
+            print("Index already up to date.")
+            return True
+        # Versions built before search filters lack publish dates; republish without re-embedding
+        print("Index up to date; republishing to add publish dates for search filters.")
+    elif to_remove and not supports_remove(index_type):
+        print(f"{index_type} indexes cannot remove vectors; rebuilding from scratch.")
+        return False
+
+    if to_remove:
+        index.remove_ids(np.array(sorted(to_remove), dtype='int64'))
+    for start in range(0, len(to_add), EMBED_BATCH_SIZE):
+        batch = to_add[start:start + EMBED_BATCH_SIZE]
+        texts = get_chunk_texts(conn, batch)
+        add_ids = [chunk_id for chunk_id in batch if chunk_id in texts]
+        embeddings = embed_texts([texts[chunk_id][1] for chunk_id in add_ids])
+        index.add_with_ids(as_vectors(embeddings, index_type), np.array(add_ids, dtype='int64'))
+    save(index, conn, state['model'], change_seq, index_type)
+    print(f"FAISS index ({index_type}, {index.ntotal} vectors) and meta updated.")
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or update the FAISS index over transcript chunks')
+    parser.add_argument('--full', action='store_true', help='Re-embed every chunk and rewrite the index')
+    parser.add_argument('--index-type', choices=INDEX_TYPES,
+                        help='FAISS index type (see ann_index.py; default: that of the live index, '
+                             'else FAISS_INDEX_TYPE or flat-l2)')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(DB_PATH)
+    # Take the change-log position first; changes logged while we embed are picked up next run
+    change_seq = last_change_seq(conn)
+    live = load_state()
+    # Without --index-type, keep the type of the live index rather than reverting to the default
+    index_type = args.index_type or (live.get('index_type', 'flat-l2') if live else FAISS_INDEX_TYPE)
+    state = None if args.full else live
+    if state and state.get('model') != current_model():
+        print(f"Embedding model changed ({state.get('model')} -> {current_model()}); rebuilding from scratch.")
+        state = None
+    if state and args.index_type:
+        n_chunks = conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+        wanted = effective_type(args.index_type, n_chunks)
+        if state.get('index_type', 'flat-l2') != wanted:
+            print(f"Index type changed ({state.get('index_type', 'flat-l2')} -> {wanted}); rebuilding from scratch.")
+            state = None
+    try:
+        if not state or not incremental_build(conn, state, change_seq):
+            full_build(conn, change_seq, index_type)
+    finally:
+        close_build()
+    conn.close()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,551 @@
+"""
+Canonical transcript chunker shared by every ingest and rebuild script.
+
+Chunks are fixed-size character windows over the transcript (CHUNK_SIZE characters,
+CHUNK_OVERLAP characters shared with the previous window). Chunk IDs are derived from
+(chunker version, video_id, start offset, end offset) instead of AUTOINCREMENT, so
+re-chunking an unchanged transcript always yields the same IDs and the vectors already
+stored in the FAISS index stay valid.
+
+Any change to the splitting rules must change CHUNKER_VERSION (size and overlap are
+part of it already), which moves every chunk to a new ID.
+
+Chunks are stored as (video_id, start_offset, end_offset) only; their text is a slice
+of `sermons.transcript`, resolved through `TranscriptCache`, so the overlapping text is
+never stored twice.
+
+Chunk text is also indexed in the `chunks_fts` FTS5 table (rowid = chunk_id) for
+passage-level bm25 keyword search. It is an external-content table over the
+`chunk_texts` view, which slices each chunk out of the `sermons` row recorded in
+`transcript_state.sermon_rowid`, so only the index is stored and snippet() reads the
+text from the transcript. Removing entries from such a table needs the exact text
+that was indexed: `sync_chunks` reads it from the old `sermons` row (ingest inserts
+a new row, so the old one is still there) and checks it against the stored hash.
+When that row is gone or was overwritten in place, the whole index is rebuilt from
+the view instead (`rebuild_chunks_fts`); scripts that update a transcript in place
+use `set_transcript`, which removes the old entries first.
+
+Readers (the app and the API) never migrate the tables themselves: they call
+`check_chunks_schema` at startup and stop with a `ChunkSchemaError` asking for
+`scripts/rebuild_chunks.py` when the database predates the current layout.
+
+Chunk maintenance is incremental: `transcript_state` stores a hash of each video's
+transcript and the chunker version it was split with, and `sync_chunks` only re-splits
+a video when either differs. Every chunk insert/delete is appended to `chunk_changes`
+(seq, chunk_id, video_id, op) so downstream stages such as the embedding build can
+pick up exactly what changed since the last sequence number they processed.
+"""
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+CHUNKER_VERSION = f"chars1:{CHUNK_SIZE}/{CHUNK_OVERLAP}"
+
+# Chunk IDs are kept to 63 bits so they fit SQLite INTEGER and FAISS int64 IDs
+_ID_MASK = (1 << 63) - 1
+
+
+def chunk_spans(text, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """Return (start, end) character offsets of overlapping windows over text"""
+    if not text or not text.strip():
+        return []
+    if overlap >= size:
+        raise ValueError("overlap must be smaller than size")
+    spans = []
+    start = 0
+    L = len(text)
+    while start < L:
+        end = min(start + size, L)
+        spans.append((start, end))
+        if end == L:
+            break
+        start = end - overlap
+    return spans
+
+
+def chunk_text(text, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """Split text into overlapping chunks (list of strings)"""
+    return [text[start:end] for start, end in chunk_spans(text, size, overlap)]
+
+
+def make_chunk_id(video_id, start, end, version=CHUNKER_VERSION):
+    """Stable 63-bit chunk ID for a span of a video's transcript"""
+    key = f"{version}\x1f{video_id}\x1f{start}\x1f{end}".encode('utf-8')
+    digest = hashlib.blake2b(key, digest_size=8).digest()
+    return int.from_bytes(digest, 'big') & _ID_MASK
+
+
+def make_chunks(video_id, text):
+    """Chunk a transcript with the canonical settings.
+
+    Returns a list of (chunk_id, start_offset, end_offset, chunk_text).
+    """
+    return [(make_chunk_id(video_id, start, end), start, end, text[start:end])
+            for start, end in chunk_spans(text)]
+
+
+def transcript_hash(text):
+    return hashlib.sha256((text or '').encode('utf-8')).hexdigest()
+
+
+CHUNK_COLUMNS = ['chunk_id', 'video_id', 'start_offset', 'end_offset']
+
+
+def _create_chunks(c):
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS chunks (
+            chunk_id INTEGER PRIMARY KEY,
+            video_id TEXT NOT NULL,
+            start_offset INTEGER NOT NULL,
+            end_offset INTEGER NOT NULL
+        )
+    """)
+
+
+def _migrate_legacy_chunks(c, cols):
+    """Move a legacy `chunks` table (stored chunk_text, maybe no offsets) to the offset schema.
+
+    Rows that have offsets are kept under their IDs. Rows without offsets are logged as
+    deleted and their videos' transcript_state is cleared, so the next
+    rebuild_chunks.py run re-chunks them. Run VACUUM afterwards to reclaim the space.
+    """
+    now = datetime.utcnow().isoformat() + "Z"
+    c.execute("DROP INDEX IF EXISTS idx_chunks_video_id")
+    # Rebuilt from the migrated rows by ensure_chunks_table
+    c.execute("DROP TABLE IF EXISTS chunks_fts")
+    c.execute("ALTER TABLE chunks RENAME TO chunks_legacy")
+    _create_chunks(c)
+    if 'start_offset' in cols and 'end_offset' in cols:
+        c.execute("INSERT INTO chunks(chunk_id, video_id, start_offset, end_offset) "
+                  "SELECT chunk_id, video_id, start_offset, end_offset FROM chunks_legacy "
+                  "WHERE start_offset IS NOT NULL AND end_offset IS NOT NULL")
+        stale = "start_offset IS NULL OR end_offset IS NULL"
+    else:
+        stale = "1"
+    c.execute(f"INSERT INTO chunk_changes(chunk_id, video_id, op, changed_at) "
+              f"SELECT chunk_id, video_id, 'delete', ? FROM chunks_legacy WHERE {stale}", (now,))
+    c.execute(f"DELETE FROM transcript_state WHERE video_id IN (SELECT video_id FROM chunks_legacy WHERE {stale})")
+    c.execute("DROP TABLE chunks_legacy")
+
+
+_FTS_CONTENT = "content='chunk_texts'"
+
+
+def _create_chunks_fts(c):
+    """Create `chunks_fts` over the `chunk_texts` view and index the existing chunks"""
+    c.execute("""
+        CREATE VIEW IF NOT EXISTS chunk_texts AS
+        SELECT c.chunk_id AS chunk_id,
+               substr(s.transcript, c.start_offset + 1, c.end_offset - c.start_offset) AS text
+        FROM chunks c
+        JOIN transcript_state t ON t.video_id = c.video_id
+        JOIN sermons s ON s.rowid = t.sermon_rowid
+    """)
+    c.execute(f"CREATE VIRTUAL TABLE chunks_fts USING fts5(text, {_FTS_CONTENT}, "
+              "content_rowid = 'chunk_id', tokenize = 'porter unicode61')")
+    rebuild_chunks_fts(c.connection)
+
+
+def _sermon_text(c, rowid):
+    row = c.execute("SELECT transcript FROM sermons WHERE rowid = ?", (rowid,)).fetchone()
+    return (row[0] if row else None) or ''
+
+
+def _video_spans(c, video_id):
+    return c.execute("SELECT chunk_id, start_offset, end_offset FROM chunks WHERE video_id = ?",
+                     (video_id,)).fetchall()
+
+
+def _fts_insert(c, transcript, spans):
+    c.executemany("INSERT INTO chunks_fts(rowid, text) VALUES (?, ?)",
+                  [(chunk_id, transcript[start:end]) for chunk_id, start, end in spans])
+
+
+def _fts_remove(c, video_id, state):
+    """Remove a video's chunks from `chunks_fts` using the text they were indexed with.
+
+    state is its (transcript_hash, sermon_rowid) from transcript_state, or None. Returns
+    False when that text is no longer available (sermon row deleted or overwritten), in
+    which case the index needs rebuild_chunks_fts().
+    """
+    if state is None or state[1] is None:
+        # Nothing of this video is indexed
+        return True
+    transcript = _sermon_text(c, state[1])
+    if transcript_hash(transcript) != state[0]:
+        return False
+    c.executemany("INSERT INTO chunks_fts(chunks_fts, rowid, text) VALUES ('delete', ?, ?)",
+                  [(chunk_id, transcript[start:end]) for chunk_id, start, end in _video_spans(c, video_id)])
+    return True
+
+
+def rebuild_chunks_fts(conn):
+    """Re-index every chunk in `chunks_fts` from the transcripts. Does not commit.
+
+    FTS5's own 'rebuild' command cannot read a content view that joins another FTS5
+    table, so the entries are re-inserted here, reading each transcript once.
+    """
+    c = conn.cursor()
+    c.execute("INSERT INTO chunks_fts(chunks_fts) VALUES ('delete-all')")
+    videos = c.execute("SELECT video_id, sermon_rowid FROM transcript_state "
+                       "WHERE sermon_rowid IS NOT NULL").fetchall()
+    for video_id, rowid in videos:
+        _fts_insert(c, _sermon_text(c, rowid), _video_spans(c, video_id))
+
+
+def ensure_chunks_table(conn):
+    """Create the chunk tables, migrating a legacy text-storing `chunks` table"""
+    c = conn.cursor()
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS transcript_state (
+            video_id TEXT PRIMARY KEY,
+            transcript_hash TEXT NOT NULL,
+            chunker_version TEXT NOT NULL,
+            n_chunks INTEGER NOT NULL,
+            updated_at TEXT,
+            sermon_rowid INTEGER
+        )
+    """)
+    if 'sermon_rowid' not in [row[1] for row in c.execute("PRAGMA table_info(transcript_state)")]:
+        c.execute("ALTER TABLE transcript_state ADD COLUMN sermon_rowid INTEGER")
+        if c.execute("SELECT 1 FROM transcript_state LIMIT 1").fetchone():
+            c.executemany("UPDATE transcript_state SET sermon_rowid = ? WHERE video_id = ?",
+                          [(rowid, video_id) for video_id, rowid in sermon_rowids(conn).items()])
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS chunk_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            chunk_id INTEGER NOT NULL,
+            video_id TEXT,
+            op TEXT NOT NULL,
+            changed_at TEXT
+        )
+    """)
+    cols = [row[1] for row in c.execute("PRAGMA table_info(chunks)")]
+    if not cols:
+        _create_chunks(c)
+    elif cols != CHUNK_COLUMNS:
+        _migrate_legacy_chunks(c, cols)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_chunks_video_id ON chunks(video_id, start_offset)")
+    fts = c.execute("SELECT sql FROM sqlite_master WHERE name = 'chunks_fts'").fetchone()
+    if fts and _FTS_CONTENT not in fts[0]:
+        # Earlier versions stored a second copy of the chunk text in chunks_fts
+        c.execute("DROP TABLE chunks_fts")
+        fts = None
+    if not fts:
+        _create_chunks_fts(c)
+
+
+class ChunkSchemaError(RuntimeError):
+    """The chunk tables are missing or in an older layout than this code reads"""
+
+
+def check_chunks_schema(conn):
+    """Raise ChunkSchemaError unless ensure_chunks_table has brought the DB up to date"""
+    def columns(table):
+        return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+    problems = []
+    if columns('chunks') != CHUNK_COLUMNS:
+        problems.append("chunks has no offset columns" if columns('chunks') else "no chunks table")
+    if 'sermon_rowid' not in columns('transcript_state'):
+        problems.append("transcript_state is missing or outdated")
+    if not columns('chunk_changes'):
+        problems.append("no chunk_changes table")
+    fts = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'chunks_fts'").fetchone()
+    if not fts or _FTS_CONTENT not in fts[0]:
+        problems.append("chunks_fts is missing or stores its own copy of the text")
+    if problems:
+        raise ChunkSchemaError(f"The database's chunk tables are out of date ({'; '.join(problems)}). "
+                               "Run `python scripts/rebuild_chunks.py` to migrate them.")
+
+
+def _log_changes(c, video_id, chunk_ids, op, now):
+    c.executemany("INSERT INTO chunk_changes(chunk_id, video_id, op, changed_at) VALUES (?, ?, ?, ?)",
+                  [(chunk_id, video_id, op, now) for chunk_id in chunk_ids])
+
+
+def prepare_chunks(video_id, transcript, known_hash=None):
+    """Hash and split one transcript without touching the DB.
+
+    Picklable, so rebuilds can run it in worker processes. When known_hash matches
+    the transcript's hash the split is skipped and spans is None.
+
+    Returns (video_id, transcript_hash, spans) with spans a list of (chunk_id, start, end).
+    """
+    digest = transcript_hash(transcript)
+    if digest == known_hash:
+        return video_id, digest, None
+    spans = [(make_chunk_id(video_id, start, end), start, end)
+             for start, end in chunk_spans(transcript or '')]
+    return video_id, digest, spans
+
+
+def sermon_rowid(conn, video_id):
+    """rowid of the newest `sermons` row of one video, or None"""
+    # A phrase match on the video_id column uses the FTS index; the equality check
+    # drops rows whose ID merely tokenizes the same
+    phrase = 'video_id : "' + video_id.replace('"', '""') + '"'
+    try:
+        row = conn.execute("SELECT MAX(rowid) FROM sermons WHERE sermons MATCH ? AND video_id = ?",
+                           (phrase, video_id)).fetchone()
+        if row[0] is not None:
+            return row[0]
+    except sqlite3.OperationalError:
+        pass
+    return conn.execute("SELECT MAX(rowid) FROM sermons WHERE video_id = ?", (video_id,)).fetchone()[0]
+
+
+def sync_chunks(conn, video_id, transcript, force=False, prepared=None, rowid=None, fts_stale=None):
+    """Re-chunk one video if its transcript or the chunker version changed.
+
+    Old chunks of the video are replaced and the change is logged: every new chunk as
+    'upsert' (its text may differ even when the ID is unchanged) and every chunk that
+    disappeared as 'delete'. `prepared` is a prepare_chunks() result computed
+    elsewhere, and rowid the `sermons` row holding transcript (looked up when None).
+    `chunks_fts` is updated too; if the old entries cannot be removed precisely it is
+    rebuilt, or, when a set is passed as fts_stale, the video is added to it and the
+    caller rebuilds once at the end. Does not commit.
+
+    Returns (n_chunks, changed).
+    """
+    c = conn.cursor()
+    c.execute("SELECT transcript_hash, chunker_version, n_chunks, sermon_rowid FROM transcript_state "
+              "WHERE video_id = ?", (video_id,))
+    state = c.fetchone()
+    if prepared is None:
+        prepared = prepare_chunks(video_id, transcript)
+    _, digest, spans = prepared
+    if rowid is None:
+        rowid = sermon_rowid(conn, video_id)
+    transcript = transcript or ''
+    if state and not force and state[0] == digest and state[1] == CHUNKER_VERSION:
+        if rowid is not None and state[3] != rowid:
+            # Same text in a newer row (or not indexed yet): repoint the content view
+            if state[3] is None:
+                _fts_insert(c, transcript, _video_spans(c, video_id))
+            c.execute("UPDATE transcript_state SET sermon_rowid = ? WHERE video_id = ?", (rowid, video_id))
+        return state[2], False
+    if spans is None:
+        spans = prepare_chunks(video_id, transcript)[2]
+
+    now = datetime.utcnow().isoformat() + "Z"
+    precise = _fts_remove(c, video_id, state and (state[0], state[3]))
+    old_ids = {row[0] for row in c.execute("SELECT chunk_id FROM chunks WHERE video_id = ?", (video_id,))}
+    new_ids = [chunk_id for chunk_id, _, _ in spans]
+    c.execute("DELETE FROM chunks WHERE video_id = ?", (video_id,))
+    c.executemany(
+        "INSERT INTO chunks(chunk_id, video_id, start_offset, end_offset) VALUES (?, ?, ?, ?)",
+        [(chunk_id, video_id, start, end) for chunk_id, start, end in spans],
+    )
+    _log_changes(c, video_id, sorted(old_ids - set(new_ids)), 'delete', now)
+    _log_changes(c, video_id, new_ids, 'upsert', now)
+    c.execute("INSERT OR REPLACE INTO transcript_state(video_id, transcript_hash, chunker_version, n_chunks, "
+              "updated_at, sermon_rowid) VALUES (?, ?, ?, ?, ?, ?)",
+              (video_id, digest, CHUNKER_VERSION, len(spans), now, rowid))
+    if precise:
+        if rowid is not None:
+            _fts_insert(c, transcript, spans)
+    elif fts_stale is not None:
+        fts_stale.add(video_id)
+    else:
+        rebuild_chunks_fts(conn)
+    return len(spans), True
+
+
+SERMON_FIELDS = ('title', 'published_at')
+
+
+def set_transcript(conn, video_id, transcript, **fields):
+    """Overwrite a video's transcript in `sermons` in place and re-sync its chunks.
+
+    For scripts that UPDATE existing rows instead of inserting new ones: the old
+    `chunks_fts` entries are removed while the old text is still there. fields may
+    also set title and published_at. Does not commit; returns the rows updated.
+    """
+    unknown = set(fields) - set(SERMON_FIELDS)
+    if unknown:
+        raise ValueError(f"unknown sermons columns: {', '.join(sorted(unknown))}")
+    c = conn.cursor()
+    state = c.execute("SELECT transcript_hash, sermon_rowid FROM transcript_state WHERE video_id = ?",
+                      (video_id,)).fetchone()
+    if state and state[0] != transcript_hash(transcript) and _fts_remove(c, video_id, state):
+        # Nothing of the video is indexed now; sync_chunks indexes the new text
+        c.execute("UPDATE transcript_state SET sermon_rowid = NULL WHERE video_id = ?", (video_id,))
+    sets = ', '.join(f"{name} = ?" for name in ('transcript', *fields))
+    c.execute(f"UPDATE sermons SET {sets} WHERE video_id = ?", (transcript, *fields.values(), video_id))
+    updated = c.rowcount
+    if updated:
+        sync_chunks(conn, video_id, transcript)
+    return updated
+
+
+def replace_chunks(conn, video_id, transcript):
+    """Bring one video's chunks up to date after an ingest. Does not commit; returns the chunk count."""
+    return sync_chunks(conn, video_id, transcript)[0]
+
+
+def remove_video_chunks(conn, video_id, fts_stale=None):
+    """Drop the chunks and state of a video that is no longer in `sermons`. Does not commit.
+
+    fts_stale is as for sync_chunks.
+    """
+    c = conn.cursor()
+    state = c.execute("SELECT transcript_hash, sermon_rowid FROM transcript_state WHERE video_id = ?",
+                      (video_id,)).fetchone()
+    precise = _fts_remove(c, video_id, state)
+    old_ids = [row[0] for row in c.execute("SELECT chunk_id FROM chunks WHERE video_id = ?", (video_id,))]
+    c.execute("DELETE FROM chunks WHERE video_id = ?", (video_id,))
+    c.execute("DELETE FROM transcript_state WHERE video_id = ?", (video_id,))
+    if not precise:
+        if fts_stale is not None:
+            fts_stale.add(video_id)
+        else:
+            rebuild_chunks_fts(conn)
+    _log_changes(c, video_id, old_ids, 'delete', datetime.utcnow().isoformat() + "Z")
+    return len(old_ids)
+
+
+def last_change_seq(conn):
+    row = conn.execute("SELECT MAX(seq) FROM chunk_changes").fetchone()
+    return row[0] or 0
+
+
+def read_chunk_changes(conn, since_seq=0):
+    """Net chunk changes logged after since_seq.
+
+    Returns ({chunk_id: (video_id, op)}, last_seq) where op is the most recent
+    operation for that chunk ('upsert' or 'delete').
+    """
+    changes = {}
+    last_seq = since_seq
+    c = conn.cursor()
+    c.execute("SELECT seq, chunk_id, video_id, op FROM chunk_changes WHERE seq > ? ORDER BY seq", (since_seq,))
+    for seq, chunk_id, video_id, op in c:
+        changes[chunk_id] = (video_id, op)
+        last_seq = seq
+    return changes, last_seq
+
+
+def sermon_rowids(conn):
+    """Map video_id -> rowid of its newest `sermons` row.
+
+    Lookups by video_id on the FTS5 table scan every row, while rowid lookups are
+    direct, so readers resolve a video's rowid once and fetch transcripts by rowid.
+    Re-ingested videos can leave older rows behind; only the newest one counts.
+    """
+    c = conn.cursor()
+    c.execute("SELECT video_id, MAX(rowid) FROM sermons GROUP BY video_id")
+    return dict(c.fetchall())
+
+
+class TranscriptCache:
+    """Thread-safe LRU cache of transcripts used to resolve chunk offsets to text.
+
+    Holds no connection; callers pass their own (SQLite connections are per-thread).
+    Every lookup compares `last_change_seq` with the one the cache was filled at and
+    drops all entries when chunks changed, so a re-ingested transcript is never sliced
+    with the offsets of its new chunks.
+    """
+
+    def __init__(self, max_items=64):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._rowids = None
+        self._seq = None
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._rowids = None
+            self._seq = None
+
+    def _rowid(self, conn, video_id):
+        if self._rowids is None or video_id not in self._rowids:
+            # Newly ingested videos are picked up by refreshing the map
+            self._rowids = sermon_rowids(conn)
+        return self._rowids.get(video_id)
+
+    def get(self, conn, video_id):
+        seq = last_change_seq(conn)
+        with self._lock:
+            if seq != self._seq:
+                self._items.clear()
+                self._rowids = None
+                self._seq = seq
+            if video_id in self._items:
+                self._items.move_to_end(video_id)
+                return self._items[video_id]
+            rowid = self._rowid(conn, video_id)
+        transcript = ''
+        if rowid is not None:
+            row = conn.execute("SELECT transcript FROM sermons WHERE rowid = ?", (rowid,)).fetchone()
+            transcript = (row[0] if row else None) or ''
+        with self._lock:
+            # Not kept if another lookup saw newer chunks meanwhile
+            if self._seq == seq:
+                self._items[video_id] = transcript
+                while len(self._items) > self.max_items:
+                    self._items.popitem(last=False)
+        return transcript
+
+    def chunk_text(self, conn, video_id, start, end):
+        return self.get(conn, video_id)[start:end]
+
+
+_default_cache = TranscriptCache()
+
+
+def get_chunk_spans(conn, chunk_ids):
+    """Resolve chunk IDs to {chunk_id: (video_id, start_offset, end_offset)}; unknown IDs are left out"""
+    chunk_ids = [int(chunk_id) for chunk_id in chunk_ids]
+    out = {}
+    # Stay well below SQLite's bound-parameter limit
+    for i in range(0, len(chunk_ids), 500):
+        batch = chunk_ids[i:i + 500]
+        placeholders = ','.join('?' * len(batch))
+        rows = conn.execute(f"SELECT chunk_id, video_id, start_offset, end_offset FROM chunks "
+                            f"WHERE chunk_id IN ({placeholders}) ORDER BY video_id", batch).fetchall()
+        for chunk_id, video_id, start, end in rows:
+            out[chunk_id] = (video_id, start, end)
+    return out
+
+
+def get_chunk_texts(conn, chunk_ids, cache=None):
+    """Resolve chunk IDs to {chunk_id: (video_id, chunk_text)}; unknown IDs are left out"""
+    cache = cache or _default_cache
+    return {chunk_id: (video_id, cache.chunk_text(conn, video_id, start, end))
+            for chunk_id, (video_id, start, end) in get_chunk_spans(conn, chunk_ids).items()}
+
+
+def iter_chunk_texts(conn, batch_size=256):
+    """Yield lists of (chunk_id, video_id, chunk_text) over all chunks.
+
+    Walks chunks in (video_id, start_offset) order with keyset pagination, so each
+    transcript is read once and memory stays bounded by one batch and one transcript.
+    """
+    c = conn.cursor()
+    rowids = sermon_rowids(conn)
+    last = ('', -1)
+    current_video, transcript = None, ''
+    while True:
+        c.execute("SELECT chunk_id, video_id, start_offset, end_offset FROM chunks "
+                  "WHERE (video_id, start_offset) > (?, ?) ORDER BY video_id, start_offset LIMIT ?",
+                  (last[0], last[1], batch_size))
+        rows = c.fetchall()
+        if not rows:
+            return
+        batch = []
+        for chunk_id, video_id, start, end in rows:
+            if video_id != current_video:
+                current_video = video_id
+                row = c.execute("SELECT transcript FROM sermons WHERE rowid = ?",
+                                (rowids.get(video_id),)).fetchone()
+                transcript = (row[0] if row else None) or ''
+            batch.append((chunk_id, video_id, transcript[start:end]))
+        last = (rows[-1][1], rows[-1][2])
+        yield batch
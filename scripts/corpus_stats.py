@@ -0,0 +1,140 @@
+"""
+Corpus counters kept up to date by SQLite triggers, so status displays read one row
+instead of scanning every transcript.
+
+The `corpus_stats` table holds a single row:
+  videos                rows in `sermons`
+  with_transcript       of those, rows with a non-empty transcript
+  with_long_transcript  of those, rows with more than LONG_TRANSCRIPT_CHARS characters
+                        (what monitor_progress.py has always counted as transcribed)
+  transcript_chars      total transcript length (for averages)
+  chunks                rows in `chunks`
+
+`sermons` is an FTS5 virtual table, which cannot carry triggers, so the sermon
+triggers sit on its `sermons_content` table, where FTS5 stores each row. Every
+INSERT, UPDATE, DELETE or REPLACE on `sermons` reaches that table as a delete and/or
+an insert of whole rows, whichever script does it, so no ingest script has to
+maintain the counters itself. `chunks` gets its own insert/delete triggers.
+
+`read_stats` creates the table and triggers on first use, or replaces those of an
+older layout (one full scan to fill the counters), and falls back to counting
+directly when the database is read-only.
+`python scripts/corpus_stats.py --rebuild` recounts from scratch.
+"""
+import os
+import sqlite3
+import argparse
+
+DB_PATH = os.getenv('DB_PATH', 'sermons.db')
+
+STAT_COLUMNS = ('videos', 'with_transcript', 'with_long_transcript', 'transcript_chars', 'chunks')
+LONG_TRANSCRIPT_CHARS = 100
+
+
+def _table_exists(conn, name):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone() is not None
+
+
+def _transcript_column(conn):
+    """Column of sermons_content that stores the transcript (c0, c1, ... by declared order)"""
+    cols = [row[1] for row in conn.execute("PRAGMA table_info(sermons)")]
+    return f"c{cols.index('transcript')}"
+
+
+def _count(conn):
+    """Counters computed by scanning, as a dict"""
+    videos, with_transcript, with_long, chars = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(LENGTH(transcript) > 0), 0), COALESCE(SUM(LENGTH(transcript) > ?), 0), "
+        "COALESCE(SUM(LENGTH(transcript)), 0) FROM sermons", (LONG_TRANSCRIPT_CHARS,)).fetchone()
+    chunks = conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0] if _table_exists(conn, 'chunks') else 0
+    return dict(zip(STAT_COLUMNS, (videos, with_transcript, with_long, chars, chunks)))
+
+
+def _create_triggers(conn):
+    col = _transcript_column(conn)
+    length = f"LENGTH(COALESCE({{row}}.{col}, ''))"
+    for event, row, sign in (('INSERT', 'new', '+'), ('DELETE', 'old', '-')):
+        n = length.format(row=row)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS corpus_stats_sermons_{event.lower()} AFTER {event} ON sermons_content
+            BEGIN
+                UPDATE corpus_stats SET videos = videos {sign} 1,
+                                        with_transcript = with_transcript {sign} ({n} > 0),
+                                        with_long_transcript = with_long_transcript {sign} ({n} > {LONG_TRANSCRIPT_CHARS}),
+                                        transcript_chars = transcript_chars {sign} {n}
+                WHERE id = 1;
+            END""")
+    if _table_exists(conn, 'chunks'):
+        for event, sign in (('INSERT', '+'), ('DELETE', '-')):
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS corpus_stats_chunks_{event.lower()} AFTER {event} ON chunks
+                BEGIN
+                    UPDATE corpus_stats SET chunks = chunks {sign} 1 WHERE id = 1;
+                END""")
+
+
+def _stats_triggers(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' "
+                                           "AND name LIKE 'corpus_stats_%'")}
+
+
+def rebuild_stats(conn):
+    """(Re)create the table and triggers and recount everything. Commits."""
+    with conn:
+        for name in _stats_triggers(conn):
+            conn.execute(f"DROP TRIGGER {name}")
+        conn.execute("DROP TABLE IF EXISTS corpus_stats")
+        conn.execute("""
+            CREATE TABLE corpus_stats (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                videos INTEGER NOT NULL,
+                with_transcript INTEGER NOT NULL,
+                with_long_transcript INTEGER NOT NULL,
+                transcript_chars INTEGER NOT NULL,
+                chunks INTEGER NOT NULL
+            )""")
+        _create_triggers(conn)
+        stats = _count(conn)
+        conn.execute(f"INSERT INTO corpus_stats(id, {', '.join(STAT_COLUMNS)}) "
+                     f"VALUES (1, {', '.join('?' * len(STAT_COLUMNS))})",
+                     [stats[name] for name in STAT_COLUMNS])
+    return stats
+
+
+def ensure_stats(conn):
+    """Create the counters if missing or outdated, or finish them if `chunks` appeared since. Commits."""
+    triggers = _stats_triggers(conn)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(corpus_stats)")]
+    if columns[1:] != list(STAT_COLUMNS) or 'corpus_stats_sermons_insert' not in triggers:
+        rebuild_stats(conn)
+    elif 'corpus_stats_chunks_insert' not in triggers and _table_exists(conn, 'chunks'):
+        with conn:
+            _create_triggers(conn)
+            conn.execute("UPDATE corpus_stats SET chunks = (SELECT COUNT(*) FROM chunks) WHERE id = 1")
+
+
+def read_stats(conn):
+    """Corpus counters as a dict (see module docstring)"""
+    try:
+        ensure_stats(conn)
+    except sqlite3.OperationalError as e:
+        # Read-only database, or triggers refused on the shadow table (defensive mode)
+        print(f"corpus_stats unavailable ({e}); counting directly")
+        return _count(conn)
+    row = conn.execute(f"SELECT {', '.join(STAT_COLUMNS)} FROM corpus_stats WHERE id = 1").fetchone()
+    return dict(zip(STAT_COLUMNS, row))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show or rebuild the corpus counters')
+    parser.add_argument('--rebuild', action='store_true', help='Recount from scratch')
+    args = parser.parse_args()
+    conn = sqlite3.connect(DB_PATH)
+    stats = rebuild_stats(conn) if args.rebuild else read_stats(conn)
+    for name in STAT_COLUMNS:
+        print(f"{name:<17} {stats[name]:,}")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
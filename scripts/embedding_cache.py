@@ -0,0 +1,183 @@
+"""
+On-disk embedding cache keyed by (model name, normalized text hash).
+
+`build_embeddings.py` looks vectors up here before calling a model, so switching
+encoders back and forth or re-chunking only pays for text that was never embedded
+with that model. The app caches query vectors the same way, in a separate directory,
+only when QUERY_EMBEDDING_CACHE=1 (see `app/retrieval.py`).
+
+Layout, one directory per model under EMBEDDING_CACHE_DIR (default `embedding_cache/`):
+  <model>/vectors.f16    float16 rows, append-only, read through np.memmap
+  <model>/index.sqlite   text key -> row number, plus the vector dimension
+
+Writers serialize on the SQLite write lock (BEGIN IMMEDIATE) and append the vectors
+before committing their keys, so readers never see a key whose row is not on disk.
+Vectors come back as float32; float16 storage costs ~1e-3 relative precision.
+
+The vector file is append-only (readers memory-map it), so a cache is capped rather
+than evicted: once it holds max_entries vectors (EMBEDDING_CACHE_MAX_ENTRIES) new
+vectors are still returned but no longer stored. Delete the model's directory to
+start over.
+"""
+import os
+import re
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+
+import numpy as np
+
+EMBEDDING_CACHE_DIR = os.getenv('EMBEDDING_CACHE_DIR', 'embedding_cache')
+# About 0.75 GB of float16 vectors at 384 dimensions, 3 GB at 1536
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv('EMBEDDING_CACHE_MAX_ENTRIES', '1000000'))
+
+_LOOKUP_BATCH = 500
+
+
+def normalize_text(text):
+    """Collapse whitespace and apply NFC so trivially different copies share a key"""
+    return unicodedata.normalize('NFC', ' '.join((text or '').split()))
+
+
+def text_key(text):
+    return hashlib.blake2b(normalize_text(text).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _model_dir_name(model_name):
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name)
+
+
+class EmbeddingCache:
+    """Persistent vector cache for one embedding model"""
+
+    def __init__(self, model_name, cache_dir=None, max_entries=None):
+        self.model_name = model_name
+        self.max_entries = EMBEDDING_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.dir = os.path.join(cache_dir or EMBEDDING_CACHE_DIR, _model_dir_name(model_name))
+        os.makedirs(self.dir, exist_ok=True)
+        self.vectors_path = os.path.join(self.dir, 'vectors.f16')
+        self._db = sqlite3.connect(os.path.join(self.dir, 'index.sqlite'), timeout=30,
+                                   check_same_thread=False, isolation_level=None)
+        self._db.execute("CREATE TABLE IF NOT EXISTS entries(key TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta(name TEXT PRIMARY KEY, value TEXT)")
+        self._lock = threading.Lock()
+        self._mm = None
+        self._mm_rows = 0
+        self.dim = self._read_dim()
+
+    def _read_dim(self):
+        row = self._db.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+        return int(row[0]) if row else None
+
+    def _row_bytes(self):
+        return self.dim * 2
+
+    def _rows_on_disk(self):
+        if not self.dim or not os.path.exists(self.vectors_path):
+            return 0
+        return os.path.getsize(self.vectors_path) // self._row_bytes()
+
+    def _matrix(self, min_rows):
+        """Read-only memmap of the vector file covering at least min_rows rows"""
+        if self._mm is None or self._mm_rows < min_rows:
+            rows = self._rows_on_disk()
+            self._mm = np.memmap(self.vectors_path, dtype=np.float16, mode='r', shape=(rows, self.dim))
+            self._mm_rows = rows
+        return self._mm
+
+    def close(self):
+        with self._lock:
+            self._mm = None
+            self._db.close()
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def get_many(self, texts):
+        """Return a list with a float32 vector, or None on a miss, for each text"""
+        keys = [text_key(t) for t in texts]
+        found = {}
+        with self._lock:
+            if self.dim is None:
+                self.dim = self._read_dim()
+            if self.dim is None:
+                return [None] * len(texts)
+            unique = list(dict.fromkeys(keys))
+            for i in range(0, len(unique), _LOOKUP_BATCH):
+                batch = unique[i:i + _LOOKUP_BATCH]
+                placeholders = ','.join('?' * len(batch))
+                found.update(self._db.execute(
+                    f"SELECT key, row FROM entries WHERE key IN ({placeholders})", batch).fetchall())
+            if not found:
+                return [None] * len(texts)
+            mm = self._matrix(max(found.values()) + 1)
+            return [mm[found[k]].astype(np.float32) if k in found else None for k in keys]
+
+    def put_many(self, texts, vectors):
+        """Store vectors for texts (keys already present are left alone, none past max_entries)"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(texts) == 0:
+            return
+        keys = [text_key(t) for t in texts]
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                dim = self._read_dim()
+                if dim is None:
+                    dim = vectors.shape[1]
+                    self._db.execute("INSERT INTO meta(name, value) VALUES ('dim', ?)", (str(dim),))
+                elif dim != vectors.shape[1]:
+                    raise ValueError(f"cache for {self.model_name} holds {dim}-d vectors, got {vectors.shape[1]}-d")
+                self.dim = dim
+
+                new = {}
+                for i in range(0, len(keys), _LOOKUP_BATCH):
+                    batch = keys[i:i + _LOOKUP_BATCH]
+                    placeholders = ','.join('?' * len(batch))
+                    present = {row[0] for row in self._db.execute(
+                        f"SELECT key FROM entries WHERE key IN ({placeholders})", batch)}
+                    for j, key in enumerate(batch, i):
+                        if key not in present and key not in new:
+                            new[key] = j
+                start = self._rows_on_disk()
+                if len(new) > self.max_entries - start:
+                    new = dict(list(new.items())[:max(0, self.max_entries - start)])
+                if new:
+                    with open(self.vectors_path, 'ab') as f:
+                        # Drop a partial row left by an interrupted writer
+                        f.truncate(start * self._row_bytes())
+                        f.write(vectors[list(new.values())].astype(np.float16).tobytes())
+                    self._db.executemany("INSERT INTO entries(key, row) VALUES (?, ?)",
+                                         [(key, start + n) for n, key in enumerate(new)])
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def cached_encode(self, texts, encode_fn):
+        """Encode texts, calling encode_fn only for cache misses.
+
+        Returns a float32 array of shape (len(texts), dim). A cache that cannot be
+        written (e.g. read-only deploy) still returns the freshly computed vectors.
+        """
+        texts = list(texts)
+        cached = self.get_many(texts)
+        # Encode each distinct missing text once
+        missing = {}
+        for i, vec in enumerate(cached):
+            if vec is None:
+                missing.setdefault(text_key(texts[i]), []).append(i)
+        if missing:
+            todo = [texts[positions[0]] for positions in missing.values()]
+            fresh = np.asarray(encode_fn(todo), dtype=np.float32)
+            try:
+                self.put_many(todo, fresh)
+            except (OSError, sqlite3.Error) as e:
+                print(f"Embedding cache not updated: {e}")
+            for positions, vec in zip(missing.values(), fresh):
+                for i in positions:
+                    cached[i] = vec
+        if not cached:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return np.vstack(cached).astype(np.float32, copy=False)
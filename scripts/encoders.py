@@ -0,0 +1,94 @@
+"""
+Registry of embedding encoders, keyed by the model name recorded in index manifests.
+
+`build_embeddings.py` records in each index manifest which model produced the vectors,
+their dimension and whether they are normalized. At query time the app looks the
+model up here to get the matching encoder, so queries and the index always share one
+vector space.
+
+Providers:
+  openai   OpenAI embedding models (OPENAI_MODELS), needs OPENAI_API_KEY
+  local    sentence-transformers models via `local_encoder.py`; a `@onnx-int8`
+           suffix selects the quantized export
+
+    encoder = load_encoder(manifest)         # loads and warms the model once
+    vectors = encoder.encode(["grace and forgiveness"])
+"""
+import os
+
+import numpy as np
+
+OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+
+# Known OpenAI embedding models and their output dimension
+OPENAI_MODELS = {
+    'text-embedding-3-small': 1536,
+    'text-embedding-3-large': 3072,
+    'text-embedding-ada-002': 1536,
+}
+
+WARMUP_TEXT = 'warm up'
+
+
+class EncoderMismatch(RuntimeError):
+    """The query encoder does not produce vectors the index can compare against"""
+
+
+class Encoder:
+    def __init__(self, model, provider, encode_fn):
+        self.model = model
+        self.provider = provider
+        self._encode = encode_fn
+        self.dim = None
+
+    def encode(self, texts):
+        """float32 array with one row per text"""
+        return np.asarray(self._encode(list(texts)), dtype='float32')
+
+    def warm_up(self):
+        """Load the model and run one encode, recording the output dimension"""
+        self.dim = self.encode([WARMUP_TEXT]).shape[1]
+        return self
+
+
+def _openai_encoder(model):
+    if not OPENAI_API_KEY:
+        raise EncoderMismatch(f"index was built with {model}; set OPENAI_API_KEY to encode queries")
+    from openai_embeddings import OpenAIEmbeddingClient
+    client = OpenAIEmbeddingClient(OPENAI_API_KEY, model, concurrency=1, max_retries=2, timeout=20)
+    return lambda texts: client.embed(texts, show_progress=False)
+
+
+def _local_encoder(model):
+    from local_encoder import LocalEncoder
+    name, _, backend = model.partition('@')
+    encoder = LocalEncoder(name, backend or 'torch', workers=1)
+    return lambda texts: encoder.encode(texts, show_progress=False)
+
+
+PROVIDERS = {
+    'openai': _openai_encoder,
+    'local': _local_encoder,
+}
+
+
+def provider_for(model):
+    return 'openai' if model in OPENAI_MODELS else 'local'
+
+
+def register_provider(name, factory):
+    """Add a provider: factory(model_name) -> callable(list of texts) -> vectors"""
+    PROVIDERS[name] = factory
+
+
+def load_encoder(manifest):
+    """Warm encoder for the model in an index manifest, checked against its dimension"""
+    model = manifest['model']
+    provider = manifest.get('provider') or provider_for(model)
+    if provider not in PROVIDERS:
+        raise EncoderMismatch(f"no encoder registered for provider {provider!r} (model {model})")
+    encoder = Encoder(model, provider, PROVIDERS[provider](model)).warm_up()
+    if manifest.get('dim') and encoder.dim != manifest['dim']:
+        raise EncoderMismatch(f"{model} produces {encoder.dim}-d vectors but the index holds "
+                              f"{manifest['dim']}-d vectors; rebuild with scripts/build_embeddings.py --full")
+    return encoder
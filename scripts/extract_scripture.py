@@ -0,0 +1,89 @@
+"""
+Extract scripture references from transcripts into the `scripture_refs` verse index.
+Run this after fetching new transcripts (alongside rebuild_chunks.py).
+
+Uses the parser in `scripture.py`. Only videos whose transcript hash or the parser
+version changed since the last run are re-parsed; references of videos that left
+`sermons` are removed. Transcripts are read in keyset-paginated pages and written
+back one page per transaction, like rebuild_chunks.py.
+
+Usage:
+  python scripts/extract_scripture.py             # incremental
+  python scripts/extract_scripture.py --full      # re-parse every transcript
+  python scripts/extract_scripture.py --lookup "Romans 8:28"
+"""
+
+import sqlite3
+import argparse
+
+from rebuild_chunks import DB_PATH, PAGE_SIZE, iter_transcript_pages
+from chunking import sermon_rowids
+from scripture import (PARSER_VERSION, citing_chunks, ensure_scripture_tables, format_reference,
+                       parse_references, remove_video_references, sync_references)
+
+def extract_scripture(full=False, page_size=PAGE_SIZE):
+    """Re-parse changed transcripts and drop references of removed videos"""
+    conn = sqlite3.connect(DB_PATH)
+    ensure_scripture_tables(conn)
+    conn.commit()
+
+    rowids = sermon_rowids(conn)
+    print(f"\nChecking {len(rowids)} videos...")
+    changed = 0
+    checked = 0
+    for page in iter_transcript_pages(conn, rowids, page_size):
+        for video_id, transcript in page:
+            changed += sync_references(conn, video_id, transcript, force=full)[1]
+        conn.commit()
+        checked += len(page)
+        if checked // 200 != (checked - len(page)) // 200:
+            print(f"  Checked {checked}/{len(rowids)} videos, {changed} re-parsed so far...")
+
+    c = conn.cursor()
+    c.execute('SELECT video_id FROM scripture_state')
+    removed = [video_id for (video_id,) in c.fetchall() if video_id not in rowids]
+    for video_id in removed:
+        remove_video_references(conn, video_id)
+    conn.commit()
+
+    total = c.execute('SELECT COUNT(*) FROM scripture_refs').fetchone()[0]
+    books = c.execute('SELECT COUNT(DISTINCT book) FROM scripture_refs').fetchone()[0]
+    conn.close()
+    print(f"\n✓ {total} references to {books} books in {len(rowids)} videos")
+    print(f"  Re-parsed: {changed} videos, removed: {len(removed)} videos")
+    return changed + len(removed)
+
+def lookup(text, limit=20):
+    """Print the passages citing the references in text"""
+    refs = [ref for _, ref in parse_references(text, strict=False)]
+    if not refs:
+        print(f"No scripture reference in {text!r}")
+        return
+    conn = sqlite3.connect(DB_PATH)
+    total, chunks = citing_chunks(conn, refs, limit)
+    print(f"{', '.join(format_reference(ref) for ref in refs)}: {total} citations")
+    titles = dict(conn.execute('SELECT video_id, title FROM sermons'))
+    for chunk_id, video_id, _, found in chunks:
+        print(f"  {titles.get(video_id, video_id)[:50]:<50} chunk {chunk_id}: "
+              f"{', '.join(format_reference(ref) for ref in found)}")
+    conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Incrementally extract scripture references')
+    parser.add_argument('--full', action='store_true', help='Re-parse every transcript, even unchanged ones')
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE, help='Transcripts read and written per transaction')
+    parser.add_argument('--lookup', metavar='REF', help='Show passages citing a reference instead of extracting')
+    args = parser.parse_args()
+
+    if args.lookup:
+        lookup(args.lookup)
+        return
+
+    print(f"Extracting scripture references (parser {PARSER_VERSION})...")
+    print("=" * 60)
+    changed = extract_scripture(full=args.full, page_size=args.page_size)
+    print("\n" + "=" * 60)
+    print("Done!" if changed else "Done! References already up to date.")
+
+if __name__ == '__main__':
+    main()
@@ -24,20 +24,19 @@ from youtube_transcript_api import YouTubeTranscriptApi
 import requests
 from dotenv import load_dotenv
 
+from chunking import ensure_chunks_table, replace_chunks
+
 load_dotenv()
 
 DB_PATH = os.getenv('DB_PATH', 'sermons.db')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 LOCAL_WHISPER_MODEL = os.getenv('LOCAL_WHISPER_MODEL', 'tiny')
 
-CHUNK_SIZE = 1000
-CHUNK_OVERLAP = 200
-
 def ensure_db():
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
     c.execute("CREATE VIRTUAL TABLE IF NOT EXISTS sermons USING fts5(video_id, title, published_at, transcript);")
-    c.execute("CREATE TABLE IF NOT EXISTS chunks(chunk_id INTEGER PRIMARY KEY AUTOINCREMENT, video_id TEXT, chunk_text TEXT);")
+    ensure_chunks_table(conn)
     conn.commit()
     return conn
 
@@ -199,28 +198,12 @@ def transcribe_with_whisper(audio_file_path, model_name=LOCAL_WHISPER_MODEL):
         print("Whisper transcription error:", e)
         return None
 
-def chunk_text(text, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
-    chunks = []
-    start = 0
-    L = len(text)
-    while start < L:
-        end = min(start + size, L)
-        chunks.append(text[start:end])
-        start = end - overlap
-        if start < 0:
-            start = 0
-        if start >= L:
-            break
-    return chunks
-
 def insert_into_db(conn, video_id, title, published_at, transcript):
     c = conn.cursor()
     c.execute("INSERT INTO sermons(video_id, title, published_at, transcript) VALUES (?, ?, ?, ?)",
               (video_id, title, published_at, transcript))
     # create chunks
-    if transcript:
-        for chunk in chunk_text(transcript):
-            c.execute("INSERT INTO chunks(video_id, chunk_text) VALUES (?, ?)", (video_id, chunk))
+    replace_chunks(conn, video_id, transcript)
     conn.commit()
     # also save raw transcript to file for backup/inspection
     try:
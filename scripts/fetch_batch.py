@@ -25,6 +25,8 @@ from youtube_transcript_api import YouTubeTranscriptApi
 import requests
 from dotenv import load_dotenv
 
+from chunking import ensure_chunks_table, replace_chunks
+
 load_dotenv()
 
 DB_PATH = os.getenv('DB_PATH', 'sermons.db')
@@ -32,15 +34,12 @@ OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 LOCAL_WHISPER_MODEL = os.getenv('LOCAL_WHISPER_MODEL', 'base')  # Re-enabled for reprocessing
 GOOGLE_APPLICATION_CREDENTIALS = os.getenv('GOOGLE_APPLICATION_CREDENTIALS')  # Google Speech API
 
-CHUNK_SIZE = 1000
-CHUNK_OVERLAP = 200
-
 
 def ensure_db():
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
     c.execute("CREATE VIRTUAL TABLE IF NOT EXISTS sermons USING fts5(video_id, title, published_at, transcript);")
-    c.execute("CREATE TABLE IF NOT EXISTS chunks(chunk_id INTEGER PRIMARY KEY AUTOINCREMENT, video_id TEXT, chunk_text TEXT);")
+    ensure_chunks_table(conn)
     conn.commit()
     return conn
 
@@ -216,26 +215,6 @@ def transcribe_with_whisper(audio_file_path, model_name=LOCAL_WHISPER_MODEL):
         return None
 
 
-def chunk_text(text, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
-    if not text:
-        return []
-    chunks = []
-    start = 0
-    L = len(text)
-    max_iterations = (L // (size - overlap)) + 2  # Safety limit
-    iteration = 0
-    while start < L and iteration < max_iterations:
-        end = min(start + size, L)
-        chunks.append(text[start:end])
-        if end >= L:
-            break
-        start = end - overlap
-        if overlap >= size:  # Prevent infinite loop
-            start = end
-        iteration += 1
-    return chunks
-
-
 def insert_into_db(conn, video_id, title, published_at, transcript):
     c = conn.cursor()
     # Use INSERT OR REPLACE to handle reprocessing
@@ -243,10 +222,7 @@ def insert_into_db(conn, video_id, title, published_at, transcript):
               (video_id, title, published_at, transcript))
     
     # Delete old chunks and insert new ones
-    c.execute("DELETE FROM chunks WHERE video_id = ?", (video_id,))
-    if transcript:
-        for chunk in chunk_text(transcript):
-            c.execute("INSERT INTO chunks(video_id, chunk_text) VALUES (?, ?)", (video_id, chunk))
+    replace_chunks(conn, video_id, transcript)
     conn.commit()
     
     # Save transcript JSON
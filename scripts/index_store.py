@@ -0,0 +1,156 @@
+"""
+Versioned, atomically published FAISS index directories.
+
+Layout under INDEX_DIR (default `indexes/`):
+  indexes/
+    CURRENT                      name of the live version (one line)
+    20250101T120000.000000Z-3f9a/
+      index.faiss                the FAISS index, vectors keyed by chunk_id
+      ids/                       per-vector arrays (`vector_meta.py`)
+      manifest.json              what was built, written last
+
+`publish` writes a new version into a hidden `.partial` directory, renames it into
+place once every file is complete, and only then swaps CURRENT with an atomic
+`os.replace`. Readers that resolve CURRENT therefore always get a complete version
+whose index and arrays belong together. A version is never modified after it is
+published, so a reader can keep using the one it opened while a newer one goes live.
+
+Older versions beyond INDEX_KEEP_VERSIONS are removed after a publish. Processes
+that still have one memory-mapped keep working on POSIX; on Windows the delete is
+retried on a later publish.
+
+Trees built before versioning (`faiss_index.faiss` + `embeddings_ids/` in the
+working directory) are still served when there is no CURRENT yet, as long as the
+index maps vectors to chunk IDs (`ann_index.require_id_map`); older plain indexes
+are refused and need a rebuild.
+"""
+import os
+import json
+import shutil
+import secrets
+from datetime import datetime, timezone
+
+INDEX_DIR = os.getenv('INDEX_DIR', 'indexes')
+INDEX_KEEP_VERSIONS = int(os.getenv('INDEX_KEEP_VERSIONS', '3'))
+
+CURRENT_FILE = 'CURRENT'
+INDEX_FILE = 'index.faiss'
+IDS_DIR = 'ids'
+MANIFEST_FILE = 'manifest.json'
+
+# Pre-versioning locations, read as a fallback
+LEGACY_INDEX_PATH = os.getenv('FAISS_INDEX_PATH', 'faiss_index.faiss')
+LEGACY_STATE_PATH = os.getenv('EMBEDDINGS_STATE', 'embeddings_state.json')
+
+
+def current_version(index_dir=INDEX_DIR):
+    """Name of the live version, or None if nothing has been published"""
+    try:
+        with open(os.path.join(index_dir, CURRENT_FILE), 'r') as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return version or None
+
+
+def version_path(version, index_dir=INDEX_DIR):
+    return os.path.join(index_dir, version)
+
+
+def index_path(version, index_dir=INDEX_DIR):
+    return os.path.join(index_dir, version, INDEX_FILE)
+
+
+def ids_path(version, index_dir=INDEX_DIR):
+    return os.path.join(index_dir, version, IDS_DIR)
+
+
+def read_manifest(version, index_dir=INDEX_DIR):
+    with open(os.path.join(index_dir, version, MANIFEST_FILE), 'r') as f:
+        return json.load(f)
+
+
+def current_manifest(index_dir=INDEX_DIR):
+    """Manifest of the live version, falling back to the legacy state file"""
+    version = current_version(index_dir)
+    if version:
+        return read_manifest(version, index_dir)
+    if os.path.exists(LEGACY_STATE_PATH) and os.path.exists(LEGACY_INDEX_PATH):
+        with open(LEGACY_STATE_PATH, 'r') as f:
+            return json.load(f)
+    return None
+
+
+def current_paths(index_dir=INDEX_DIR):
+    """(version, index file, ids dir) of what should be served, or None.
+
+    The version is None for a legacy, unversioned index.
+    """
+    from vector_meta import EMBEDDINGS_IDS
+    version = current_version(index_dir)
+    if version:
+        return version, index_path(version, index_dir), ids_path(version, index_dir)
+    if os.path.exists(LEGACY_INDEX_PATH):
+        return None, LEGACY_INDEX_PATH, EMBEDDINGS_IDS
+    return None
+
+
+def _new_version_name():
+    # Sortable by creation time; the suffix keeps concurrent builds apart
+    return datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S.%fZ') + '-' + secrets.token_hex(2)
+
+
+def _write_atomic(path, text):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def publish(index, meta, manifest, index_dir=INDEX_DIR, keep=INDEX_KEEP_VERSIONS):
+    """Write index + arrays + manifest as a new version and make it current.
+
+    Returns the new version name.
+    """
+    import faiss
+    os.makedirs(index_dir, exist_ok=True)
+    version = _new_version_name()
+    partial = os.path.join(index_dir, f'.{version}.partial')
+    os.makedirs(partial)
+    try:
+        faiss.write_index(index, os.path.join(partial, INDEX_FILE))
+        meta.save(os.path.join(partial, IDS_DIR))
+        manifest = dict(manifest, version=version,
+                        created_at=datetime.now(timezone.utc).isoformat(timespec='seconds'))
+        _write_atomic(os.path.join(partial, MANIFEST_FILE), json.dumps(manifest, indent=2))
+        os.rename(partial, version_path(version, index_dir))
+    except BaseException:
+        shutil.rmtree(partial, ignore_errors=True)
+        raise
+    _write_atomic(os.path.join(index_dir, CURRENT_FILE), version + '\n')
+    prune_versions(index_dir, keep)
+    return version
+
+
+def list_versions(index_dir=INDEX_DIR):
+    """Published versions, oldest first"""
+    if not os.path.isdir(index_dir):
+        return []
+    return sorted(name for name in os.listdir(index_dir)
+                  if not name.startswith('.') and os.path.isfile(os.path.join(index_dir, name, MANIFEST_FILE)))
+
+
+def prune_versions(index_dir=INDEX_DIR, keep=INDEX_KEEP_VERSIONS):
+    """Remove all but the newest `keep` versions (never the current one) and stale partials"""
+    current = current_version(index_dir)
+    old = [v for v in list_versions(index_dir)[:-max(1, keep)] if v != current]
+    for version in old:
+        shutil.rmtree(version_path(version, index_dir), ignore_errors=True)
+    for name in os.listdir(index_dir):
+        if name.startswith('.') and name.endswith('.partial'):
+            path = os.path.join(index_dir, name)
+            # Only clean up partials left by a crashed build, not one still being written
+            if datetime.now().timestamp() - os.path.getmtime(path) > 24 * 3600:
+                shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Bulk-ingest a local archive of service recordings into `sermons.db`.
+
+Usage:
+  python3 scripts/ingest_archive.py /path/to/archive
+  python3 scripts/ingest_archive.py /path/to/archive --workers 3 --batch-size 10 --model base
+
+Behavior:
+ - Walks the directory tree for audio files (mp3/wav/m4a/etc).
+ - Hashes each file's content (SHA-256) and skips files already recorded in the
+   `ingested_files` table, so re-runs and moved/renamed copies are not transcribed twice.
+   Files whose path, size and modification time match their ingest record are skipped
+   without being read, so a re-run only hashes new or changed files.
+ - Transcribes in a process pool. Each worker loads its Whisper model once and keeps it
+   resident for every file it handles (unlike `transcribe_file.py`, which reloads per call).
+ - Writes sermons, chunks and the ingest record from the parent process in batched
+   transactions, so a crash loses at most one batch and the DB never sees partial rows.
+
+Recordings get `video_id` `local-<first 12 hex chars of the content hash>`, the file name
+as title and the file's modification date (YYYYMMDD, like yt-dlp's upload_date) as
+`published_at`.
+"""
+import os
+import sys
+import hashlib
+import sqlite3
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from tqdm import tqdm
+from dotenv import load_dotenv
+
+from chunking import ensure_chunks_table, replace_chunks
+from transcribe_file import write_transcript_json
+
+load_dotenv()
+
+DB_PATH = os.getenv('DB_PATH', 'sermons.db')
+LOCAL_WHISPER_MODEL = os.getenv('LOCAL_WHISPER_MODEL', 'tiny')
+
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.m4a', '.aac', '.flac', '.ogg', '.opus', '.wma', '.webm', '.mp4')
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# Resident Whisper model, loaded once per worker process by _init_worker
+_MODEL = None
+
+
+def ensure_db(db_path):
+    conn = sqlite3.connect(db_path)
+    c = conn.cursor()
+    c.execute("CREATE VIRTUAL TABLE IF NOT EXISTS sermons USING fts5(video_id, title, published_at, transcript);")
+    ensure_chunks_table(conn)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS ingested_files (
+            content_hash TEXT PRIMARY KEY,
+            video_id TEXT NOT NULL,
+            path TEXT,
+            size_bytes INTEGER,
+            ingested_at TEXT,
+            mtime_ns INTEGER
+        )
+    """)
+    cols = [row[1] for row in c.execute("PRAGMA table_info(ingested_files)")]
+    if 'mtime_ns' not in cols:
+        # Older records get their mtime filled in the next time their file is hashed
+        c.execute("ALTER TABLE ingested_files ADD COLUMN mtime_ns INTEGER")
+    conn.commit()
+    return conn
+
+
+def find_audio_files(root):
+    """Yield audio file paths under root in a stable (sorted) order"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith(AUDIO_EXTENSIONS):
+                yield os.path.join(dirpath, name)
+
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def file_stamp(path):
+    """(absolute path, size, mtime in ns) identifying an unchanged file without reading it"""
+    st = os.stat(path)
+    return os.path.abspath(path), st.st_size, st.st_mtime_ns
+
+
+def known_files(conn):
+    """Map content_hash -> (path, size_bytes, mtime_ns) of every ingested file"""
+    c = conn.cursor()
+    c.execute("SELECT content_hash, path, size_bytes, mtime_ns FROM ingested_files")
+    return {digest: (path, size, mtime) for digest, path, size, mtime in c}
+
+
+def _init_worker(model_name, threads):
+    """Process-pool initializer: load the Whisper model once for this worker"""
+    global _MODEL
+    if threads:
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except Exception:
+            pass
+    import whisper
+    _MODEL = whisper.load_model(model_name)
+
+
+def _transcribe(path):
+    """Worker task. Returns (path, text, error)."""
+    try:
+        res = _MODEL.transcribe(path)
+        return path, (res.get('text') or '').strip(), None
+    except Exception as e:
+        return path, None, str(e)
+
+
+def write_batch(conn, batch):
+    """Insert a batch of transcribed files in a single transaction.
+
+    `batch` is a list of dicts with path, content_hash, video_id, title,
+    published_at and transcript. Returns the number of chunks written.
+    """
+    n_chunks = 0
+    now = datetime.utcnow().isoformat() + "Z"
+    with conn:
+        c = conn.cursor()
+        for item in batch:
+            video_id = item['video_id']
+            transcript = item['transcript']
+            c.execute("INSERT INTO sermons(video_id, title, published_at, transcript) VALUES (?, ?, ?, ?)",
+                      (video_id, item['title'], item['published_at'], transcript))
+            n_chunks += replace_chunks(conn, video_id, transcript)
+            c.execute("INSERT OR REPLACE INTO ingested_files(content_hash, video_id, path, size_bytes, ingested_at, mtime_ns) "
+                      "VALUES (?, ?, ?, ?, ?, ?)",
+                      (item['content_hash'], video_id, item['path'], item['size_bytes'], now, item['mtime_ns']))
+    # JSON backups only after the rows are committed
+    for item in batch:
+        try:
+            write_transcript_json(item['video_id'], item['title'], item['published_at'], item['transcript'])
+        except Exception as e:
+            print(f"Failed to save transcript file for {item['video_id']}: {e}")
+    return n_chunks
+
+
+def plan_files(conn, root):
+    """Hash the audio files under root and return the ones not yet ingested.
+
+    Files whose (path, size, mtime) matches an ingest record are skipped before
+    hashing. A hashed file that matches a record whose path is gone (the file was
+    moved or renamed) takes over that record, so the next run skips it unhashed.
+    Returns a list of (path, content_hash) and the number of files skipped.
+    Duplicate copies inside the archive are only scheduled once.
+    """
+    known = known_files(conn)
+    stamps = set(known.values())
+    seen = set(known)
+    todo = []
+    skipped = 0
+    restamp = []
+    paths = list(find_audio_files(root))
+    for path in tqdm(paths, desc="Hashing"):
+        try:
+            stamp = file_stamp(path)
+            if stamp in stamps:
+                skipped += 1
+                continue
+            digest = file_hash(path)
+        except OSError as e:
+            print(f"\nCannot read {path}: {e}")
+            continue
+        if digest in seen:
+            skipped += 1
+            old_path = known[digest][0] if digest in known else None
+            # Not for a second copy while the recorded one is still in place
+            if old_path is not None and known[digest] != stamp and (old_path == stamp[0] or not os.path.exists(old_path)):
+                restamp.append((*stamp, digest))
+                known[digest] = stamp
+            continue
+        seen.add(digest)
+        todo.append((path, digest))
+    if restamp:
+        with conn:
+            conn.executemany("UPDATE ingested_files SET path = ?, size_bytes = ?, mtime_ns = ? WHERE content_hash = ?",
+                             restamp)
+    return todo, skipped
+
+
+def main():
+    p = argparse.ArgumentParser(description='Bulk-ingest a directory tree of local sermon recordings')
+    p.add_argument("root", help="Directory to scan for audio files")
+    p.add_argument("--db", default=DB_PATH, help="Path to sqlite DB")
+    p.add_argument("--model", default=LOCAL_WHISPER_MODEL, help="Whisper model name (tiny|base|small|medium|large)")
+    p.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                   help="Worker processes, each holding one resident Whisper model")
+    p.add_argument("--batch-size", type=int, default=10, help="Transcripts per DB transaction")
+    p.add_argument("--limit", type=int, help="Only ingest the first N new files")
+    args = p.parse_args()
+
+    if not os.path.isdir(args.root):
+        print("Archive directory not found:", args.root)
+        sys.exit(2)
+
+    conn = ensure_db(args.db)
+    todo, skipped = plan_files(conn, args.root)
+    if args.limit:
+        todo = todo[:args.limit]
+    print(f"{len(todo)} new files to transcribe, {skipped} already ingested or duplicated")
+    if not todo:
+        return
+
+    hashes = dict(todo)
+    threads = max(1, (os.cpu_count() or 1) // args.workers)
+    batch = []
+    ok = failed = total_chunks = 0
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                 initargs=(args.model, threads)) as pool:
+            futures = [pool.submit(_transcribe, path) for path, _ in todo]
+            for fut in tqdm(as_completed(futures), total=len(futures), desc="Transcribing"):
+                path, text, error = fut.result()
+                if text is None:
+                    print(f"\nTranscription failed for {path}: {error}")
+                    failed += 1
+                    continue
+                digest = hashes[path]
+                abspath, size, mtime_ns = file_stamp(path)
+                batch.append({
+                    'path': abspath,
+                    'content_hash': digest,
+                    'size_bytes': size,
+                    'mtime_ns': mtime_ns,
+                    'video_id': f"local-{digest[:12]}",
+                    'title': os.path.splitext(os.path.basename(path))[0],
+                    'published_at': datetime.fromtimestamp(mtime_ns / 1e9).strftime('%Y%m%d'),
+                    'transcript': text,
+                })
+                ok += 1
+                if len(batch) >= args.batch_size:
+                    total_chunks += write_batch(conn, batch)
+                    batch = []
+    finally:
+        # Keep what was transcribed even if the pool broke down
+        if batch:
+            total_chunks += write_batch(conn, batch)
+        conn.close()
+
+    print("\n=== Ingest Complete ===")
+    print(f"Transcribed: {ok}")
+    print(f"Skipped (already ingested or duplicate): {skipped}")
+    print(f"Failed: {failed}")
+    print(f"Chunks written: {total_chunks}")
+    print(f"Database: {args.db}")
+
+
+if __name__ == "__main__":
+    main()
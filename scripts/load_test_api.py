@@ -0,0 +1,110 @@
+"""
+Load test for the JSON search API (`app/api.py`).
+
+Usage:
+  python app/api.py &
+  python scripts/load_test_api.py --concurrency 16 --requests 2000
+  python scripts/load_test_api.py --endpoints keyword,hybrid --duration 30
+  python scripts/load_test_api.py --endpoints ask --requests 50   # OPENAI_BASE_URL -> openai_stub.py
+
+Each worker thread keeps its own pooled session and sends requests back to back,
+cycling through endpoints and sample queries. Reports throughput and p50/p95/p99
+latency per endpoint, plus error counts by status.
+"""
+import time
+import random
+import argparse
+import threading
+from collections import defaultdict
+
+import numpy as np
+import requests
+
+QUERIES = [
+    'forgiveness', 'grace', 'faith and works', 'the love of God', 'prayer', 'holy spirit',
+    'what does the Bible say about forgiveness', 'how do I overcome fear', 'salvation by grace',
+    'the blood of Christ', 'hearing the voice of God', 'mothers', 'hope in hard times',
+]
+REFERENCES = ['John 3:16', 'Romans 8:28', 'Romans 6:23', 'Psalm 23', '1 Corinthians 13', 'Ephesians 2:8-9']
+
+ENDPOINTS = {
+    'keyword': ('GET', '/search/keyword', lambda q: {'q': q, 'limit': 10}),
+    'semantic': ('GET', '/search/semantic', lambda q: {'q': q, 'k': 5}),
+    'hybrid': ('GET', '/search/hybrid', lambda q: {'q': q, 'k': 5}),
+    'scripture': ('GET', '/search/scripture', lambda q: {'ref': REFERENCES[len(q) % len(REFERENCES)]}),
+    'ask': ('POST', '/ask', lambda q: {'q': q, 'k': 5}),
+}
+
+
+def worker(base_url, endpoints, deadline, remaining, lock, results, seed):
+    rng = random.Random(seed)
+    session = requests.Session()
+    while time.perf_counter() < deadline:
+        with lock:
+            if remaining[0] <= 0:
+                return
+            remaining[0] -= 1
+        name = rng.choice(endpoints)
+        method, path, make_params = ENDPOINTS[name]
+        params = make_params(rng.choice(QUERIES))
+        start = time.perf_counter()
+        try:
+            if method == 'GET':
+                response = session.get(base_url + path, params=params, timeout=120)
+            else:
+                response = session.post(base_url + path, json=params, timeout=120)
+            status = response.status_code
+        except requests.RequestException as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - start
+        with lock:
+            results[name].append((elapsed, status))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent load test of the JSON search API')
+    parser.add_argument('--url', default='http://127.0.0.1:8502')
+    parser.add_argument('--endpoints', default='keyword,semantic,hybrid', help=f"Comma-separated: {','.join(ENDPOINTS)}")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=1000, help='Total requests (whichever of this and --duration ends first)')
+    parser.add_argument('--duration', type=float, default=60.0, help='Seconds')
+    args = parser.parse_args()
+
+    endpoints = args.endpoints.split(',')
+    unknown = [name for name in endpoints if name not in ENDPOINTS]
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(unknown)}")
+    health = requests.get(args.url.rstrip('/') + '/health', timeout=10).json()
+    print(f"API at {args.url}: {health}")
+
+    results = defaultdict(list)
+    lock = threading.Lock()
+    remaining = [args.requests]
+    start = time.perf_counter()
+    deadline = start + args.duration
+    threads = [threading.Thread(target=worker, args=(args.url.rstrip('/'), endpoints, deadline, remaining, lock, results, i))
+               for i in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    total = sum(len(r) for r in results.values())
+    print(f"\n{total} requests in {wall:.1f}s with {args.concurrency} clients: {total / wall:.1f} req/s\n")
+    print(f"{'endpoint':<10} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  errors")
+    for name in endpoints:
+        rows = results.get(name, [])
+        if not rows:
+            continue
+        lat = np.array([elapsed for elapsed, _ in rows]) * 1000
+        errors = defaultdict(int)
+        for _, status in rows:
+            if status != 200:
+                errors[status] += 1
+        print(f"{name:<10} {len(rows):>6} {np.percentile(lat, 50):>8.1f} {np.percentile(lat, 95):>8.1f} "
+              f"{np.percentile(lat, 99):>8.1f}  {dict(errors) or '-'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Local sentence-transformers encoder for `build_embeddings.py`, with faster CPU backends.
+
+Backends (LOCAL_EMBED_BACKEND):
+  torch       the plain PyTorch model (previous behavior)
+  onnx        the model's ONNX export run with onnxruntime
+  onnx-int8   a dynamically int8-quantized ONNX export (LOCAL_EMBED_ONNX_INT8_FILE)
+
+The ONNX backends need `sentence-transformers>=3.2` with `optimum[onnxruntime]`; the
+hub repo for all-MiniLM-L6-v2 already ships both exports, other models are exported
+on first load.
+
+With LOCAL_EMBED_WORKERS > 1 the texts are split into shards and encoded in a process
+pool. Each worker loads the model on its first shard and gets an equal share of the CPU
+threads, like the Whisper workers in `ingest_archive.py`. The parent then never loads
+the model itself, so it is held once per encoding process only.
+
+int8 vectors are close to, but not the same as, the full-precision ones, so they are
+cached and indexed under their own label (`<model>@onnx-int8`); check agreement with
+`scripts/bench_local_encoder.py` before switching a production index.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+LOCAL_EMBED_MODEL = os.getenv('LOCAL_EMBED_MODEL', 'all-MiniLM-L6-v2')
+LOCAL_EMBED_BACKEND = os.getenv('LOCAL_EMBED_BACKEND', 'torch')
+LOCAL_EMBED_WORKERS = int(os.getenv('LOCAL_EMBED_WORKERS', '1'))
+LOCAL_EMBED_BATCH_SIZE = int(os.getenv('LOCAL_EMBED_BATCH_SIZE', '64'))
+LOCAL_EMBED_ONNX_INT8_FILE = os.getenv('LOCAL_EMBED_ONNX_INT8_FILE', 'onnx/model_quint8_avx2.onnx')
+
+BACKENDS = ('torch', 'onnx', 'onnx-int8')
+
+# Texts per task handed to a pool worker
+SHARD_SIZE = 1024
+
+# Resident model of a pool worker, loaded on its first shard; (model_name, backend) set by _init_worker
+_MODEL = None
+_MODEL_ARGS = None
+
+
+def model_label(model_name=LOCAL_EMBED_MODEL, backend=LOCAL_EMBED_BACKEND):
+    """Name used for the embedding cache and index state.
+
+    The ONNX fp32 export reproduces the torch vectors, so only int8 gets its own label.
+    """
+    return f"{model_name}@{backend}" if backend == 'onnx-int8' else model_name
+
+
+def load_model(model_name=LOCAL_EMBED_MODEL, backend=LOCAL_EMBED_BACKEND):
+    from sentence_transformers import SentenceTransformer
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown LOCAL_EMBED_BACKEND {backend!r} (expected one of {', '.join(BACKENDS)})")
+    if backend == 'torch':
+        return SentenceTransformer(model_name, device='cpu')
+    model_kwargs = {'file_name': LOCAL_EMBED_ONNX_INT8_FILE} if backend == 'onnx-int8' else None
+    return SentenceTransformer(model_name, device='cpu', backend='onnx', model_kwargs=model_kwargs)
+
+
+def _set_threads(threads):
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except Exception:
+        pass
+
+
+def _init_worker(model_name, backend, threads):
+    """Process-pool initializer: set the thread budget and which encoder to load"""
+    global _MODEL_ARGS
+    _set_threads(threads)
+    _MODEL_ARGS = (model_name, backend)
+
+
+def _encode_shard(args):
+    global _MODEL
+    texts, batch_size = args
+    if _MODEL is None:
+        _MODEL = load_model(*_MODEL_ARGS)
+    return _MODEL.encode(texts, batch_size=batch_size, convert_to_numpy=True).astype(np.float32)
+
+
+class LocalEncoder:
+    """Encode texts with a local model, optionally sharded across processes"""
+
+    def __init__(self, model_name=LOCAL_EMBED_MODEL, backend=LOCAL_EMBED_BACKEND,
+                 workers=LOCAL_EMBED_WORKERS, batch_size=LOCAL_EMBED_BATCH_SIZE, shard_size=SHARD_SIZE):
+        self.model_name = model_name
+        self.backend = backend
+        self.workers = max(1, workers or 1)
+        self.batch_size = batch_size
+        self.shard_size = shard_size
+        self._model = None
+        self._pool = None
+
+    @property
+    def label(self):
+        return model_label(self.model_name, self.backend)
+
+    def _get_pool(self):
+        if self._pool is None:
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                             initargs=(self.model_name, self.backend, threads))
+        return self._pool
+
+    def encode(self, texts, show_progress=True):
+        """Return a float32 array with one row per text, in input order"""
+        texts = list(texts)
+        if self.workers == 1:
+            if self._model is None:
+                self._model = load_model(self.model_name, self.backend)
+            return self._model.encode(texts, batch_size=self.batch_size, show_progress_bar=show_progress,
+                                      convert_to_numpy=True).astype(np.float32)
+        from tqdm import tqdm
+        shards = [(texts[i:i + self.shard_size], self.batch_size) for i in range(0, len(texts), self.shard_size)]
+        parts = list(tqdm(self._get_pool().map(_encode_shard, shards), total=len(shards),
+                          desc=f"Encoding ({self.workers} workers)", disable=not show_progress))
+        return np.vstack(parts)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,115 @@
+"""
+Streaming client for the OpenAI chat completions endpoint.
+
+Used for AI Chat answers. `stream()` requests `"stream": true` and yields the answer
+text piece by piece as the server-sent events arrive, so the first words show up
+after the time-to-first-token rather than after the whole answer is generated.
+
+Behavior:
+ - One pooled `requests.Session` per client, so repeated questions reuse the TLS
+   connection instead of opening a new one per answer.
+ - Retries 429s, 5xx responses, timeouts and dropped connections with backoff, but
+   only before the first token; a stream that breaks halfway raises ChatAPIError.
+ - OPENAI_BASE_URL can point at a local stub (`openai_stub.py`) that streams a
+   canned answer, to exercise the UI and API without calling the real service.
+"""
+import os
+import json
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from openai_embeddings import OPENAI_BASE_URL, RETRY_STATUS, _retry_delay
+
+OPENAI_CHAT_MODEL = os.getenv('OPENAI_CHAT_MODEL', 'gpt-4o-mini')
+OPENAI_CHAT_MAX_TOKENS = int(os.getenv('OPENAI_CHAT_MAX_TOKENS', '1200'))
+OPENAI_CHAT_TIMEOUT = float(os.getenv('OPENAI_CHAT_TIMEOUT', '60'))
+OPENAI_CHAT_MAX_RETRIES = int(os.getenv('OPENAI_CHAT_MAX_RETRIES', '2'))
+
+
+class ChatAPIError(RuntimeError):
+    """The chat endpoint failed, or its stream ended early"""
+
+
+def parse_sse(lines):
+    """Text deltas from the `data:` lines of a chat completions event stream"""
+    for line in lines:
+        if not line or not line.startswith('data:'):
+            continue
+        data = line[5:].strip()
+        if data == '[DONE]':
+            return
+        try:
+            event = json.loads(data)
+        except ValueError as e:
+            raise ChatAPIError(f"malformed stream event {data[:200]!r}: {e}") from e
+        if not isinstance(event, dict):
+            raise ChatAPIError(f"unexpected stream event {data[:200]!r}")
+        if event.get('error'):
+            raise ChatAPIError(event['error'].get('message', str(event['error'])))
+        for choice in event.get('choices', []):
+            text = (choice.get('delta') or {}).get('content')
+            if text:
+                yield text
+
+
+class OpenAIChatClient:
+    def __init__(self, api_key, model=None, base_url=None, timeout=None, max_retries=None, pool_size=4):
+        self.model = model or OPENAI_CHAT_MODEL
+        self.url = (base_url or OPENAI_BASE_URL).rstrip('/') + '/chat/completions'
+        self.timeout = timeout or OPENAI_CHAT_TIMEOUT
+        self.max_retries = OPENAI_CHAT_MAX_RETRIES if max_retries is None else max_retries
+        self.session = requests.Session()
+        self.session.headers.update({"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _open_stream(self, payload):
+        """POST with retries until a 200 response starts streaming"""
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                # (connect, read) timeout; the read timeout applies between chunks
+                response = self.session.post(self.url, json=payload, stream=True, timeout=(10, self.timeout))
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = f"{type(e).__name__}: {e}"
+            else:
+                if response.status_code == 200:
+                    return response
+                error = f"HTTP {response.status_code}: {response.text[:200]}"
+                response.close()
+                if response.status_code not in RETRY_STATUS:
+                    raise ChatAPIError(error)
+            if attempt == self.max_retries:
+                break
+            time.sleep(_retry_delay(response, attempt))
+        raise ChatAPIError(f"giving up after {self.max_retries + 1} attempts ({error})")
+
+    def stream(self, prompt, max_tokens=None, temperature=0.7):
+        """Yield the answer to a single user prompt as text pieces"""
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": max_tokens or OPENAI_CHAT_MAX_TOKENS,
+            "temperature": temperature,
+            "stream": True,
+        }
+        response = self._open_stream(payload)
+        try:
+            # Lines are decoded here: event streams often come without a charset
+            lines = (line.decode('utf-8') for line in response.iter_lines())
+            yield from parse_sse(lines)
+            # Read past [DONE] to the end of the body so the connection returns to the pool
+            for _ in lines:
+                pass
+        except requests.RequestException as e:
+            # Includes ChunkedEncodingError for a connection dropped mid-stream
+            raise ChatAPIError(f"stream interrupted: {type(e).__name__}: {e}")
+        finally:
+            response.close()
+
+    def complete(self, prompt, max_tokens=None, temperature=0.7):
+        """The whole answer as one string"""
+        return ''.join(self.stream(prompt, max_tokens, temperature))
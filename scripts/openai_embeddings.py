@@ -0,0 +1,178 @@
+"""
+Batched, concurrent client for the OpenAI embeddings endpoint.
+
+Used by `build_embeddings.py` when `OPENAI_API_KEY` is set.
+
+Behavior:
+ - Packs texts into requests up to the API limits (2048 inputs and ~300k tokens per
+   request, 8191 tokens per input) instead of a fixed number of texts. Tokens are
+   counted with `tiktoken` when it is installed, otherwise estimated conservatively.
+ - Keeps OPENAI_EMBED_CONCURRENCY requests in flight over one pooled HTTP session.
+ - Retries 429s, 5xx responses, timeouts and dropped connections with exponential
+   backoff (honoring `Retry-After`), up to OPENAI_EMBED_MAX_RETRIES times.
+ - Hands each finished batch to an `on_batch(texts, vectors)` callback as soon as it
+   arrives. `build_embeddings.py` uses it to write into the embedding cache, so a
+   build that dies halfway resumes from the batches that already came back.
+
+Point OPENAI_BASE_URL at a local HTTP stub that answers `POST /embeddings` to exercise
+batching and retries without calling the real API.
+"""
+import os
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+from tqdm import tqdm
+
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1')
+OPENAI_EMBED_CONCURRENCY = int(os.getenv('OPENAI_EMBED_CONCURRENCY', '4'))
+OPENAI_EMBED_MAX_RETRIES = int(os.getenv('OPENAI_EMBED_MAX_RETRIES', '6'))
+OPENAI_EMBED_TIMEOUT = float(os.getenv('OPENAI_EMBED_TIMEOUT', '60'))
+
+# Documented per-request limits, with some headroom on the token budget
+MAX_INPUTS_PER_REQUEST = 2048
+MAX_TOKENS_PER_REQUEST = 250_000
+MAX_TOKENS_PER_INPUT = 8191
+
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+
+class EmbeddingAPIError(RuntimeError):
+    """The embeddings endpoint failed permanently or retries ran out"""
+
+
+_encoders = {}
+_encoders_lock = threading.Lock()
+
+
+def _token_encoder(model):
+    """tiktoken encoding for model, or None when tiktoken is not installed"""
+    with _encoders_lock:
+        if model not in _encoders:
+            try:
+                import tiktoken
+                try:
+                    _encoders[model] = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    _encoders[model] = tiktoken.get_encoding('cl100k_base')
+            except ImportError:
+                _encoders[model] = None
+        return _encoders[model]
+
+
+def count_tokens(text, model):
+    enc = _token_encoder(model)
+    if enc is not None:
+        return len(enc.encode(text, disallowed_special=()))
+    # ~4 chars per token for English; assume 3 so batches stay under the limit
+    return len(text) // 3 + 1
+
+
+def clip_text(text, model, max_tokens=MAX_TOKENS_PER_INPUT):
+    """Truncate text to the per-input token limit"""
+    enc = _token_encoder(model)
+    if enc is not None:
+        tokens = enc.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else enc.decode(tokens[:max_tokens])
+    return text[:max_tokens * 3]
+
+
+def pack_batches(token_counts, max_inputs=MAX_INPUTS_PER_REQUEST, max_tokens=MAX_TOKENS_PER_REQUEST):
+    """Group consecutive positions into batches under both the input and token limits.
+
+    Returns a list of (start, end) ranges over token_counts.
+    """
+    batches = []
+    start = 0
+    tokens = 0
+    for i, n in enumerate(token_counts):
+        if i > start and (i - start >= max_inputs or tokens + n > max_tokens):
+            batches.append((start, i))
+            start, tokens = i, 0
+        tokens += n
+    if start < len(token_counts):
+        batches.append((start, len(token_counts)))
+    return batches
+
+
+def _retry_delay(response, attempt):
+    """Seconds to wait before the next attempt, preferring the server's hint"""
+    if response is not None:
+        for header, scale in (('retry-after-ms', 0.001), ('Retry-After', 1.0)):
+            value = response.headers.get(header)
+            if value:
+                try:
+                    return min(BACKOFF_MAX, float(value) * scale)
+                except ValueError:
+                    pass
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * (0.5 + random.random() / 2)
+
+
+class OpenAIEmbeddingClient:
+    def __init__(self, api_key, model, base_url=None, concurrency=None, max_retries=None, timeout=None):
+        self.model = model
+        self.url = (base_url or OPENAI_BASE_URL).rstrip('/') + '/embeddings'
+        self.concurrency = max(1, concurrency or OPENAI_EMBED_CONCURRENCY)
+        self.max_retries = OPENAI_EMBED_MAX_RETRIES if max_retries is None else max_retries
+        self.timeout = timeout or OPENAI_EMBED_TIMEOUT
+        self.session = requests.Session()
+        self.session.headers.update({"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _post(self, inputs):
+        """One embeddings request with retries; returns vectors in input order"""
+        payload = {"model": self.model, "input": inputs}
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                response = self.session.post(self.url, json=payload, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = f"{type(e).__name__}: {e}"
+            else:
+                if response.status_code == 200:
+                    data = sorted(response.json()['data'], key=lambda item: item['index'])
+                    if len(data) != len(inputs):
+                        raise EmbeddingAPIError(f"expected {len(inputs)} embeddings, got {len(data)}")
+                    return [item['embedding'] for item in data]
+                error = f"HTTP {response.status_code}: {response.text[:200]}"
+                if response.status_code not in RETRY_STATUS:
+                    raise EmbeddingAPIError(error)
+            if attempt == self.max_retries:
+                break
+            time.sleep(_retry_delay(response, attempt))
+        raise EmbeddingAPIError(f"giving up after {self.max_retries + 1} attempts ({error})")
+
+    def embed(self, texts, on_batch=None, show_progress=True):
+        """Embed texts, returning one vector per text in the same order.
+
+        on_batch(batch_texts, batch_vectors) is called from the calling thread as each
+        request completes, in completion order. If a request fails for good, requests
+        not yet started are cancelled and EmbeddingAPIError is raised; batches already
+        passed to on_batch stay done.
+        """
+        texts = list(texts)
+        clipped = [clip_text(t, self.model) for t in texts]
+        batches = pack_batches([count_tokens(t, self.model) for t in clipped])
+        out = [None] * len(texts)
+        progress = tqdm(total=len(texts), desc="Embedding (OpenAI)", disable=not show_progress)
+        pool = ThreadPoolExecutor(max_workers=self.concurrency)
+        try:
+            futures = {pool.submit(self._post, clipped[s:e]): (s, e) for s, e in batches}
+            for fut in as_completed(futures):
+                s, e = futures[fut]
+                vectors = fut.result()
+                out[s:e] = vectors
+                if on_batch:
+                    on_batch(texts[s:e], vectors)
+                progress.update(e - s)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            progress.close()
+        return out
@@ -0,0 +1,111 @@
+"""
+Local stand-in for the OpenAI API, for exercising streaming chat and the embedding
+client without network access or cost.
+
+Usage:
+  python scripts/openai_stub.py --port 8089 --token-delay 0.02 --first-token-delay 0.5
+  OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=stub streamlit run app/streamlit_app.py
+
+Endpoints:
+  POST /v1/chat/completions   streams (or returns, without "stream": true) a canned
+                              answer word by word as server-sent events
+  POST /v1/embeddings         deterministic hash-based vectors of --dim dimensions
+
+`--fail-rate` answers that fraction of requests with a 503, to exercise retries.
+Vectors are not meaningful, so only use the stub against an index built with it.
+"""
+import json
+import time
+import random
+import hashlib
+import argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import numpy as np
+
+ANSWER = ("Forgiveness is central to the sermons. As Ephesians 4:32 says, \"Be kind to one another, "
+          "tenderhearted, forgiving one another, as God in Christ forgave you.\" The preacher connects "
+          "this to Matthew 6:14-15 and Colossians 3:13, urging listeners to release past hurts.")
+
+
+def stub_vector(text, dim):
+    seed = int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+    vec = np.random.default_rng(seed).standard_normal(dim)
+    return (vec / np.linalg.norm(vec)).tolist()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    config = None
+
+    def log_message(self, fmt, *args):
+        if not self.config.quiet:
+            super().log_message(fmt, *args)
+
+    def _json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        if random.random() < self.config.fail_rate:
+            return self._json(503, {'error': {'message': 'stub overloaded'}})
+        if self.path.endswith('/embeddings'):
+            inputs = body.get('input', [])
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            return self._json(200, {'data': [{'index': i, 'embedding': stub_vector(t, self.config.dim)}
+                                             for i, t in enumerate(inputs)]})
+        if self.path.endswith('/chat/completions'):
+            return self._chat(body)
+        self._json(404, {'error': {'message': f'no stub for {self.path}'}})
+
+    def _chat(self, body):
+        time.sleep(self.config.first_token_delay)
+        words = ANSWER.split(' ')
+        if not body.get('stream'):
+            time.sleep(self.config.token_delay * len(words))
+            return self._json(200, {'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': ANSWER}}]})
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for i, word in enumerate(words):
+            self._chunk({'choices': [{'index': 0, 'delta': {'content': word if i == 0 else ' ' + word}}]})
+            time.sleep(self.config.token_delay)
+        self._chunk('[DONE]')
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _chunk(self, event):
+        data = event if isinstance(event, str) else json.dumps(event)
+        payload = f'data: {data}\n\n'.encode('utf-8')
+        self.wfile.write(f'{len(payload):x}\r\n'.encode('ascii') + payload + b'\r\n')
+        self.wfile.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local OpenAI API stub (streaming chat + embeddings)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--dim', type=int, default=1536, help='Embedding dimension')
+    parser.add_argument('--first-token-delay', type=float, default=0.5, help='Seconds before the first token')
+    parser.add_argument('--token-delay', type=float, default=0.02, help='Seconds between streamed tokens')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Fraction of requests answered with 503')
+    parser.add_argument('--quiet', action='store_true')
+    args = parser.parse_args()
+
+    StubHandler.config = args
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    print(f"OpenAI stub on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
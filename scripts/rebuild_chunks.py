@@ -1,98 +1,144 @@
 """
-Rebuild chunks table from existing transcripts in the database.
+Bring the chunks table up to date with the transcripts in the database.
 Run this after fetching many new transcripts to update the chunks for semantic search.
+
+Uses the canonical chunker in `chunking.py`. Only videos whose transcript hash or
+chunker version changed since the last run are re-split; chunks of videos that left
+`sermons` are removed. Every change is appended to the `chunk_changes` log, so
+downstream stages can process only what changed.
+
+Transcripts are streamed in keyset-paginated pages (`WHERE rowid > ? ... LIMIT ?`),
+hashed and split in a process pool, and written back one page per transaction, so
+memory stays bounded by --page-size no matter how large the corpus grows.
+
+Usage:
+  python scripts/rebuild_chunks.py                  # incremental
+  python scripts/rebuild_chunks.py --full           # re-split every transcript (IDs stay stable)
+  python scripts/rebuild_chunks.py --workers 4 --page-size 64
+  python scripts/rebuild_chunks.py --vacuum         # also compact sermons.db afterwards
 """
 
+import os
 import sqlite3
-import re
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from chunking import (CHUNKER_VERSION, ensure_chunks_table, last_change_seq, prepare_chunks,
+                      rebuild_chunks_fts, remove_video_chunks, sermon_rowids, sync_chunks)
 
 DB_PATH = 'sermons.db'
-CHUNK_SIZE = 500  # words per chunk
-OVERLAP = 50      # words overlap between chunks
+PAGE_SIZE = 32
 
-def create_chunks_table():
-    """Create or recreate chunks table"""
-    conn = sqlite3.connect(DB_PATH)
+def known_hashes(conn, full=False):
+    """Map video_id -> transcript hash for videos already chunked with this chunker"""
+    if full:
+        return {}
     c = conn.cursor()
-    
-    # Drop and recreate to ensure fresh data
-    c.execute('DROP TABLE IF EXISTS chunks')
-    c.execute('''
-        CREATE TABLE chunks (
-            chunk_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            video_id TEXT,
-            chunk_text TEXT
-        )
-    ''')
-    
-    conn.commit()
+    c.execute('SELECT video_id, transcript_hash FROM transcript_state WHERE chunker_version = ?',
+              (CHUNKER_VERSION,))
+    return dict(c.fetchall())
+
+def iter_transcript_pages(conn, wanted_rowids, page_size=PAGE_SIZE):
+    """Yield pages of (video_id, transcript) by rowid keyset, skipping stale duplicate rows"""
+    c = conn.cursor()
+    last = 0
+    while True:
+        c.execute('SELECT rowid, video_id, transcript FROM sermons WHERE rowid > ? ORDER BY rowid LIMIT ?',
+                  (last, page_size))
+        rows = c.fetchall()
+        if not rows:
+            return
+        last = rows[-1][0]
+        yield [(video_id, transcript or '') for rowid, video_id, transcript in rows
+               if wanted_rowids.get(video_id) == rowid]
+
+def _prepare(job):
+    return prepare_chunks(*job)
+
+def vacuum():
+    """Compact the DB file, e.g. after migrating chunks from stored text to offsets"""
+    before = os.path.getsize(DB_PATH)
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute('VACUUM')
     conn.close()
-    print("✓ Created chunks table")
-
-def chunk_text(text, chunk_size=CHUNK_SIZE, overlap=OVERLAP):
-    """Split text into overlapping chunks by word count"""
-    words = text.split()
-    chunks = []
-    
-    for i in range(0, len(words), chunk_size - overlap):
-        chunk = ' '.join(words[i:i + chunk_size])
-        if chunk.strip():
-            chunks.append(chunk)
-        if i + chunk_size >= len(words):
-            break
-    
-    return chunks
-
-def rebuild_chunks():
-    """Rebuild all chunks from transcripts"""
+    after = os.path.getsize(DB_PATH)
+    print(f"✓ Vacuumed {DB_PATH}: {before / 1e6:.1f} MB -> {after / 1e6:.1f} MB")
+
+def rebuild_chunks(full=False, workers=None, page_size=PAGE_SIZE):
+    """Re-chunk changed transcripts and drop chunks of removed videos"""
     conn = sqlite3.connect(DB_PATH)
+    ensure_chunks_table(conn)
+    conn.commit()
     c = conn.cursor()
-    
-    # Get all videos with transcripts
-    c.execute('''
-        SELECT video_id, transcript 
-        FROM sermons 
-        WHERE transcript IS NOT NULL AND LENGTH(transcript) > 0
-    ''')
-    
-    videos = c.fetchall()
-    print(f"\nProcessing {len(videos)} videos with transcripts...")
-    
+    start_seq = last_change_seq(conn)
+
+    rowids = sermon_rowids(conn)
+    hashes = known_hashes(conn, full)
+    print(f"\nChecking {len(rowids)} videos...")
+
+    workers = workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    changed = 0
+    checked = 0
     total_chunks = 0
-    for i, (video_id, transcript) in enumerate(videos, 1):
-        if not transcript or len(transcript.strip()) == 0:
-            continue
-        
-        # Create chunks for this video
-        chunks = chunk_text(transcript)
-        
-        # Insert chunks
-        for chunk in chunks:
-            c.execute('INSERT INTO chunks (video_id, chunk_text) VALUES (?, ?)', 
-                     (video_id, chunk))
-        
-        total_chunks += len(chunks)
-        
-        if i % 50 == 0:
-            print(f"  Processed {i}/{len(videos)} videos, {total_chunks} chunks so far...")
+    # Videos whose old chunks_fts entries could not be removed; re-indexed once at the end
+    fts_stale = set()
+    try:
+        for page in iter_transcript_pages(conn, rowids, page_size):
+            jobs = [(video_id, transcript, hashes.get(video_id)) for video_id, transcript in page]
+            prepared = pool.map(_prepare, jobs, chunksize=4) if pool else map(_prepare, jobs)
+            for (video_id, transcript), prep in zip(page, prepared):
+                n_chunks, was_changed = sync_chunks(conn, video_id, transcript, force=full, prepared=prep,
+                                                    rowid=rowids[video_id], fts_stale=fts_stale)
+                total_chunks += n_chunks
+                changed += was_changed
             conn.commit()
-    
+            checked += len(page)
+            if checked // 200 != (checked - len(page)) // 200:
+                print(f"  Checked {checked}/{len(rowids)} videos, {changed} re-chunked so far...")
+    finally:
+        if pool:
+            pool.shutdown()
+
+    # Videos (or legacy chunk rows) that no longer have a sermon row
+    c.execute('SELECT video_id FROM transcript_state UNION SELECT DISTINCT video_id FROM chunks')
+    removed = [video_id for (video_id,) in c.fetchall() if video_id not in rowids]
+    for video_id in removed:
+        remove_video_chunks(conn, video_id, fts_stale=fts_stale)
+    if fts_stale:
+        print(f"  Re-indexing chunks_fts ({len(fts_stale)} videos were changed in place or deleted)...")
+        rebuild_chunks_fts(conn)
+
     conn.commit()
+    end_seq = last_change_seq(conn)
     conn.close()
-    
-    print(f"\n✓ Created {total_chunks} chunks from {len(videos)} videos")
-    return total_chunks
+
+    print(f"\n✓ {total_chunks} chunks for {len(rowids)} videos")
+    print(f"  Re-chunked: {changed} videos, removed: {len(removed)} videos")
+    if end_seq > start_seq:
+        print(f"  Logged chunk changes {start_seq + 1}..{end_seq} in chunk_changes")
+    return changed + len(removed)
 
 def main():
-    print("Rebuilding chunks from transcripts...")
+    parser = argparse.ArgumentParser(description='Incrementally rebuild transcript chunks')
+    parser.add_argument('--full', action='store_true', help='Re-split every transcript, even unchanged ones')
+    parser.add_argument('--workers', type=int, help='Chunking processes (default: CPU count, 1 = no pool)')
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE, help='Transcripts read and written per transaction')
+    parser.add_argument('--vacuum', action='store_true', help='VACUUM the database afterwards to reclaim space')
+    args = parser.parse_args()
+
+    print(f"Updating chunks from transcripts (chunker {CHUNKER_VERSION})...")
     print("=" * 60)
-    
-    create_chunks_table()
-    total = rebuild_chunks()
-    
+
+    changed = rebuild_chunks(full=args.full, workers=args.workers, page_size=args.page_size)
+    if args.vacuum:
+        vacuum()
+
     print("\n" + "=" * 60)
-    print(f"Done! Ready to rebuild embeddings with {total} chunks")
-    print("Next step: python scripts/build_embeddings.py")
+    if changed:
+        print("Done! Next step: python scripts/build_embeddings.py")
+    else:
+        print("Done! Chunks already up to date.")
 
 if __name__ == '__main__':
     main()
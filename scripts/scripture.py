@@ -0,0 +1,432 @@
+"""
+Scripture references in transcripts: parser, verse index tables and lookups.
+
+`parse_references(text)` finds references such as "Romans 8:28", "1 Cor. 13:4-7",
+"John 3:16 and 17", "Matthew 5-7", "Psalm 23" and their spoken forms as captions
+write them: "John chapter three verse sixteen", "first Corinthians thirteen four",
+"verses twenty-eight through thirty". Each becomes a normalized `Reference(book,
+chapter, verse_start, verse_end)`, with book the 1-66 position in the Protestant
+canon and verse_start/verse_end None for a whole chapter. A range that crosses
+chapters ("John 3:16-4:2") is split into one Reference per chapter.
+
+To keep ordinary speech out of the index, transcripts are parsed strictly:
+ - a chapter with no verse needs the word "chapter" ("Mark chapter 5") or a chapter
+   range in digits after a book name that is not also a common word (Numbers,
+   Judges, Job, Mark, Acts), as in "Matthew 5-7"; a bare "John 3" is too often
+   speech ("he said to John 3 times"). Psalms are the exception ("Psalm twenty three")
+ - one-chapter books cited by verse alone need the word "verse" or a verse range
+   ("Jude verse 3", "2 John 5-6"), not just a number ("I have 2 John 3 things")
+ - abbreviations ("Rom", "1 Cor") only count with a verse
+ - chapters and verses must exist (chapter counts per book, verses up to 176)
+Search boxes parse with strict=False, which accepts all of these.
+
+`scripture_refs` stores one row per reference with its character offset in the
+transcript, indexed by (book, chapter, verse_start) for verse and range lookups and
+by (video_id, char_offset) for finding the references inside a chunk. It is filled
+by `scripts/extract_scripture.py`, incrementally through `scripture_state` (the
+transcript hash and PARSER_VERSION each video was parsed with), the same way
+`chunking.py` tracks chunks.
+"""
+import re
+from collections import Counter, namedtuple
+from datetime import datetime
+
+from chunking import get_chunk_spans, transcript_hash
+
+PARSER_VERSION = 'refs2'
+MAX_VERSE = 176  # Psalm 119
+
+Reference = namedtuple('Reference', 'book chapter verse_start verse_end')
+
+# (name, chapters, abbreviations); numbered books are listed once per number
+BOOKS = [
+    ('Genesis', 50, 'gen gn'), ('Exodus', 40, 'exod ex'), ('Leviticus', 27, 'lev'),
+    ('Numbers', 36, 'num'), ('Deuteronomy', 34, 'deut dt'), ('Joshua', 24, 'josh'),
+    ('Judges', 21, 'judg'), ('Ruth', 4, ''), ('1 Samuel', 31, 'sam'), ('2 Samuel', 24, 'sam'),
+    ('1 Kings', 22, 'kgs'), ('2 Kings', 25, 'kgs'), ('1 Chronicles', 29, 'chron chr'),
+    ('2 Chronicles', 36, 'chron chr'), ('Ezra', 10, ''), ('Nehemiah', 13, 'neh'),
+    ('Esther', 10, 'esth'), ('Job', 42, ''), ('Psalms', 150, 'ps psa pss'),
+    ('Proverbs', 31, 'prov'), ('Ecclesiastes', 12, 'eccl eccles'),
+    ('Song of Solomon', 8, 'song'), ('Isaiah', 66, 'isa'), ('Jeremiah', 52, 'jer'),
+    ('Lamentations', 5, 'lam'), ('Ezekiel', 48, 'ezek'), ('Daniel', 12, 'dan'), ('Hosea', 14, 'hos'),
+    ('Joel', 3, ''), ('Amos', 9, ''), ('Obadiah', 1, 'obad'), ('Jonah', 4, 'jon'), ('Micah', 7, 'mic'),
+    ('Nahum', 3, 'nah'), ('Habakkuk', 3, 'hab'), ('Zephaniah', 3, 'zeph'), ('Haggai', 2, 'hag'),
+    ('Zechariah', 14, 'zech'), ('Malachi', 4, 'mal'), ('Matthew', 28, 'matt mt'), ('Mark', 16, 'mk'),
+    ('Luke', 24, 'lk'), ('John', 21, 'jn'), ('Acts', 28, ''), ('Romans', 16, 'rom'),
+    ('1 Corinthians', 16, 'cor'), ('2 Corinthians', 13, 'cor'), ('Galatians', 6, 'gal'),
+    ('Ephesians', 6, 'eph'), ('Philippians', 4, 'phil'), ('Colossians', 4, 'col'),
+    ('1 Thessalonians', 5, 'thess thes'), ('2 Thessalonians', 3, 'thess thes'),
+    ('1 Timothy', 6, 'tim'), ('2 Timothy', 4, 'tim'), ('Titus', 3, ''), ('Philemon', 1, 'philem'),
+    ('Hebrews', 13, 'heb'), ('James', 5, 'jas'), ('1 Peter', 5, 'pet'), ('2 Peter', 3, 'pet'),
+    ('1 John', 5, 'jn'), ('2 John', 1, 'jn'), ('3 John', 1, 'jn'), ('Jude', 1, ''),
+    ('Revelation', 22, 'rev'),
+]
+# Other full names, matched like the canonical one
+ALIASES = {'psalm': 'Psalms', 'revelations': 'Revelation', 'song of songs': 'Song of Solomon'}
+PSALMS = 19
+# Books whose name is also an everyday word: a bare "Mark 5" is not taken as a reference
+COMMON_WORDS = frozenset({4, 7, 18, 41, 44})
+
+ORDINALS = {'1': 1, '1st': 1, 'first': 1, '2': 2, '2nd': 2, 'second': 2, 'ii': 2,
+            '3': 3, '3rd': 3, 'third': 3, 'iii': 3}
+
+UNITS = {w: i for i, w in enumerate('zero one two three four five six seven eight nine ten eleven twelve '
+                                    'thirteen fourteen fifteen sixteen seventeen eighteen nineteen'.split())}
+TENS = {w: 10 * i for i, w in enumerate('twenty thirty forty fifty sixty seventy eighty ninety'.split(), 2)}
+
+CHAPTER_WORDS = frozenset({'chapter', 'chapters', 'ch', 'chap'})
+VERSE_WORDS = frozenset({'verse', 'verses', 'vs', 'vv', 'v'})
+RANGE_WORDS = frozenset({'through', 'thru', 'to', 'till', 'until'})
+LIST_WORDS = frozenset({'and'})
+
+
+def _split_name(name):
+    """'1 John' -> (1, 'john'); 'Romans' -> (None, 'romans')"""
+    number, _, base = name.partition(' ')
+    return (int(number), base.lower()) if number.isdigit() else (None, name.lower())
+
+
+def _build_names():
+    """Map (ordinal or None, lowercase name) -> (book, is_abbreviation)"""
+    numbers = {name: book for book, (name, _, _) in enumerate(BOOKS, 1)}
+    names = {}
+    for book, (name, _, abbrevs) in enumerate(BOOKS, 1):
+        ordinal, base = _split_name(name)
+        names[(ordinal, base)] = (book, False)
+        for abbrev in abbrevs.split():
+            names[(ordinal, abbrev)] = (book, True)
+    for alias, name in ALIASES.items():
+        names[(None, alias)] = (numbers[name], False)
+    return names
+
+
+NAMES = _build_names()
+
+_NUMBER_WORDS = '|'.join(sorted(list(UNITS) + list(TENS), key=len, reverse=True))
+_BOOK_RE = re.compile(
+    r"\b(?:(?P<ord>[123](?:st|nd|rd)?|first|second|third|iii|ii)\s+)?"
+    r"(?P<name>song\s+of\s+(?:solomon|songs)|[a-z]+)\.?\s*"
+    rf"(?=\d|(?:chapters?|verses?|{_NUMBER_WORDS})\b)",
+    re.IGNORECASE)
+_TOKEN_RE = re.compile(r"\s*(?:(\d+)|([a-z]+(?:-[a-z]+)*)|(:)|([-–—])|(,))", re.IGNORECASE)
+
+
+def lookup_book(ordinal, name):
+    """(book, is_abbreviation) for a name and its ordinal ('1', 'first', ... or None), or None"""
+    key = ORDINALS.get(ordinal.lower()) if ordinal else None
+    return NAMES.get((key, ' '.join(name.lower().split()))) if key or not ordinal else None
+
+
+def _spoken_number(words, i):
+    """(value, next index) for the number spelled by words[i:], or None"""
+    parts = words[i].split('-')
+    if len(parts) == 2 and parts[0] in TENS and UNITS.get(parts[1], 0) in range(1, 10):
+        return TENS[parts[0]] + UNITS[parts[1]], i + 1
+    if len(parts) > 1:
+        return None
+    word = words[i]
+    if word in TENS:
+        value, i = TENS[word], i + 1
+        if i < len(words) and UNITS.get(words[i], 0) in range(1, 10):
+            value, i = value + UNITS[words[i]], i + 1
+        return value, i
+    if word not in UNITS or word == 'zero':
+        return None
+    value, i = UNITS[word], i + 1
+    if i < len(words) and words[i] == 'hundred':
+        value, i = value * 100, i + 1
+        j = i + 1 if i < len(words) and words[i] == 'and' else i
+        rest = _spoken_number(words, j) if j < len(words) else None
+        if rest and rest[0] < 100:
+            value, i = value + rest[0], rest[1]
+    return value, i
+
+
+def _tokenize(text, pos, limit=24):
+    """Tokens of a reference tail starting at pos, as (kind, value, spoken) tuples.
+
+    Kinds: num, chapter, verse, range, list, colon, and word for the first word that
+    is none of these (the tail ends there).
+    """
+    raw = []
+    while len(raw) < limit:
+        m = _TOKEN_RE.match(text, pos)
+        if not m:
+            break
+        digits, word, colon, dash, comma = m.groups()
+        if digits:
+            raw.append(('num', int(digits)))
+        elif word:
+            raw.append(('word', word.lower()))
+        else:
+            raw.append(('colon' if colon else 'range' if dash else 'list', None))
+        pos = m.end()
+
+    tokens = []
+    words = [value if kind == 'word' else '' for kind, value in raw]
+    i = 0
+    while i < len(raw):
+        kind, value = raw[i]
+        if kind != 'word':
+            tokens.append((kind, value, False))
+            i += 1
+            continue
+        number = _spoken_number(words, i)
+        if number:
+            tokens.append(('num', number[0], True))
+            i = number[1]
+            continue
+        if value in CHAPTER_WORDS:
+            tokens.append(('chapter', None, False))
+        elif value in VERSE_WORDS:
+            tokens.append(('verse', None, False))
+        elif value in RANGE_WORDS:
+            tokens.append(('range', None, False))
+        elif value in LIST_WORDS:
+            tokens.append(('list', None, False))
+        else:
+            # Kept so a list item can tell "16 and 2 Corinthians" from "16 and 17"
+            tokens.append(('word', value, False))
+            break
+        i += 1
+    return tokens
+
+
+def _peek(tokens, i, *kinds):
+    return i < len(tokens) and tokens[i][0] in kinds
+
+
+def _valid(book, chapter, verse=None):
+    return 1 <= chapter <= BOOKS[book - 1][1] and (verse is None or 1 <= verse <= MAX_VERSE)
+
+
+def _parse_tail(book, abbreviation, tokens, strict):
+    """References spelled by the tokens after a book name"""
+    if BOOKS[book - 1][1] == 1:
+        # One-chapter books are cited by verse alone: "Jude 3" is Jude 1:3
+        verse_marked = _peek(tokens, 0, 'verse')
+        tokens = tokens[verse_marked:]
+        if _peek(tokens, 0, 'num') and not _peek(tokens, 1, 'colon', 'verse'):
+            if strict and not verse_marked and not (_peek(tokens, 1, 'range') and _peek(tokens, 2, 'num')):
+                return []
+            tokens = [('num', 1, False), ('colon', None, False)] + tokens
+    i = 0
+    marked = _peek(tokens, i, 'chapter')
+    i += marked
+    if not _peek(tokens, i, 'num'):
+        return []
+    chapter, spoken = tokens[i][1], tokens[i][2]
+    i += 1
+    if not _valid(book, chapter):
+        return []
+
+    verse = None
+    if _peek(tokens, i, 'colon', 'verse') and _peek(tokens, i + 1, 'num'):
+        verse = tokens[i + 1][1]
+        i += 2
+    elif _peek(tokens, i, 'num') and (tokens[i - 1][2] == tokens[i][2]):
+        # "John three sixteen", "John 3 16": chapter and verse with nothing between
+        verse = tokens[i][1]
+        i += 1
+
+    if verse is None:
+        ranged = _peek(tokens, i, 'range') and _peek(tokens, i + 1, 'num')
+        if strict and not marked and book != PSALMS and (
+                abbreviation or spoken or book in COMMON_WORDS or not ranged):
+            return []
+        if ranged:
+            last = tokens[i + 1][1]
+            if chapter < last <= BOOKS[book - 1][1]:
+                return [Reference(book, c, None, None) for c in range(chapter, last + 1)]
+        return [Reference(book, chapter, None, None)]
+
+    if not _valid(book, chapter, verse):
+        return [Reference(book, chapter, None, None)] if marked else []
+    refs = [Reference(book, chapter, verse, verse)]
+
+    if _peek(tokens, i, 'range') and _peek(tokens, i + 1, 'num'):
+        end = tokens[i + 1][1]
+        if _peek(tokens, i + 2, 'colon', 'verse') and _peek(tokens, i + 3, 'num'):
+            # Across chapters: John 3:16-4:2
+            end_verse = tokens[i + 3][1]
+            if chapter < end <= BOOKS[book - 1][1] and 1 <= end_verse <= MAX_VERSE:
+                refs = ([Reference(book, chapter, verse, MAX_VERSE)]
+                        + [Reference(book, c, None, None) for c in range(chapter + 1, end)]
+                        + [Reference(book, end, 1, end_verse)])
+                i += 4
+        elif verse < end <= MAX_VERSE:
+            refs = [Reference(book, chapter, verse, end)]
+            i += 2
+
+    # "verses 16, 17 and 19": later verses of the same chapter, in increasing order
+    while _peek(tokens, i, 'list') and _peek(tokens, i + 1, 'num'):
+        extra = tokens[i + 1][1]
+        following = tokens[i + 2] if i + 2 < len(tokens) else None
+        if extra <= refs[-1].verse_end or extra > MAX_VERSE or (
+                following and following[0] == 'word' and lookup_book(str(extra), following[1])):
+            # "John 3:16 and 2 Corinthians 5:17" is the start of the next reference
+            break
+        refs.append(Reference(book, chapter, extra, extra))
+        i += 2
+        if _peek(tokens, i, 'range') and _peek(tokens, i + 1, 'num') and extra < tokens[i + 1][1] <= MAX_VERSE:
+            refs[-1] = Reference(book, chapter, extra, tokens[i + 1][1])
+            i += 2
+    return refs
+
+
+def parse_references(text, strict=True):
+    """All references in text as (char offset, Reference), in order"""
+    found = []
+    for m in _BOOK_RE.finditer(text):
+        tokens = _tokenize(text, m.end())
+        # "2 John 3:16" is not a reference to 2 John; it may still be one to John
+        refs = []
+        book = lookup_book(m.group('ord'), m.group('name')) if m.group('ord') else None
+        if book:
+            refs, start = _parse_tail(*book, tokens, strict), m.start()
+        if not refs:
+            book = lookup_book(None, m.group('name'))
+            if book:
+                refs, start = _parse_tail(*book, tokens, strict), m.start('name')
+        found.extend((start, ref) for ref in refs)
+    return found
+
+
+def format_reference(ref):
+    """Label such as "Romans 8:28-30", "Psalm 23" or "John 3:16ff" (to the end of the chapter)"""
+    name = 'Psalm' if ref.book == PSALMS else BOOKS[ref.book - 1][0]
+    if ref.verse_start is None:
+        return f"{name} {ref.chapter}"
+    if ref.verse_end == ref.verse_start:
+        return f"{name} {ref.chapter}:{ref.verse_start}"
+    if ref.verse_end == MAX_VERSE:
+        return f"{name} {ref.chapter}:{ref.verse_start}ff"
+    return f"{name} {ref.chapter}:{ref.verse_start}-{ref.verse_end}"
+
+
+# --- verse index ----------------------------------------------------------------
+
+def ensure_scripture_tables(conn):
+    c = conn.cursor()
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS scripture_refs (
+            video_id TEXT NOT NULL,
+            char_offset INTEGER NOT NULL,
+            book INTEGER NOT NULL,
+            chapter INTEGER NOT NULL,
+            verse_start INTEGER,
+            verse_end INTEGER
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_scripture_refs_verse ON scripture_refs(book, chapter, verse_start)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_scripture_refs_video ON scripture_refs(video_id, char_offset)")
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS scripture_state (
+            video_id TEXT PRIMARY KEY,
+            transcript_hash TEXT NOT NULL,
+            parser_version TEXT NOT NULL,
+            n_refs INTEGER NOT NULL,
+            updated_at TEXT
+        )
+    """)
+
+
+def sync_references(conn, video_id, transcript, force=False):
+    """Re-parse one video if its transcript or the parser changed. Does not commit.
+
+    Returns (n_refs, changed).
+    """
+    c = conn.cursor()
+    state = c.execute("SELECT transcript_hash, parser_version, n_refs FROM scripture_state WHERE video_id = ?",
+                      (video_id,)).fetchone()
+    digest = transcript_hash(transcript)
+    if state and not force and state[0] == digest and state[1] == PARSER_VERSION:
+        return state[2], False
+    refs = parse_references(transcript or '')
+    c.execute("DELETE FROM scripture_refs WHERE video_id = ?", (video_id,))
+    c.executemany("INSERT INTO scripture_refs(video_id, char_offset, book, chapter, verse_start, verse_end) "
+                  "VALUES (?, ?, ?, ?, ?, ?)", [(video_id, offset, *ref) for offset, ref in refs])
+    c.execute("INSERT OR REPLACE INTO scripture_state(video_id, transcript_hash, parser_version, n_refs, updated_at) "
+              "VALUES (?, ?, ?, ?, ?)", (video_id, digest, PARSER_VERSION, len(refs), datetime.utcnow().isoformat() + "Z"))
+    return len(refs), True
+
+
+def remove_video_references(conn, video_id):
+    """Drop the references of a video that is no longer in `sermons`. Does not commit."""
+    conn.execute("DELETE FROM scripture_refs WHERE video_id = ?", (video_id,))
+    conn.execute("DELETE FROM scripture_state WHERE video_id = ?", (video_id,))
+
+
+def has_references(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'scripture_refs'").fetchone() is not None
+
+
+def find_citations(conn, refs):
+    """(video_id, char_offset, Reference) for every stored reference overlapping any of refs.
+
+    A whole-chapter query matches every reference in that chapter; a verse query also
+    matches references to the whole chapter.
+    """
+    rows = set()
+    for ref in refs:
+        sql = ("SELECT video_id, char_offset, book, chapter, verse_start, verse_end FROM scripture_refs "
+               "WHERE book = ? AND chapter = ?")
+        params = [ref.book, ref.chapter]
+        if ref.verse_start is not None:
+            sql += " AND (verse_start IS NULL OR (verse_start <= ? AND verse_end >= ?))"
+            params += [ref.verse_end, ref.verse_start]
+        rows.update(conn.execute(sql, params))
+    return sorted((video_id, offset, Reference(*ref)) for video_id, offset, *ref in rows)
+
+
+def citing_chunks(conn, refs, limit=20):
+    """Chunks citing any of refs, sermons with the most citations first.
+
+    Returns (total citations, [(chunk_id, video_id, offset, [Reference, ...])]) with
+    offset the transcript position of the chunk's first matching citation. Each
+    citation is placed in the last chunk starting at or before it, so the verse as
+    read out follows it in the passage.
+    """
+    citations = find_citations(conn, refs)
+    per_video = Counter(video_id for video_id, _, _ in citations)
+    citations.sort(key=lambda row: (-per_video[row[0]], row[0], row[1]))
+    chunks = {}
+    for video_id, offset, ref in citations:
+        row = conn.execute("SELECT chunk_id FROM chunks WHERE video_id = ? AND start_offset <= ? "
+                           "ORDER BY start_offset DESC LIMIT 1", (video_id, offset)).fetchone()
+        if row is None:
+            continue
+        if row[0] not in chunks:
+            if len(chunks) >= limit:
+                break
+            chunks[row[0]] = (video_id, offset, [])
+        if ref not in chunks[row[0]][2]:
+            chunks[row[0]][2].append(ref)
+    return len(citations), [(chunk_id, *found) for chunk_id, found in chunks.items()]
+
+
+def chunk_references(conn, chunk_ids):
+    """{chunk_id: [Reference, ...]} for the references inside each chunk's span"""
+    if not has_references(conn):
+        return {}
+    spans = get_chunk_spans(conn, chunk_ids)
+    found = {}
+    for chunk_id in chunk_ids:
+        if chunk_id not in spans:
+            continue
+        video_id, start, end = spans[chunk_id]
+        refs = []
+        for ref in conn.execute("SELECT book, chapter, verse_start, verse_end FROM scripture_refs "
+                                "WHERE video_id = ? AND char_offset >= ? AND char_offset < ? ORDER BY char_offset",
+                                (video_id, start, end)):
+            ref = Reference(*ref)
+            if ref not in refs:
+                refs.append(ref)
+        found[chunk_id] = refs
+    return found
+
+
+def reference_facet(chunk_refs, limit=10):
+    """[(label, number of results citing it)] over chunk_references() output, most cited first"""
+    counts = Counter(format_reference(ref) for refs in chunk_refs.values() for ref in set(refs))
+    return counts.most_common(limit)
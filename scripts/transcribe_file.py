@@ -15,23 +15,7 @@ import sqlite3
 import argparse
 from datetime import datetime
 
-CHUNK_SIZE = 1000
-CHUNK_OVERLAP = 200
-
-
-def chunk_text(text, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
-    if not text:
-        return []
-    chunks = []
-    start = 0
-    L = len(text)
-    while start < L:
-        end = min(start + size, L)
-        chunks.append(text[start:end])
-        if end == L:
-            break
-        start = max(0, end - overlap)
-    return chunks
+from chunking import ensure_chunks_table, replace_chunks
 
 
 def write_transcript_json(video_id, title, published_at, transcript, out_dir="data/transcripts"):
@@ -51,21 +35,18 @@ def write_transcript_json(video_id, title, published_at, transcript, out_dir="da
 
 def insert_into_db(db_path, video_id, title, published_at, transcript):
     conn = sqlite3.connect(db_path)
+    ensure_chunks_table(conn)
     cur = conn.cursor()
     # Insert/replace into sermons (FTS5 table should accept inserts)
     cur.execute(
         "INSERT OR REPLACE INTO sermons(video_id, title, published_at, transcript) VALUES (?, ?, ?, ?)",
         (video_id, title, published_at, transcript),
     )
-    # Remove old chunks for this video
-    cur.execute("DELETE FROM chunks WHERE video_id = ?", (video_id,))
-    # Insert chunk rows
-    chunks = chunk_text(transcript)
-    for chunk in chunks:
-        cur.execute("INSERT INTO chunks(video_id, chunk_text) VALUES (?, ?)", (video_id, chunk))
+    # Replace chunk rows for this video
+    n_chunks = replace_chunks(conn, video_id, transcript)
     conn.commit()
     conn.close()
-    return len(chunks)
+    return n_chunks
 
 
 def transcribe_with_whisper(audio_path, model_name=None):
@@ -0,0 +1,191 @@
+"""
+Per-vector metadata for the FAISS index, kept in compact numpy arrays.
+
+The index stores every vector under its chunk_id (IndexIDMap2), so search results
+are chunk IDs and no positional sidecar is needed to interpret them. What remains
+per vector is which video it came from, stored next to the index as `.npy` files
+in the `ids/` directory of each index version (`index_store.py`; unversioned trees
+used `embeddings_ids/`, EMBEDDINGS_IDS):
+
+  chunk_ids.npy   int64, sorted ascending
+  video_idx.npy   int32, aligned with chunk_ids, indexing into `videos`
+  videos.npy      unicode array of the distinct video IDs
+  video_dates.npy int32 YYYYMMDD publish date per entry of `videos` (0 = unknown);
+                  missing from builds made before search filters
+
+`load(mmap=True)` opens them memory-mapped read-only, so app processes share the
+OS page cache instead of each holding a private copy.
+
+Lookups are binary searches over chunk_ids, so the arrays are matched by ID rather
+than by row position and cannot drift out of step with the index. This replaces the
+old `embeddings_meta.json` list, which is still read as a fallback by `load`.
+
+`select` turns a date range and/or a set of videos into the sorted chunk IDs they
+cover, for filtered searches. It works per video, through a video -> chunk ID layout
+computed once per loaded meta, so its cost grows with the chunks selected rather
+than with the whole index.
+"""
+import os
+import re
+import json
+from datetime import date, datetime
+
+import numpy as np
+
+EMBEDDINGS_IDS = os.getenv('EMBEDDINGS_IDS', 'embeddings_ids')
+ARRAYS = ('chunk_ids', 'video_idx', 'videos')
+OPTIONAL_ARRAYS = ('video_dates',)
+LEGACY_META = 'embeddings_meta.json'
+
+
+def date_key(value):
+    """YYYYMMDD int for a date, a datetime or a published_at string; 0 if unknown"""
+    if value is None:
+        return 0
+    if hasattr(value, 'strftime'):
+        return int(value.strftime('%Y%m%d'))
+    digits = re.sub(r'\D', '', str(value))[:8]
+    return int(digits) if len(digits) == 8 else 0
+
+
+def parse_date(value):
+    """A date filter as a datetime.date (None stays None).
+
+    Takes a date, a datetime, or a 'YYYY-MM-DD' / 'YYYYMMDD' string. Raises ValueError
+    for anything else, so a bad filter is reported instead of acting like no filter.
+    """
+    if value is None or (isinstance(value, date) and not isinstance(value, datetime)):
+        return value
+    if isinstance(value, datetime):
+        return value.date()
+    text = str(value).strip()
+    for fmt in ('%Y-%m-%d', '%Y%m%d'):
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(f"invalid date {value!r}; expected YYYY-MM-DD")
+
+
+class VectorMeta:
+    def __init__(self, chunk_ids, video_idx, videos, video_dates=None):
+        self.chunk_ids = chunk_ids
+        self.video_idx = video_idx
+        self.videos = videos
+        self.video_dates = video_dates
+        self._by_video = None
+
+    @classmethod
+    def from_pairs(cls, chunk_ids, video_ids, published=None):
+        """Build from parallel sequences of chunk IDs and their video IDs.
+
+        published optionally maps video_id -> published_at, stored as video_dates.
+        """
+        chunk_ids = np.asarray(chunk_ids, dtype=np.int64)
+        videos, video_idx = np.unique(np.asarray(video_ids, dtype=str), return_inverse=True)
+        order = np.argsort(chunk_ids, kind='stable')
+        video_dates = None
+        if published is not None:
+            video_dates = np.array([date_key(published.get(str(v))) for v in videos], dtype=np.int32)
+        return cls(chunk_ids[order], video_idx[order].astype(np.int32), videos, video_dates)
+
+    @property
+    def has_dates(self):
+        return self.video_dates is not None
+
+    def __len__(self):
+        return len(self.chunk_ids)
+
+    def positions(self, chunk_ids):
+        """Row of each chunk ID in the arrays, -1 where the ID is not indexed"""
+        chunk_ids = np.asarray(chunk_ids, dtype=np.int64)
+        pos = np.searchsorted(self.chunk_ids, chunk_ids)
+        pos = np.minimum(pos, max(len(self.chunk_ids) - 1, 0))
+        found = len(self.chunk_ids) > 0
+        hit = (self.chunk_ids[pos] == chunk_ids) if found else np.zeros(len(chunk_ids), dtype=bool)
+        return np.where(hit, pos, -1)
+
+    def video_of(self, chunk_ids):
+        """video_id for each chunk ID (None when the ID is not indexed)"""
+        return [str(self.videos[self.video_idx[p]]) if p >= 0 else None for p in self.positions(chunk_ids)]
+
+    def video_ids(self):
+        """Distinct video IDs that have at least one vector"""
+        return set(self.videos[np.unique(self.video_idx)].tolist())
+
+    def chunks_by_video(self):
+        """Map video_id -> sorted array of its chunk IDs"""
+        order, bounds = self._video_layout()
+        return {str(self.videos[v]): self.chunk_ids[order[bounds[v]:bounds[v + 1]]]
+                for v in range(len(self.videos)) if bounds[v + 1] > bounds[v]}
+
+    def _video_layout(self):
+        """(chunk order grouped by video, start of each video's group), computed once"""
+        if self._by_video is None:
+            order = np.argsort(self.video_idx, kind='stable')
+            bounds = np.searchsorted(self.video_idx[order], np.arange(len(self.videos) + 1))
+            self._by_video = (order, bounds)
+        return self._by_video
+
+    def _video_mask(self, date_from=None, date_to=None, video_ids=None):
+        keep = np.ones(len(self.videos), dtype=bool)
+        if date_from is not None or date_to is not None:
+            if not self.has_dates:
+                raise ValueError("index has no publish dates; rebuild it with scripts/build_embeddings.py")
+            dates = np.asarray(self.video_dates)
+            keep &= dates > 0
+            if date_from is not None:
+                keep &= dates >= date_key(parse_date(date_from))
+            if date_to is not None:
+                keep &= dates <= date_key(parse_date(date_to))
+        if video_ids is not None:
+            keep &= np.isin(self.videos, np.asarray(list(video_ids), dtype=str))
+        return keep
+
+    def select_videos(self, date_from=None, date_to=None, video_ids=None):
+        """Indexed video IDs matching every given filter (see `select`)"""
+        return [str(v) for v in np.asarray(self.videos)[self._video_mask(date_from, date_to, video_ids)]]
+
+    def select(self, date_from=None, date_to=None, video_ids=None):
+        """Sorted chunk IDs of the videos matching every given filter.
+
+        Dates are compared as YYYYMMDD and are inclusive; videos without a known date
+        never match a date filter. Raises ValueError for a date that `parse_date`
+        rejects and for a date filter on arrays built without dates.
+        """
+        keep = self._video_mask(date_from, date_to, video_ids)
+        order, bounds = self._video_layout()
+        picked = [order[bounds[v]:bounds[v + 1]] for v in np.flatnonzero(keep)]
+        if not picked:
+            return np.zeros(0, dtype=np.int64)
+        return np.sort(self.chunk_ids[np.concatenate(picked)])
+
+    def save(self, path=EMBEDDINGS_IDS):
+        os.makedirs(path, exist_ok=True)
+        for name in ARRAYS + OPTIONAL_ARRAYS:
+            if getattr(self, name) is None:
+                continue
+            tmp = os.path.join(path, name + '.tmp.npy')
+            np.save(tmp, getattr(self, name), allow_pickle=False)
+            os.replace(tmp, os.path.join(path, name + '.npy'))
+
+    @classmethod
+    def load(cls, path=None, mmap=False):
+        """Load the arrays in path (default: those of the live index version)"""
+        if path is None:
+            from index_store import current_paths
+            paths = current_paths()
+            path = paths[2] if paths else EMBEDDINGS_IDS
+        if os.path.isdir(path):
+            mode = 'r' if mmap else None
+            arrays = [np.load(os.path.join(path, name + '.npy'), mmap_mode=mode, allow_pickle=False)
+                      for name in ARRAYS]
+            for name in OPTIONAL_ARRAYS:
+                file = os.path.join(path, name + '.npy')
+                arrays.append(np.load(file, mmap_mode=mode, allow_pickle=False) if os.path.exists(file) else None)
+            return cls(*arrays)
+        if os.path.exists(LEGACY_META):
+            with open(LEGACY_META, 'r') as f:
+                meta = json.load(f)
+            return cls.from_pairs([m['chunk_id'] for m in meta], [m['video_id'] for m in meta])
+        raise FileNotFoundError(f"{path} not found; run scripts/build_embeddings.py")
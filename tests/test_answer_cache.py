@@ -0,0 +1,74 @@
+"""AI Chat answer cache (app/answer_cache.py): exact and semantic hits, TTL, invalidation"""
+import numpy as np
+import pytest
+
+import answer_cache
+from answer_cache import AnswerCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, 'time', lambda: now[0])
+    return now
+
+
+def vec(*values):
+    return np.array(values, dtype=np.float32)
+
+
+def test_exact_hit_ignores_case_spacing_and_punctuation(clock):
+    cache = AnswerCache()
+    cache.put('v1', 'What is grace?', 'all', 5, 'answer')
+    assert cache.get('v1', '  what IS   grace ', 'all', 5) == ('answer', 'exact')
+    # Mode and k are part of the key
+    assert cache.get('v1', 'what is grace', 'filtered', 5) == (None, None)
+    assert cache.get('v1', 'what is grace', 'all', 3) == (None, None)
+
+
+def test_semantic_hit_above_threshold_only(clock):
+    cache = AnswerCache(threshold=0.95)
+    cache.put('v1', 'What is grace?', 'all', 5, 'answer', qvec=vec(1, 0, 0))
+    assert cache.get('v1', 'Define grace', 'all', 5, qvec=vec(0.99, 0.1, 0)) == ('answer', 'semantic')
+    assert cache.get('v1', 'Who was Paul?', 'all', 5, qvec=vec(0, 1, 0)) == (None, None)
+    assert cache.hits == {'exact': 0, 'semantic': 1} and cache.misses == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = AnswerCache(ttl=60)
+    cache.put('v1', 'What is grace?', 'all', 5, 'answer', qvec=vec(1, 0))
+    clock[0] += 59
+    assert cache.get('v1', 'What is grace?', 'all', 5)[0] == 'answer'
+    clock[0] += 2
+    assert cache.get('v1', 'What is grace?', 'all', 5) == (None, None)
+    assert cache.get('v1', 'Define grace', 'all', 5, qvec=vec(1, 0)) == (None, None)
+    assert len(cache) == 0
+
+
+def test_new_index_version_empties_the_cache(clock):
+    cache = AnswerCache()
+    cache.put('v1', 'What is grace?', 'all', 5, 'answer', qvec=vec(1, 0))
+    assert cache.get('v2', 'What is grace?', 'all', 5) == (None, None)
+    assert len(cache) == 0
+    # Going back does not bring old answers back either
+    assert cache.get('v1', 'What is grace?', 'all', 5) == (None, None)
+
+
+def test_model_change_with_new_dimension_misses_cleanly(clock):
+    # A different embedding model always comes with a new index version
+    cache = AnswerCache()
+    cache.put('minilm-version', 'What is grace?', 'all', 5, 'answer', qvec=np.ones(384, dtype=np.float32))
+    assert cache.get('openai-version', 'Define grace', 'all', 5, qvec=np.ones(1536, dtype=np.float32)) == (None, None)
+    cache.put('openai-version', 'Define grace', 'all', 5, 'new answer', qvec=np.ones(1536, dtype=np.float32))
+    assert cache.get('openai-version', 'Explain grace', 'all', 5,
+                     qvec=np.ones(1536, dtype=np.float32)) == ('new answer', 'semantic')
+
+
+def test_lru_bound(clock):
+    cache = AnswerCache(max_items=2)
+    for question in ('a', 'b'):
+        cache.put('v1', question, 'all', 5, question.upper())
+    cache.get('v1', 'a', 'all', 5)
+    cache.put('v1', 'c', 'all', 5, 'C')
+    assert cache.get('v1', 'b', 'all', 5) == (None, None)
+    assert cache.get('v1', 'a', 'all', 5) == ('A', 'exact')
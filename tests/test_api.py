@@ -0,0 +1,162 @@
+"""JSON API handlers (app/api.py) served on a local port: validation and /ask streaming"""
+import json
+import sqlite3
+import threading
+import http.client
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import api
+import retrieval
+from answer_cache import AnswerCache
+from chunking import ensure_chunks_table, sync_chunks
+from openai_chat import ChatAPIError
+
+
+class FakeIndex:
+    key = version = 'v-test'
+    model = 'stub'
+
+    def __len__(self):
+        return 0
+
+
+class FakeChat:
+    """Streams `pieces`, then raises `error` if set"""
+
+    def __init__(self, pieces, error=None):
+        self.pieces = pieces
+        self.error = error
+
+    def stream(self, prompt):
+        yield from self.pieces
+        if self.error is not None:
+            raise self.error
+
+    def complete(self, prompt):
+        return ''.join(self.stream(prompt))
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    db = str(tmp_path / 'sermons.db')
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE VIRTUAL TABLE sermons USING fts5(video_id, title, published_at, transcript)")
+    ensure_chunks_table(conn)
+    transcript = 'grace abounds to all who believe. ' * 60
+    conn.execute("INSERT INTO sermons VALUES ('v1', 'On Grace', '20240101', ?)", (transcript,))
+    sync_chunks(conn, 'v1', transcript)
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(api, 'DB_PATH', db)
+    monkeypatch.setattr(api, 'OPENAI_API_KEY', 'stub')
+    monkeypatch.setattr(api, 'answers', AnswerCache())
+    monkeypatch.setattr(retrieval, 'get_index', lambda: FakeIndex())
+    monkeypatch.setattr(retrieval, 'encode_query', lambda index, q: [1.0, 0.0])
+    monkeypatch.setattr(api.rag, 'build_prompt', lambda *args: ('prompt', [('On Grace', '20240101', 'v1', 'grace...')]))
+    retrieval._counts.clear()
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), api.APIHandler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+    yield httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def request(port, method, path, body=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    data = body if isinstance(body, (bytes, type(None))) else json.dumps(body).encode('utf-8')
+    conn.request(method, path, body=data, headers={'Content-Type': 'application/json'})
+    response = conn.getresponse()
+    raw = response.read()
+    conn.close()
+    return response, raw
+
+
+def get_json(port, path, body=None, method='GET'):
+    response, raw = request(port, method, path, body)
+    return response.status, json.loads(raw)
+
+
+def sse_events(raw):
+    events = []
+    for block in raw.decode('utf-8').split('\n\n'):
+        if not block:
+            continue
+        fields = dict(line.split(': ', 1) for line in block.split('\n'))
+        events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+
+@pytest.mark.parametrize('path, message', [
+    ('/search/keyword', 'missing q'),
+    ('/search/semantic?q=grace&date_from=2024-13-01', 'date'),
+    ('/search/hybrid?q=grace&date_to=yesterday', 'date'),
+    ('/search/keyword?q=grace&cursor=garbage', 'invalid cursor'),
+    ('/search/scripture?ref=no+reference+here', 'no scripture reference'),
+])
+def test_search_validation_errors_are_400(server, path, message):
+    status, body = get_json(server, path)
+    assert status == 400 and message in body['error']
+
+
+def test_unknown_endpoint_and_bad_body(server):
+    assert get_json(server, '/search/nothing')[0] == 404
+    response, raw = request(server, 'POST', '/search/keyword', b'{not json')
+    assert response.status == 400 and json.loads(raw)['error'] == 'body is not valid JSON'
+    response, raw = request(server, 'POST', '/search/keyword', b'[1, 2]')
+    assert response.status == 400
+
+
+def test_keyword_search_pages_with_cursor(server):
+    status, body = get_json(server, '/search/keyword', {'q': 'grace', 'limit': 1}, method='POST')
+    assert status == 200 and body['total'] >= 2 and len(body['results']) == 1
+    first = body['results'][0]
+    assert first['video_id'] == 'v1' and first['title'] == 'On Grace' and '<b>grace</b>' in first['snippet']
+    assert isinstance(first['chunk_id'], str)
+    status, page2 = get_json(server, f"/search/keyword?q=grace&limit=1&cursor={body['next_cursor']}")
+    assert status == 200 and page2['results'][0]['chunk_id'] != first['chunk_id']
+
+
+def test_ask_streams_sources_deltas_and_done(server, monkeypatch):
+    monkeypatch.setattr(api, '_chat', FakeChat(['Grace ', 'is ', 'unearned.']))
+    response, raw = request(server, 'POST', '/ask', {'q': 'What is grace?', 'stream': True})
+    assert response.status == 200
+    assert response.getheader('Content-Type') == 'text/event-stream'
+    assert response.getheader('Transfer-Encoding') == 'chunked'
+    events = sse_events(raw)
+    assert events[0][0] == 'sources' and events[0][1][0]['video_id'] == 'v1'
+    assert [data for name, data in events if name == 'delta'] == ['Grace ', 'is ', 'unearned.']
+    assert events[-1] == ('done', {'cached': None})
+    # The streamed answer was cached: asking again replays it in one delta
+    events = sse_events(request(server, 'POST', '/ask', {'q': 'what is grace', 'stream': True})[1])
+    assert [name for name, _ in events] == ['sources', 'delta', 'done']
+    assert events[1][1] == 'Grace is unearned.' and events[2][1] == {'cached': 'exact'}
+
+
+def test_ask_stream_reports_chat_failure_as_error_event(server, monkeypatch):
+    monkeypatch.setattr(api, '_chat', FakeChat(['Grace '], ChatAPIError('stream interrupted: reset')))
+    response, raw = request(server, 'POST', '/ask', {'q': 'What is grace?', 'stream': True})
+    assert response.status == 200
+    events = sse_events(raw)
+    assert [name for name, _ in events] == ['sources', 'delta', 'error']
+    assert events[-1][1] == 'stream interrupted: reset'
+    # A failed answer is not cached
+    assert len(api.answers) == 0
+
+
+def test_ask_stream_unexpected_failure_closes_the_stream(server, monkeypatch):
+    monkeypatch.setattr(api, '_chat', FakeChat(['Grace '], RuntimeError('boom')))
+    response, raw = request(server, 'POST', '/ask', {'q': 'What is grace?', 'stream': True})
+    assert response.status == 200
+    # The chunked body still ends cleanly after the error event
+    events = sse_events(raw)
+    assert [name for name, _ in events] == ['sources', 'delta', 'error']
+    assert events[-1] == ('error', 'internal error')
+
+
+def test_ask_without_stream_and_chat_failure_is_502(server, monkeypatch):
+    monkeypatch.setattr(api, '_chat', FakeChat([], ChatAPIError('HTTP 500: down')))
+    status, body = get_json(server, '/ask', {'q': 'What is grace?'}, method='POST')
+    assert status == 502 and 'HTTP 500' in body['error']
@@ -0,0 +1,252 @@
+"""Canonical chunker (scripts/chunking.py): spans, stable IDs, incremental sync, legacy migration"""
+import sqlite3
+
+import pytest
+
+import chunking
+from chunking import CHUNK_OVERLAP, CHUNK_SIZE, chunk_spans, chunk_text, make_chunk_id, make_chunks
+
+
+def test_spans_are_fixed_windows_sharing_the_overlap():
+    text = 'x' * 2500
+    spans = chunk_spans(text)
+    assert spans == [(0, 1000), (800, 1800), (1600, 2500)]
+    for (_, end), (start, _) in zip(spans, spans[1:]):
+        assert end - start == CHUNK_OVERLAP
+    assert all(end - start <= CHUNK_SIZE for start, end in spans)
+
+
+def test_spans_at_the_boundaries():
+    assert chunk_spans('') == chunk_spans('   \n') == chunk_spans(None) == []
+    assert chunk_spans('short') == [(0, 5)]
+    assert chunk_spans('y' * CHUNK_SIZE) == [(0, CHUNK_SIZE)]
+    # One character over a window adds a chunk that is mostly overlap
+    assert chunk_spans('y' * (CHUNK_SIZE + 1)) == [(0, CHUNK_SIZE), (CHUNK_SIZE - CHUNK_OVERLAP, CHUNK_SIZE + 1)]
+    with pytest.raises(ValueError):
+        chunk_spans('abc', size=10, overlap=10)
+
+
+def test_chunk_text_slices_the_spans():
+    text = ''.join(chr(ord('a') + i % 26) for i in range(1900))
+    chunks = chunk_text(text)
+    assert [len(c) for c in chunks] == [1000, 1000, 300]
+    assert chunks[0][-CHUNK_OVERLAP:] == chunks[1][:CHUNK_OVERLAP]
+
+
+def test_ids_are_stable_and_depend_on_video_span_and_version():
+    text = 'grace ' * 500
+    first = make_chunks('v1', text)
+    assert make_chunks('v1', text) == first
+    ids = [chunk_id for chunk_id, _, _, _ in first]
+    assert len(set(ids)) == len(ids)
+    assert all(0 <= chunk_id < 2 ** 63 for chunk_id in ids)
+    assert make_chunk_id('v1', 0, 1000) == ids[0]
+    assert make_chunk_id('v2', 0, 1000) != ids[0]
+    assert make_chunk_id('v1', 0, 999) != ids[0]
+    # A new CHUNKER_VERSION moves every chunk to a new ID
+    assert make_chunk_id('v1', 0, 1000, version='chars2:1000/200') != ids[0]
+
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE VIRTUAL TABLE sermons USING fts5(video_id, title, published_at, transcript)")
+    chunking.ensure_chunks_table(conn)
+    yield conn
+    conn.close()
+
+
+def chunk_rows(conn, video_id):
+    return conn.execute("SELECT chunk_id, start_offset, end_offset FROM chunks WHERE video_id = ? "
+                        "ORDER BY start_offset", (video_id,)).fetchall()
+
+
+def changes(conn, since=0):
+    return conn.execute("SELECT chunk_id, op FROM chunk_changes WHERE seq > ? ORDER BY seq", (since,)).fetchall()
+
+
+def ingest(conn, video_id, transcript):
+    conn.execute("INSERT INTO sermons(video_id, title, published_at, transcript) VALUES (?, 't', '20240101', ?)",
+                 (video_id, transcript))
+    return chunking.sync_chunks(conn, video_id, transcript)
+
+
+def test_sync_chunks_writes_and_logs_new_chunks(conn):
+    text = 'a' * 2500
+    assert ingest(conn, 'v1', text) == (3, True)
+    rows = chunk_rows(conn, 'v1')
+    assert [(start, end) for _, start, end in rows] == chunk_spans(text)
+    assert changes(conn) == [(chunk_id, 'upsert') for chunk_id, _, _ in rows]
+    assert chunking.get_chunk_texts(conn, [rows[1][0]], chunking.TranscriptCache()) == {rows[1][0]: ('v1', text[800:1800])}
+
+
+def test_unchanged_transcript_is_skipped(conn):
+    text = 'b' * 1500
+    ingest(conn, 'v1', text)
+    seq = chunking.last_change_seq(conn)
+    assert chunking.sync_chunks(conn, 'v1', text) == (2, False)
+    assert chunking.last_change_seq(conn) == seq
+
+
+def test_changed_transcript_logs_only_the_diff(conn):
+    ingest(conn, 'v1', 'c' * 2500)
+    old = {chunk_id for chunk_id, _, _ in chunk_rows(conn, 'v1')}
+    seq = chunking.last_change_seq(conn)
+    # Shorter transcript: the first window keeps its span (and ID), the rest change
+    assert ingest(conn, 'v1', 'd' * 1500) == (2, True)
+    new = {chunk_id for chunk_id, _, _ in chunk_rows(conn, 'v1')}
+    logged = changes(conn, seq)
+    assert {chunk_id for chunk_id, op in logged if op == 'delete'} == old - new
+    assert {chunk_id for chunk_id, op in logged if op == 'upsert'} == new
+    net, last = chunking.read_chunk_changes(conn, seq)
+    assert last == chunking.last_change_seq(conn)
+    assert {chunk_id for chunk_id, (_, op) in net.items() if op == 'delete'} == old - new
+
+
+def test_new_chunker_version_resplits(conn):
+    ingest(conn, 'v1', 'e' * 1200)
+    conn.execute("UPDATE transcript_state SET chunker_version = 'chars0:500/100'")
+    n, changed = chunking.sync_chunks(conn, 'v1', 'e' * 1200)
+    assert changed and n == 2
+
+
+def test_remove_video_chunks_logs_deletes(conn):
+    ingest(conn, 'v1', 'f' * 1500)
+    ids = [chunk_id for chunk_id, _, _ in chunk_rows(conn, 'v1')]
+    seq = chunking.last_change_seq(conn)
+    assert chunking.remove_video_chunks(conn, 'v1') == 2
+    assert chunk_rows(conn, 'v1') == []
+    assert sorted(changes(conn, seq)) == sorted((chunk_id, 'delete') for chunk_id in ids)
+    assert conn.execute("SELECT COUNT(*) FROM transcript_state").fetchone()[0] == 0
+
+
+def legacy_db(columns, rows):
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE VIRTUAL TABLE sermons USING fts5(video_id, title, published_at, transcript)")
+    conn.execute(f"CREATE TABLE chunks({columns})")
+    marks = ','.join('?' * len(rows[0]))
+    conn.executemany(f"INSERT INTO chunks VALUES ({marks})", rows)
+    return conn
+
+
+def test_migration_keeps_chunks_that_have_offsets():
+    text = 'g' * 1500
+    spans = make_chunks('v1', text)
+    conn = legacy_db('chunk_id INTEGER PRIMARY KEY, video_id TEXT, chunk_text TEXT, start_offset INTEGER, end_offset INTEGER',
+                     [(chunk_id, 'v1', chunk, start, end) for chunk_id, start, end, chunk in spans]
+                     + [(7, 'old', 'text without offsets', None, None)])
+    conn.execute("INSERT INTO sermons VALUES ('v1', 't', '20240101', ?)", (text,))
+    chunking.ensure_chunks_table(conn)
+    assert [row[1] for row in conn.execute("PRAGMA table_info(chunks)")] == chunking.CHUNK_COLUMNS
+    assert chunk_rows(conn, 'v1') == [(chunk_id, start, end) for chunk_id, start, end, _ in spans]
+    assert chunk_rows(conn, 'old') == []
+    assert changes(conn) == [(7, 'delete')]
+    texts = chunking.get_chunk_texts(conn, [spans[1][0]], chunking.TranscriptCache())
+    assert texts == {spans[1][0]: ('v1', spans[1][3])}
+    # Running it again is a no-op
+    chunking.ensure_chunks_table(conn)
+    assert len(chunk_rows(conn, 'v1')) == 2 and changes(conn) == [(7, 'delete')]
+
+
+def test_migration_of_text_only_chunks_schedules_a_rechunk():
+    conn = legacy_db('chunk_id INTEGER PRIMARY KEY AUTOINCREMENT, video_id TEXT, chunk_text TEXT',
+                     [(1, 'v1', 'first'), (2, 'v1', 'second')])
+    conn.execute("CREATE TABLE transcript_state(video_id TEXT PRIMARY KEY, transcript_hash TEXT NOT NULL, "
+                 "chunker_version TEXT NOT NULL, n_chunks INTEGER NOT NULL, updated_at TEXT)")
+    conn.execute("INSERT INTO transcript_state VALUES ('v1', 'h', ?, 2, NULL)", (chunking.CHUNKER_VERSION,))
+    conn.execute("INSERT INTO sermons VALUES ('v1', 't', '20240101', ?)", ('h' * 1500,))
+    chunking.ensure_chunks_table(conn)
+    assert conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0] == 0
+    assert sorted(changes(conn)) == [(1, 'delete'), (2, 'delete')]
+    # The video lost its state, so the next sync re-chunks it from the transcript
+    assert chunking.sync_chunks(conn, 'v1', 'h' * 1500) == (2, True)
+
+
+def fts_hits(conn, word):
+    return {row[0] for row in conn.execute("SELECT rowid FROM chunks_fts WHERE chunks_fts MATCH ?", (word,))}
+
+
+def fts_index(conn):
+    # What the FTS index holds, independent of the content view
+    conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS temp.fts_terms USING fts5vocab(main, chunks_fts, 'instance')")
+    return sorted(conn.execute("SELECT term, doc, offset FROM fts_terms").fetchall())
+
+
+def assert_index_consistent(conn):
+    before = fts_index(conn)
+    chunking.rebuild_chunks_fts(conn)
+    assert fts_index(conn) == before
+
+
+def test_chunks_fts_stores_no_text(conn):
+    ingest(conn, 'v1', 'grace upon grace. ' * 100)
+    assert 'chunks_fts_content' not in {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+    chunk_id = chunk_rows(conn, 'v1')[0][0]
+    snippet = conn.execute("SELECT snippet(chunks_fts, 0, '[', ']', '', 4) FROM chunks_fts "
+                           "WHERE chunks_fts MATCH 'grace' AND rowid = ?", (chunk_id,)).fetchone()[0]
+    assert '[grace]' in snippet
+
+
+def test_reingest_replaces_fts_entries(conn):
+    ingest(conn, 'v1', 'grace upon grace. ' * 100)
+    ingest(conn, 'v2', 'grace and peace. ' * 100)
+    # Re-ingest inserts a new sermons row; the old one still holds the indexed text
+    ingest(conn, 'v1', 'mercy without end. ' * 100)
+    assert fts_hits(conn, 'grace') == {chunk_id for chunk_id, _, _ in chunk_rows(conn, 'v2')}
+    assert fts_hits(conn, 'mercy') == {chunk_id for chunk_id, _, _ in chunk_rows(conn, 'v1')}
+    assert_index_consistent(conn)
+
+
+def test_overwritten_transcript_rebuilds_fts(conn):
+    ingest(conn, 'v1', 'grace upon grace. ' * 100)
+    ingest(conn, 'v2', 'grace and peace. ' * 100)
+    conn.execute("UPDATE sermons SET transcript = ? WHERE video_id = 'v1'", ('mercy without end. ' * 100,))
+    chunking.sync_chunks(conn, 'v1', 'mercy without end. ' * 100)
+    assert fts_hits(conn, 'grace') == {chunk_id for chunk_id, _, _ in chunk_rows(conn, 'v2')}
+    assert fts_hits(conn, 'mercy') == {chunk_id for chunk_id, _, _ in chunk_rows(conn, 'v1')}
+    assert_index_consistent(conn)
+
+
+def test_removed_video_leaves_fts(conn):
+    ingest(conn, 'v1', 'grace upon grace. ' * 100)
+    ingest(conn, 'v2', 'grace and peace. ' * 100)
+    conn.execute("DELETE FROM sermons WHERE video_id = 'v1'")
+    stale = set()
+    chunking.remove_video_chunks(conn, 'v1', fts_stale=stale)
+    assert stale == {'v1'}
+    chunking.rebuild_chunks_fts(conn)
+    assert fts_hits(conn, 'grace') == {chunk_id for chunk_id, _, _ in chunk_rows(conn, 'v2')}
+
+
+def test_stored_content_fts_is_replaced():
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE VIRTUAL TABLE sermons USING fts5(video_id, title, published_at, transcript)")
+    chunking._create_chunks(conn.cursor())
+    conn.execute("CREATE VIRTUAL TABLE chunks_fts USING fts5(text, video_id UNINDEXED)")
+    conn.execute("INSERT INTO sermons VALUES ('v1', 't', '20240101', ?)", ('grace upon grace. ' * 100,))
+    chunking.ensure_chunks_table(conn)
+    chunking.sync_chunks(conn, 'v1', 'grace upon grace. ' * 100)
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'chunks_fts'").fetchone()[0]
+    assert "content='chunk_texts'" in sql
+    assert fts_hits(conn, 'grace') == {chunk_id for chunk_id, _, _ in chunk_rows(conn, 'v1')}
+
+
+def test_schema_check_rejects_legacy_tables():
+    conn = legacy_db('chunk_id INTEGER PRIMARY KEY AUTOINCREMENT, video_id TEXT, chunk_text TEXT', [(1, 'v1', 'x')])
+    with pytest.raises(chunking.ChunkSchemaError, match='rebuild_chunks.py'):
+        chunking.check_chunks_schema(conn)
+    chunking.ensure_chunks_table(conn)
+    chunking.check_chunks_schema(conn)
+
+
+def test_set_transcript_updates_in_place(conn):
+    ingest(conn, 'v1', 'grace upon grace. ' * 100)
+    ingest(conn, 'v2', 'grace and peace. ' * 100)
+    assert chunking.set_transcript(conn, 'v1', 'mercy without end. ' * 100, title='New title') == 1
+    assert conn.execute("SELECT COUNT(*), MAX(title) FROM sermons WHERE video_id = 'v1'").fetchone() == (1, 'New title')
+    assert fts_hits(conn, 'grace') == {chunk_id for chunk_id, _, _ in chunk_rows(conn, 'v2')}
+    assert fts_hits(conn, 'mercy') == {chunk_id for chunk_id, _, _ in chunk_rows(conn, 'v1')}
+    assert_index_consistent(conn)
+    with pytest.raises(ValueError):
+        chunking.set_transcript(conn, 'v1', 'text', transcript_hash='x')
@@ -0,0 +1,99 @@
+"""Packing retrieved chunks into AI Chat context (app/context_packer.py)"""
+import sqlite3
+
+import pytest
+
+import context_packer
+from chunking import TranscriptCache, ensure_chunks_table, sync_chunks
+from context_packer import MIN_PARTIAL_TOKENS, Passage, drop_near_duplicates, merge_spans, pack_context
+from openai_embeddings import count_tokens
+
+
+def words(prefix, n):
+    return ' '.join(f'{prefix}{i}' for i in range(n))
+
+
+def spans_of(passages):
+    return [(p.video_id, p.start, p.end, p.rank, p.chunk_ids) for p in passages]
+
+
+def test_merge_overlapping_and_adjacent_spans_of_one_video():
+    hits = [(3, 'a', 800, 1800), (1, 'a', 0, 1000), (7, 'b', 0, 1000),
+            (2, 'a', 1800, 2500), (5, 'a', 4000, 5000)]
+    assert spans_of(merge_spans(hits)) == [
+        # Overlapping (0-1000, 800-1800) and touching (1800-2500) windows become one passage
+        ('a', 0, 2500, 0, [1, 3, 2]),
+        ('b', 0, 1000, 2, [7]),
+        ('a', 4000, 5000, 4, [5]),
+    ]
+
+
+def test_same_offsets_in_different_videos_are_not_merged():
+    assert spans_of(merge_spans([(1, 'a', 0, 1000), (2, 'b', 500, 1500)])) == [
+        ('a', 0, 1000, 0, [1]), ('b', 500, 1500, 1, [2])]
+
+
+def passage(video_id, rank, text):
+    p = Passage(video_id, 0, len(text), rank, [rank])
+    p.text = text
+    return p
+
+
+def test_near_duplicates_across_videos_are_dropped():
+    reading = words('psalm', 60)
+    passages = [passage('a', 0, reading), passage('b', 1, reading + ' amen'),
+                passage('c', 2, words('grace', 60)), passage('d', 3, ' '.join(reading.split()[:30]))]
+    kept = drop_near_duplicates(passages, threshold=0.8)
+    # 'b' repeats 'a' almost verbatim; 'd' shares only half of it
+    assert [p.video_id for p in kept] == ['a', 'c', 'd']
+    assert [p.video_id for p in drop_near_duplicates(passages, threshold=1.01)] == ['a', 'b', 'c', 'd']
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE VIRTUAL TABLE sermons USING fts5(video_id, title, published_at, transcript)")
+    ensure_chunks_table(conn)
+    for video_id in ('a', 'b'):
+        text = words(video_id, 1500)
+        conn.execute("INSERT INTO sermons VALUES (?, 't', '20240101', ?)", (video_id, text))
+        sync_chunks(conn, video_id, text)
+    yield conn
+    conn.close()
+
+
+def chunk_ids(conn, video_id):
+    return [row[0] for row in conn.execute(
+        "SELECT chunk_id FROM chunks WHERE video_id = ? ORDER BY start_offset", (video_id,))]
+
+
+def test_pack_merges_overlap_so_it_is_paid_once(conn):
+    a = chunk_ids(conn, 'a')
+    packed = pack_context(conn, [a[1], a[0]], TranscriptCache(), budget=10 ** 6)
+    assert len(packed) == 1
+    transcript = conn.execute("SELECT transcript FROM sermons WHERE video_id = 'a'").fetchone()[0]
+    assert packed[0].text == transcript[:1800] and packed[0].chunk_ids == [a[0], a[1]]
+
+
+def test_budget_cuts_the_crossing_passage_at_a_word_boundary(conn):
+    a, b = chunk_ids(conn, 'a'), chunk_ids(conn, 'b')
+    cache = TranscriptCache()
+    first = count_tokens(cache.chunk_text(conn, 'a', 0, 1000), context_packer.OPENAI_CHAT_MODEL)
+    budget = first + MIN_PARTIAL_TOKENS + 20
+    packed = pack_context(conn, [a[0], b[0], a[5]], cache, budget=budget)
+    assert [p.video_id for p in packed] == ['a', 'b']
+    cut = packed[1]
+    assert cut.tokens <= budget - first and cut.tokens == count_tokens(cut.text, context_packer.OPENAI_CHAT_MODEL)
+    full = cache.chunk_text(conn, 'b', 0, 1000)
+    assert full.startswith(cut.text) and len(cut.text) < len(full)
+    # Cut between words, never inside one
+    assert full[len(cut.text)] == ' '
+    assert sum(p.tokens for p in packed) <= budget
+
+
+def test_budget_too_small_for_a_useful_partial_leaves_it_out(conn):
+    a, b = chunk_ids(conn, 'a'), chunk_ids(conn, 'b')
+    cache = TranscriptCache()
+    first = count_tokens(cache.chunk_text(conn, 'a', 0, 1000), context_packer.OPENAI_CHAT_MODEL)
+    packed = pack_context(conn, [a[0], b[0]], cache, budget=first + MIN_PARTIAL_TOKENS - 1)
+    assert [p.video_id for p in packed] == ['a']
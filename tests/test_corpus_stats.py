@@ -0,0 +1,65 @@
+"""Trigger-maintained corpus counters (scripts/corpus_stats.py)"""
+import sqlite3
+
+import pytest
+
+import corpus_stats
+from chunking import ensure_chunks_table, remove_video_chunks, sync_chunks
+from corpus_stats import LONG_TRANSCRIPT_CHARS, read_stats
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE VIRTUAL TABLE sermons USING fts5(video_id, title, published_at, transcript)")
+    ensure_chunks_table(conn)
+    yield conn
+    conn.close()
+
+
+def add(conn, video_id, transcript):
+    conn.execute("INSERT INTO sermons VALUES (?, 't', '20240101', ?)", (video_id, transcript))
+
+
+def test_triggers_track_insert_update_and_delete(conn):
+    add(conn, 'old', 'x' * 500)
+    assert read_stats(conn) == {'videos': 1, 'with_transcript': 1, 'with_long_transcript': 1,
+                                'transcript_chars': 500, 'chunks': 0}
+    # From here on only the triggers update the row
+    add(conn, 'short', 'Transcript unavailable')
+    add(conn, 'empty', '')
+    add(conn, 'none', None)
+    assert read_stats(conn) == {'videos': 4, 'with_transcript': 2, 'with_long_transcript': 1,
+                                'transcript_chars': 522, 'chunks': 0}
+
+    conn.execute("UPDATE sermons SET transcript = ? WHERE video_id = 'empty'", ('y' * 300,))
+    conn.execute("UPDATE sermons SET transcript = ? WHERE video_id = 'old'", ('z' * (LONG_TRANSCRIPT_CHARS - 1),))
+    assert read_stats(conn) == {'videos': 4, 'with_transcript': 3, 'with_long_transcript': 1,
+                                'transcript_chars': 22 + 300 + 99, 'chunks': 0}
+
+    conn.execute("DELETE FROM sermons WHERE video_id IN ('short', 'none')")
+    assert read_stats(conn) == {'videos': 2, 'with_transcript': 2, 'with_long_transcript': 1,
+                                'transcript_chars': 399, 'chunks': 0}
+    assert read_stats(conn) == corpus_stats._count(conn)
+
+
+def test_chunk_triggers(conn):
+    read_stats(conn)
+    add(conn, 'v1', 'w' * 2500)
+    sync_chunks(conn, 'v1', 'w' * 2500)
+    assert read_stats(conn)['chunks'] == 3
+    remove_video_chunks(conn, 'v1')
+    assert read_stats(conn)['chunks'] == 0
+
+
+def test_older_layout_is_replaced(conn):
+    add(conn, 'v1', 'x' * 50)
+    add(conn, 'v2', 'x' * 500)
+    conn.execute("CREATE TABLE corpus_stats (id INTEGER PRIMARY KEY CHECK (id = 1), videos INTEGER NOT NULL, "
+                 "with_transcript INTEGER NOT NULL, transcript_chars INTEGER NOT NULL, chunks INTEGER NOT NULL)")
+    conn.execute("INSERT INTO corpus_stats VALUES (1, 2, 2, 550, 0)")
+    conn.execute("CREATE TRIGGER corpus_stats_sermons_insert AFTER INSERT ON sermons_content "
+                 "BEGIN UPDATE corpus_stats SET videos = videos + 1 WHERE id = 1; END")
+    assert read_stats(conn)['with_long_transcript'] == 1
+    add(conn, 'v3', 'x' * 200)
+    assert read_stats(conn) == corpus_stats._count(conn)
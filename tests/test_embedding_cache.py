@@ -0,0 +1,46 @@
+"""On-disk embedding cache (scripts/embedding_cache.py) and its use for query vectors"""
+import numpy as np
+
+import retrieval
+from embedding_cache import EmbeddingCache
+
+
+def vectors(n, dim=4):
+    return np.arange(n * dim, dtype=np.float32).reshape(n, dim)
+
+
+def test_round_trip_and_reopen(tmp_path):
+    cache = EmbeddingCache('model/a', str(tmp_path))
+    cache.put_many(['one', 'two'], vectors(2))
+    cache.close()
+    cache = EmbeddingCache('model/a', str(tmp_path))
+    got = cache.get_many(['two', 'three', ' one '])
+    assert np.array_equal(got[0], vectors(2)[1]) and got[1] is None
+    assert np.array_equal(got[2], vectors(2)[0])
+    cache.close()
+
+
+def test_stops_growing_at_max_entries(tmp_path):
+    cache = EmbeddingCache('m', str(tmp_path), max_entries=3)
+    cache.put_many(['a', 'b'], vectors(2))
+    cache.put_many(['c', 'd', 'e'], vectors(3))
+    assert len(cache) == 3
+    calls = []
+    out = cache.cached_encode(['a', 'e'], lambda texts: calls.append(texts) or vectors(len(texts)))
+    # Misses past the cap are still encoded and returned, just not stored
+    assert calls == [['e']] and out.shape == (2, 4)
+    assert len(cache) == 3
+    cache.close()
+
+
+def test_query_cache_off_by_default_and_unwritable_dir_falls_back(tmp_path, monkeypatch):
+    assert retrieval._query_cache('m') is None
+    blocker = tmp_path / 'file'
+    blocker.write_text('not a directory')
+    monkeypatch.setattr(retrieval, 'QUERY_EMBEDDING_CACHE', True)
+    monkeypatch.setattr(retrieval, 'QUERY_CACHE_DIR', str(blocker / 'queries'))
+    assert retrieval._query_cache('m') is None
+    monkeypatch.setattr(retrieval, 'QUERY_CACHE_DIR', str(tmp_path / 'queries'))
+    cache = retrieval._query_cache('m')
+    assert cache is not None and cache.max_entries == retrieval.QUERY_CACHE_MAX_ENTRIES
+    cache.close()
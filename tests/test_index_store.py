@@ -0,0 +1,112 @@
+"""Versioned index directories (scripts/index_store.py) and what the app agrees to serve"""
+import os
+import json
+import time
+
+import faiss
+import numpy as np
+import pytest
+
+import index_store
+import retrieval
+from ann_index import NotChunkKeyed, build_index
+from vector_meta import VectorMeta
+
+
+def small_index(ids=(11, 22, 33)):
+    return build_index('flat-l2', np.eye(len(ids), 4, dtype='float32'), list(ids))
+
+
+def publish(index_dir, keep=3, **manifest):
+    meta = VectorMeta.from_pairs([11, 22, 33], ['a', 'a', 'b'], {'a': '20240101', 'b': '20240201'})
+    return index_store.publish(small_index(), meta, dict({'model': 'm', 'dim': 4}, **manifest),
+                               index_dir=str(index_dir), keep=keep)
+
+
+def test_publish_writes_a_complete_version_and_swaps_current(tmp_path):
+    first = publish(tmp_path, count=3)
+    assert index_store.current_version(str(tmp_path)) == first
+    assert sorted(os.listdir(tmp_path / first)) == ['ids', 'index.faiss', 'manifest.json']
+    second = publish(tmp_path, count=3)
+    assert second > first
+    assert (tmp_path / 'CURRENT').read_text() == second + '\n'
+    # Nothing temporary is left behind
+    assert sorted(os.listdir(tmp_path)) == sorted(['CURRENT', first, second])
+    version, index_file, ids_dir = index_store.current_paths(str(tmp_path))
+    assert (version, index_file, ids_dir) == (second, str(tmp_path / second / 'index.faiss'),
+                                              str(tmp_path / second / 'ids'))
+    assert faiss.read_index(index_file).ntotal == 3
+    assert len(VectorMeta.load(ids_dir)) == 3
+
+
+def test_manifest_records_the_build(tmp_path):
+    version = publish(tmp_path, chunker_version='chars1:1000/200', last_change_seq=42)
+    manifest = index_store.read_manifest(version, str(tmp_path))
+    assert manifest['model'] == 'm' and manifest['dim'] == 4
+    assert manifest['chunker_version'] == 'chars1:1000/200' and manifest['last_change_seq'] == 42
+    assert manifest['version'] == version and manifest['created_at']
+    assert manifest == json.loads((tmp_path / version / 'manifest.json').read_text())
+
+
+def test_failed_publish_keeps_the_live_version(tmp_path):
+    live = publish(tmp_path)
+
+    class BrokenMeta:
+        def save(self, path):
+            raise OSError('disk full')
+
+    with pytest.raises(OSError):
+        index_store.publish(small_index(), BrokenMeta(), {'model': 'm'}, index_dir=str(tmp_path))
+    assert index_store.current_version(str(tmp_path)) == live
+    assert index_store.list_versions(str(tmp_path)) == [live]
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.partial')]
+
+
+def test_prune_keeps_current_and_the_newest_versions(tmp_path):
+    versions = [publish(tmp_path, keep=100) for _ in range(5)]
+    # Roll back to an old version: it survives pruning even though it is not among the newest
+    (tmp_path / 'CURRENT').write_text(versions[0] + '\n')
+    index_store.prune_versions(str(tmp_path), keep=2)
+    assert index_store.list_versions(str(tmp_path)) == [versions[0]] + versions[-2:]
+    assert index_store.current_version(str(tmp_path)) == versions[0]
+
+
+def test_prune_removes_only_stale_partials(tmp_path):
+    publish(tmp_path)
+    stale, fresh = tmp_path / '.old.partial', tmp_path / '.new.partial'
+    stale.mkdir()
+    fresh.mkdir()
+    day_ago = time.time() - 25 * 3600
+    os.utime(stale, (day_ago, day_ago))
+    index_store.prune_versions(str(tmp_path))
+    assert not stale.exists() and fresh.exists()
+
+
+def test_publish_prunes_to_keep(tmp_path):
+    versions = [publish(tmp_path, keep=2) for _ in range(4)]
+    assert index_store.list_versions(str(tmp_path)) == versions[-2:]
+
+
+def test_plain_index_is_refused(tmp_path):
+    # Pre-IDMap builds stored vectors by row position
+    path = str(tmp_path / 'faiss_index.faiss')
+    flat = faiss.IndexFlatL2(4)
+    flat.add(np.eye(4, dtype='float32'))
+    faiss.write_index(flat, path)
+    with pytest.raises(NotChunkKeyed, match='build_embeddings.py'):
+        retrieval.SemanticIndex(path, str(tmp_path / 'ids'), version=None)
+
+
+def test_id_mapped_index_returns_chunk_ids(tmp_path, monkeypatch):
+    monkeypatch.setattr(retrieval, 'current_manifest', lambda: {'model': 'm', 'dim': 4})
+    path = str(tmp_path / 'faiss_index.faiss')
+    faiss.write_index(build_index('flat-l2', np.eye(4, dtype='float32'), [11, 22, 33, 44]), path)
+    index = retrieval.SemanticIndex(path, str(tmp_path / 'ids'), version=None)
+    assert [chunk_id for chunk_id, _, _ in index.search(np.eye(4, dtype='float32')[2], 1)] == [33]
+
+
+def test_older_faiss_without_mmap_ifc_still_loads(tmp_path, monkeypatch):
+    path = str(tmp_path / 'index.faiss')
+    faiss.write_index(build_index('flat-l2', np.eye(4, dtype='float32'), [1, 2, 3, 4]), path)
+    monkeypatch.delattr(faiss, 'IO_FLAG_MMAP_IFC')
+    assert retrieval.read_index_mmap(path).ntotal == 4
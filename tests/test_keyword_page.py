@@ -0,0 +1,88 @@
+"""Keyset-paged keyword search (retrieval.keyword_page) and its cached hit counts"""
+import sqlite3
+
+import pytest
+
+import retrieval
+from chunking import ensure_chunks_table, sync_chunks
+
+
+def add_sermon(conn, video_id, transcript, published_at='20240101'):
+    conn.execute("INSERT INTO sermons(video_id, title, published_at, transcript) VALUES (?, ?, ?, ?)",
+                 (video_id, f'Sermon {video_id}', published_at, transcript))
+    sync_chunks(conn, video_id, transcript)
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE VIRTUAL TABLE sermons USING fts5(video_id, title, published_at, transcript)")
+    ensure_chunks_table(conn)
+    # Identical passages tie on bm25, so paging has to break ties by chunk_id
+    for i in range(6):
+        add_sermon(conn, f'v{i}', ('grace abounds to all who believe. ' * 30 +
+                                   'mercy and grace are new every morning. ' * 25 * (i % 2 + 1)))
+    add_sermon(conn, 'other', 'a sermon about patience and hope. ' * 40)
+    retrieval._counts.clear()
+    yield conn
+    conn.close()
+
+
+def all_pages(conn, query, limit):
+    pages, cursor = [], None
+    while True:
+        rows, cursor = retrieval.keyword_page(conn, query, limit, cursor)
+        pages.append(rows)
+        if cursor is None:
+            return pages
+
+
+def test_cursor_pages_cover_every_hit_once_in_rank_order(conn):
+    total = retrieval.keyword_count(conn, 'grace')
+    assert total > 7
+    pages = all_pages(conn, 'grace', 3)
+    ids = [row[0] for page in pages for row in page]
+    assert len(ids) == len(set(ids)) == total
+    assert all(0 < len(page) <= 3 for page in pages)
+    ranked = conn.execute("SELECT rowid FROM chunks_fts WHERE chunks_fts MATCH 'grace' "
+                          "ORDER BY bm25(chunks_fts), rowid").fetchall()
+    assert ids == [chunk_id for chunk_id, in ranked]
+
+
+def test_page_rows_carry_sermon_and_snippet(conn):
+    rows, cursor = retrieval.keyword_page(conn, 'patience', 10)
+    assert cursor is None
+    chunk_id, video_id, title, pub, snippet = rows[0]
+    assert (video_id, title, pub) == ('other', 'Sermon other', '20240101')
+    assert '<b>patience</b>' in snippet
+
+
+def test_cursor_round_trip_and_invalid_cursor():
+    assert retrieval.decode_cursor(retrieval.encode_cursor(-1.2345678901234567, 2 ** 62 + 5)) == \
+        (-1.2345678901234567, 2 ** 62 + 5)
+    with pytest.raises(ValueError, match='invalid cursor'):
+        retrieval.decode_cursor('not-a-cursor')
+
+
+def test_no_match_and_plain_word_fallback(conn):
+    assert retrieval.keyword_page(conn, 'zebra', 5) == ([], None)
+    # Unbalanced quote is not valid FTS5 syntax; the words are searched instead
+    assert retrieval.keyword_count(conn, '"patience') == retrieval.keyword_count(conn, 'patience')
+    for query in ("patience's", '-patience', 'hope:patience', 'patience AND'):
+        assert retrieval.keyword_count(conn, query) == retrieval.keyword_count(conn, 'patience')
+
+
+def test_database_errors_are_not_taken_for_bad_syntax(conn):
+    conn.execute("DROP TABLE chunks_fts")
+    with pytest.raises(sqlite3.OperationalError, match='no such table'):
+        retrieval.keyword_count(conn, 'patience')
+
+
+def test_count_is_cached_until_chunks_change(conn):
+    before = retrieval.keyword_count(conn, 'patience')
+    assert len(retrieval._counts) == 1
+    assert retrieval.keyword_count(conn, 'patience') == before
+    assert len(retrieval._counts) == 1
+    add_sermon(conn, 'late', 'patience in trials. ' * 10)
+    assert retrieval.keyword_count(conn, 'patience') == before + 1
+    assert len(retrieval._counts) == 2
@@ -0,0 +1,127 @@
+"""Streaming OpenAIChatClient and its SSE parser against the local stub in scripts/openai_stub.py"""
+import json
+import threading
+from argparse import Namespace
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import openai_embeddings
+from openai_chat import ChatAPIError, OpenAIChatClient, parse_sse
+from openai_stub import ANSWER, StubHandler
+
+
+def serve(handler_class, **attrs):
+    config = Namespace(dim=8, fail_rate=0.0, quiet=True, first_token_delay=0, token_delay=0)
+    handler = type('Handler', (handler_class,), dict(attrs, config=config, requests=[]))
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+    return server, handler, f'http://127.0.0.1:{server.server_address[1]}/v1'
+
+
+@pytest.fixture
+def make_stub():
+    servers = []
+
+    def make(handler_class=StubHandler, **attrs):
+        server, handler, url = serve(handler_class, **attrs)
+        servers.append(server)
+        return handler, url
+
+    yield make
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(openai_embeddings, 'BACKOFF_BASE', 0.0)
+
+
+class FailingFirst(StubHandler):
+    """Answers the first `failures` requests with `status`, then behaves like the stub"""
+    failures = 0
+    status = 503
+
+    def do_POST(self):
+        self.requests.append(self.path)
+        if len(self.requests) <= self.failures:
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            data = json.dumps({'error': {'message': 'try again'}}).encode('utf-8')
+            self.send_response(self.status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Retry-After', '0')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        super().do_POST()
+
+
+class BreaksMidStream(StubHandler):
+    def _chat(self, body):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        self._chunk({'choices': [{'index': 0, 'delta': {'content': 'Forgiveness'}}]})
+        # Drop the connection without the terminating chunk
+        self.close_connection = True
+
+
+def test_parse_sse_yields_deltas_until_done():
+    lines = ['', ': keep-alive', 'data: {"choices": [{"delta": {"role": "assistant"}}]}',
+             'data: {"choices": [{"delta": {"content": "Grace"}}]}',
+             'data: {"choices": [{"delta": {"content": " abounds"}}]}',
+             'data: [DONE]', 'data: {"choices": [{"delta": {"content": "ignored"}}]}']
+    assert list(parse_sse(lines)) == ['Grace', ' abounds']
+
+
+def test_parse_sse_raises_chat_errors():
+    with pytest.raises(ChatAPIError, match='rate limited'):
+        list(parse_sse(['data: {"error": {"message": "rate limited"}}']))
+    with pytest.raises(ChatAPIError, match='malformed'):
+        list(parse_sse(['data: {"choices": [', 'data: [DONE]']))
+    with pytest.raises(ChatAPIError, match='unexpected'):
+        list(parse_sse(['data: 42']))
+
+
+def test_stream_yields_the_answer_piece_by_piece(make_stub):
+    _, url = make_stub()
+    client = OpenAIChatClient('stub', base_url=url)
+    pieces = list(client.stream('What does the sermon say about forgiveness?'))
+    assert len(pieces) == len(ANSWER.split(' ')) and ''.join(pieces) == ANSWER
+    # The pooled connection is reused for the next answer
+    assert client.complete('again') == ANSWER
+
+
+@pytest.mark.parametrize('status', [429, 500, 503])
+def test_retries_rate_limits_and_server_errors(make_stub, status):
+    handler, url = make_stub(FailingFirst, failures=2, status=status)
+    assert OpenAIChatClient('stub', base_url=url, max_retries=2).complete('q') == ANSWER
+    assert len(handler.requests) == 3
+
+
+def test_gives_up_after_max_retries(make_stub):
+    handler, url = make_stub(FailingFirst, failures=5, status=429)
+    with pytest.raises(ChatAPIError, match='giving up after 2 attempts'):
+        OpenAIChatClient('stub', base_url=url, max_retries=1).complete('q')
+    assert len(handler.requests) == 2
+
+
+def test_client_errors_are_not_retried(make_stub):
+    handler, url = make_stub(FailingFirst, failures=5, status=400)
+    with pytest.raises(ChatAPIError, match='HTTP 400'):
+        OpenAIChatClient('stub', base_url=url, max_retries=3).complete('q')
+    assert len(handler.requests) == 1
+
+
+def test_stream_broken_midway_raises(make_stub):
+    _, url = make_stub(BreaksMidStream)
+    pieces = []
+    with pytest.raises(ChatAPIError, match='stream interrupted'):
+        for piece in OpenAIChatClient('stub', base_url=url).stream('q'):
+            pieces.append(piece)
+    assert pieces == ['Forgiveness']
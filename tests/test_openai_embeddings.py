@@ -0,0 +1,68 @@
+"""OpenAIEmbeddingClient against the local stub in scripts/openai_stub.py"""
+import threading
+from argparse import Namespace
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import openai_embeddings
+from openai_embeddings import EmbeddingAPIError, OpenAIEmbeddingClient, pack_batches
+from openai_stub import StubHandler, stub_vector
+
+DIM = 8
+
+
+@pytest.fixture
+def stub():
+    """Base URL of a stub server; set `.fail_rate` on the yielded config to inject 503s"""
+    config = Namespace(dim=DIM, fail_rate=0.0, quiet=True, first_token_delay=0, token_delay=0)
+    handler = type('Handler', (StubHandler,), {'config': config})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/v1', config
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(openai_embeddings, 'BACKOFF_BASE', 0.0)
+
+
+def test_pack_batches_respects_input_and_token_limits():
+    assert pack_batches([1] * 5, max_inputs=2) == [(0, 2), (2, 4), (4, 5)]
+    assert pack_batches([4, 4, 4, 1], max_tokens=8) == [(0, 2), (2, 4)]
+    # An input over the token budget still goes out, alone
+    assert pack_batches([20, 1], max_tokens=8) == [(0, 1), (1, 2)]
+
+
+def test_embed_keeps_input_order_across_concurrent_batches(stub, monkeypatch):
+    url, _ = stub
+    monkeypatch.setattr(openai_embeddings, 'pack_batches',
+                        lambda counts: pack_batches(counts, max_inputs=3))
+    texts = [f'passage {i}' for i in range(20)]
+    seen = []
+    client = OpenAIEmbeddingClient('stub', 'text-embedding-3-small', base_url=url, concurrency=4)
+    vectors = client.embed(texts, on_batch=lambda batch, vecs: seen.extend(batch), show_progress=False)
+    assert vectors == [stub_vector(t, DIM) for t in texts]
+    assert sorted(seen) == sorted(texts)
+
+
+def test_embed_retries_server_errors(stub, monkeypatch):
+    url, config = stub
+    config.fail_rate = 0.5
+    monkeypatch.setattr(openai_embeddings, 'pack_batches',
+                        lambda counts: pack_batches(counts, max_inputs=2))
+    texts = [f'passage {i}' for i in range(10)]
+    client = OpenAIEmbeddingClient('stub', 'text-embedding-3-small', base_url=url, max_retries=30)
+    assert client.embed(texts, show_progress=False) == [stub_vector(t, DIM) for t in texts]
+
+
+def test_embed_gives_up_after_max_retries(stub):
+    url, config = stub
+    config.fail_rate = 1.0
+    client = OpenAIEmbeddingClient('stub', 'text-embedding-3-small', base_url=url, max_retries=2)
+    with pytest.raises(EmbeddingAPIError, match='after 3 attempts'):
+        client.embed(['passage'], show_progress=False)
@@ -0,0 +1,86 @@
+"""Scripture reference parser and verse index (scripts/scripture.py)"""
+import sqlite3
+
+import pytest
+
+import scripture
+from chunking import ensure_chunks_table, sync_chunks
+from scripture import Reference, format_reference, parse_references
+
+
+def labels(text, strict=True):
+    return [format_reference(ref) for _, ref in parse_references(text, strict=strict)]
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('Romans 8:28', ['Romans 8:28']),
+    ('turn to 1 Cor. 13:4-7 please', ['1 Corinthians 13:4-7']),
+    ('Ephesians 2:8-9', ['Ephesians 2:8-9']),
+    ('John 3:16 and 17', ['John 3:16', 'John 3:17']),
+    ('Romans 8:28, 30 and 32', ['Romans 8:28', 'Romans 8:30', 'Romans 8:32']),
+    ('John 3:16 and 2 Corinthians 5:17', ['John 3:16', '2 Corinthians 5:17']),
+    ('Matthew 5-7', ['Matthew 5', 'Matthew 6', 'Matthew 7']),
+    ('John 3:16-4:2', ['John 3:16ff', 'John 4:1-2']),
+    ('Psalm 23', ['Psalm 23']),
+    ('Revelations 21:4', ['Revelation 21:4']),
+    ('Jude 3-4', ['Jude 1:3-4']),
+])
+def test_written_references(text, expected):
+    assert labels(text) == expected
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('John chapter three verse sixteen', ['John 3:16']),
+    ('first Corinthians thirteen four', ['1 Corinthians 13:4']),
+    ('second Timothy three sixteen', ['2 Timothy 3:16']),
+    ('Romans 8 verses twenty-eight through thirty', ['Romans 8:28-30']),
+    ('Psalm twenty three', ['Psalm 23']),
+    ('Psalm one hundred and nineteen verse one hundred and five', ['Psalm 119:105']),
+    ('Mark chapter 5', ['Mark 5']),
+    ('Romans chapter eight', ['Romans 8']),
+    ('Jude verse three', ['Jude 1:3']),
+])
+def test_spoken_references(text, expected):
+    assert labels(text) == expected
+
+
+@pytest.mark.parametrize('text, loose', [
+    ('Mark 5', ['Mark 5']),             # book name that is also a common word
+    ('Job 38', ['Job 38']),
+    ('Rom 8', ['Romans 8']),            # abbreviation without a verse
+    ('the numbers 3 and 4', ['Numbers 3']),
+    ('he said to John 3 times', ['John 3']),  # a bare chapter number
+    ('Revelations 21', ['Revelation 21']),
+    ('I have 2 John 3 things', ['2 John 1:3']),  # one-chapter book without "verse"
+    ('Jude 3', ['Jude 1:3']),
+])
+def test_strict_parsing_skips_ambiguous_chapters(text, loose):
+    assert labels(text) == []
+    assert labels(text, strict=False) == loose
+
+
+def test_invalid_references_and_offsets():
+    assert labels('Romans 17:1') == []
+    # "2 John" has no chapter 3, so this is John 3:16 starting at "John"
+    assert parse_references('2 John 3:16') == [(2, Reference(43, 3, 16, 16))]
+    assert [offset for offset, _ in parse_references('Read John 3:16 and 2 Corinthians 5:17')] == [5, 19]
+
+
+def test_verse_index_finds_citing_chunks():
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE VIRTUAL TABLE sermons USING fts5(video_id, title, published_at, transcript)")
+    ensure_chunks_table(conn)
+    scripture.ensure_scripture_tables(conn)
+    transcript = 'filler words here. ' * 80 + 'As Romans 8:28 says, all things work together. ' + 'more filler. ' * 40
+    conn.execute("INSERT INTO sermons VALUES ('v1', 'Sermon', '20240101', ?)", (transcript,))
+    sync_chunks(conn, 'v1', transcript)
+    assert scripture.sync_references(conn, 'v1', transcript) == (1, True)
+    assert scripture.sync_references(conn, 'v1', transcript) == (1, False)
+
+    total, chunks = scripture.citing_chunks(conn, [Reference(45, 8, 28, 28)])
+    assert total == 1
+    (chunk_id, video_id, offset, found), = chunks
+    assert (video_id, offset, found) == ('v1', transcript.index('Romans'), [Reference(45, 8, 28, 28)])
+    # A whole-chapter query matches the verse as well
+    assert scripture.citing_chunks(conn, [Reference(45, 8, None, None)])[0] == 1
+    assert scripture.chunk_references(conn, [chunk_id]) == {chunk_id: [Reference(45, 8, 28, 28)]}
@@ -0,0 +1,39 @@
+"""Date filters of VectorMeta.select"""
+from datetime import date, datetime
+
+import pytest
+
+from vector_meta import VectorMeta, parse_date
+
+
+@pytest.fixture
+def meta():
+    return VectorMeta.from_pairs([10, 20, 30, 40], ['a', 'b', 'b', 'c'],
+                                 {'a': '20240105', 'b': '2025-03-01', 'c': None})
+
+
+def test_parse_date_accepts_dates_and_iso_strings():
+    assert parse_date(None) is None
+    assert parse_date(date(2025, 3, 1)) == date(2025, 3, 1)
+    assert parse_date(datetime(2025, 3, 1, 12, 30)) == date(2025, 3, 1)
+    assert parse_date('2025-03-01') == parse_date('20250301') == date(2025, 3, 1)
+
+
+@pytest.mark.parametrize('value', ['bogus', '2025', '2025-13-01', ''])
+def test_parse_date_rejects_anything_else(value):
+    with pytest.raises(ValueError, match='YYYY-MM-DD'):
+        parse_date(value)
+
+
+def test_select_is_inclusive_and_skips_undated_videos(meta):
+    assert meta.select('2025-03-01', None).tolist() == [20, 30]
+    assert meta.select(None, '2024-01-05').tolist() == [10]
+    assert meta.select(None, None, ['c']).tolist() == [40]
+    assert meta.select('2024-01-01', '2025-12-31', ['c']).tolist() == []
+
+
+def test_select_rejects_invalid_dates(meta):
+    with pytest.raises(ValueError):
+        meta.select('bogus', None)
+    with pytest.raises(ValueError):
+        meta.select_videos(None, '2025')